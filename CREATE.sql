@@ -1,4 +1,4 @@
-CREATE TABLE lore (
+CREATE TABLE IF NOT EXISTS lore (
        id INTEGER PRIMARY KEY,
        data_type VARCHAR,       -- Type of data: "value" for normal values, "buffer" for nested buffers, "list" for lists
        buffer_id INTEGER,       -- ID of the buffer this entry belongs to
@@ -10,16 +10,19 @@ CREATE TABLE lore (
        datetime TIMESTAMP       -- When this entry was created
        );
 
-CREATE TABLE config (
+CREATE TABLE IF NOT EXISTS config (
        key VARCHAR PRIMARY KEY,
        value VARCHAR,
        description VARCHAR
        );
 
 
+-- Indexes and later schema changes are applied by the migrations in tome.py,
+-- which run on startup and record their progress in config.schema_version.
+
 -- Create the root buffer (ID 1)
-INSERT INTO lore (id, data_type, buffer_id, value, label, key, datetime, parent_id) 
+INSERT OR IGNORE INTO lore (id, data_type, buffer_id, value, label, key, datetime, parent_id) 
 VALUES (1, "buffer", 1, 1, "root buffer", null, CURRENT_TIMESTAMP, null);
 
 -- Default configuration settings
-INSERT INTO config (key, value, description) VALUES ('debug_mode', 'off', 'Enable/disable debug output');
+INSERT OR IGNORE INTO config (key, value, description) VALUES ('debug_mode', 'off', 'Enable/disable debug output');
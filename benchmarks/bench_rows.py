@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Compare dict_factory and record_factory rows on a large scan.
+
+For each row factory this loads every row of a lore-shaped table with
+fetchall(), as history and list windows do, and reports the scan time and
+the memory and allocations held per row, measured with tracemalloc.
+
+    python benchmarks/bench_rows.py            # 1,000,000 rows
+    python benchmarks/bench_rows.py --rows 100000
+"""
+import argparse
+import datetime
+import gc
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utilities import dict_factory, record_factory
+
+
+def build_database(rows):
+    """Create an in-memory table shaped like lore and fill it."""
+    connection = sqlite3.connect(':memory:')
+    connection.execute('''
+        CREATE TABLE lore (
+            id INTEGER PRIMARY KEY, data_type TEXT, buffer_id INTEGER, parent_id INTEGER,
+            item_index INTEGER, value TEXT, label TEXT, key TEXT, datetime TEXT
+        )
+    ''')
+    now = str(datetime.datetime.now())
+    connection.executemany(
+        "INSERT INTO lore (data_type, buffer_id, parent_id, item_index, value, label, key, datetime) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (('value', 1, None, None, f'value {n}', None, chr(97 + n % 26), now) for n in range(rows))
+    )
+    connection.commit()
+    return connection
+
+
+def measure(connection, factory, rows):
+    """Scan every row with a row factory and return timing and memory figures."""
+    connection.row_factory = factory
+    gc.collect()
+
+    # Time the scan on its own, since tracing slows allocation down
+    started = time.perf_counter()
+    result = connection.execute("SELECT * FROM lore").fetchall()
+    elapsed = time.perf_counter() - started
+    del result
+    gc.collect()
+
+    tracemalloc.start()
+    result = connection.execute("SELECT * FROM lore").fetchall()
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+    assert len(result) == rows
+    del result
+    return {
+        'seconds': elapsed,
+        'bytes_per_row': current / rows,
+        'blocks_per_row': blocks / rows,
+        'peak_mb': peak / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    connection = build_database(args.rows)
+    print(f"{args.rows:,} rows")
+    print(f"{'factory':<16}{'scan s':>10}{'bytes/row':>12}{'allocs/row':>12}{'peak MB':>10}")
+
+    results = {}
+    for name, factory in [('dict_factory', dict_factory), ('record_factory', record_factory)]:
+        results[name] = figures = measure(connection, factory, args.rows)
+        print(f"{name:<16}{figures['seconds']:>10.2f}{figures['bytes_per_row']:>12.0f}"
+              f"{figures['blocks_per_row']:>12.2f}{figures['peak_mb']:>10.0f}")
+
+    saved = 1 - results['record_factory']['bytes_per_row'] / results['dict_factory']['bytes_per_row']
+    print(f"record_factory holds {saved:.0%} less memory per row")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Compare time to first audio of the spawn, espeak and cached speech backends.
+
+The backends are run with their audio written to a pipe instead of the
+sound card, and the time from speak() being called to the first audio
+bytes arriving is measured. Utterances are spaced out like key presses so
+the espeak backend's standby process has time to load its voice. The
+cached backend has every utterance rendered beforehand and plays clips
+with cat in place of aplay. Needs espeak on the PATH.
+
+    python benchmarks/bench_speech.py
+    python benchmarks/bench_speech.py --utterances 200 --gap 0.05
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import speech
+
+
+def speaking_process(backend):
+    """Return the process the backend handed the last utterance to."""
+    if isinstance(backend, speech.CachedBackend):
+        return backend.synthesizer.active if backend.synthesizing else backend.player
+    return backend.active if isinstance(backend, speech.EspeakBackend) else backend.process
+
+
+def run(backend, texts, gap):
+    latencies = []
+    try:
+        for text in texts:
+            time.sleep(gap)
+            started = time.perf_counter()
+            backend.speak(text)
+            os.read(speaking_process(backend).stdout.fileno(), 1)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        backend.close()
+
+    latencies.sort()
+    return {
+        'p50_ms': statistics.median(latencies) * 1e3,
+        'p99_ms': latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--utterances', type=int, default=50)
+    parser.add_argument('--gap', type=float, default=0.2, help="Seconds between utterances")
+    args = parser.parse_args()
+
+    if shutil.which('espeak') is None:
+        sys.exit("espeak is not installed")
+
+    texts = [f"Item {n} of {args.utterances}: https://example.com/{n}" for n in range(args.utterances)]
+    print(f"{args.utterances:,} utterances, {args.gap * 1000:.0f} ms apart")
+    print(f"{'backend':<10}{'first audio p50 ms':>20}{'p99 ms':>10}")
+    with tempfile.TemporaryDirectory(prefix='tome-bench-speech-') as directory:
+        cached = speech.CachedBackend(directory, player=('cat',), stdout=subprocess.PIPE)
+        cached.prerender(texts)
+        cached.pool.shutdown(wait=True)
+        backends = [
+            speech.SpawnBackend(args=('--stdout',), stdout=subprocess.PIPE),
+            speech.EspeakBackend(args=('--stdout',), stdout=subprocess.PIPE),
+            cached,
+        ]
+        for backend in backends:
+            figures = run(backend, texts, args.gap)
+            print(f"{backend.name:<10}{figures['p50_ms']:>20.1f}{figures['p99_ms']:>10.1f}")
+        stats = cached.cache.stats
+        print(f"cache hit rate {cached.cache.hit_rate():.0%} ({stats['hits']} hits, {stats['misses']} misses)")
+
+
+if __name__ == '__main__':
+    main()
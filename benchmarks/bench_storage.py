@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Compare the SQLite and append-only log storage backends.
+
+Stores a number of values spread over many registers through tome.store()
+with each backend, then times reading the newest value of random registers
+through tome.retrieve(). The register cache is cleared before every SQLite
+read so that the query itself is measured.
+
+    python benchmarks/bench_storage.py
+    python benchmarks/bench_storage.py --writes 100000 --durability deferred
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tome
+
+
+def open_tome(directory, backend, durability):
+    """Point tome at a fresh database using the given backend."""
+    tome.close_connection()
+    tome.database = os.path.join(directory, 'lore.db')
+    tome.set_config('storage_backend', backend)
+    tome.set_config('durability', durability)
+    tome.close_connection()
+    tome.connect()
+
+
+def run(backend, writes, reads, registers, durability):
+    directory = tempfile.mkdtemp(prefix=f'tome-bench-{backend}-')
+    try:
+        open_tome(directory, backend, durability)
+        value = 'https://example.com/' + 'x' * 40
+
+        started = time.perf_counter()
+        for n in range(writes):
+            tome.store(f'k{n % registers}', f'{value}{n}', buffer_id=1)
+        tome.flush_writes()
+        write_seconds = time.perf_counter() - started
+
+        rng = random.Random(0)
+        latencies = []
+        for _ in range(reads):
+            key = f'k{rng.randrange(registers)}'
+            tome.register_cache['entries'].clear()
+            started = time.perf_counter()
+            tome.retrieve(key, buffer_id=1)
+            latencies.append(time.perf_counter() - started)
+
+        latencies.sort()
+        return {
+            'writes_per_second': writes / write_seconds,
+            'read_p50_us': statistics.median(latencies) * 1e6,
+            'read_p99_us': latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+        }
+    finally:
+        tome.close_connection()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writes', type=int, default=20_000)
+    parser.add_argument('--reads', type=int, default=10_000)
+    parser.add_argument('--registers', type=int, default=1_000)
+    parser.add_argument('--durability', choices=list(tome.DURABILITY_PROFILES), default='normal')
+    args = parser.parse_args()
+
+    print(f"{args.writes:,} writes over {args.registers:,} registers, {args.reads:,} reads, "
+          f"durability {args.durability}")
+    print(f"{'backend':<10}{'writes/s':>12}{'read p50 us':>14}{'read p99 us':>14}")
+    for backend in ('sqlite', 'log'):
+        figures = run(backend, args.writes, args.reads, args.registers, args.durability)
+        print(f"{backend:<10}{figures['writes_per_second']:>12,.0f}"
+              f"{figures['read_p50_us']:>14.1f}{figures['read_p99_us']:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
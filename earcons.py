@@ -0,0 +1,300 @@
+"""Earcons: short tones played in place of spoken status messages.
+
+Each status event tome signals (an empty register, entering a buffer, the
+end of a list, a mode change, an error) can be mapped to a tone or a WAV
+file. Every clip is rendered or decoded to PCM once, when the channel is
+configured, and played from memory; events without a clip are spoken as
+before. Clips go to a sink: aplay, a WAV file, or nowhere.
+"""
+import array
+import atexit
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+import wave
+
+SAMPLE_RATE = 22050
+SAMPLE_WIDTH = 2  # Bytes per sample (signed 16-bit mono)
+VOLUME = 0.4
+FADE_MS = 5       # Ramp at each end of a note so it does not click
+CLOSE_TIMEOUT = 1  # Seconds close() waits for the aplay worker
+
+# Tones as (frequency in Hz, milliseconds) notes; a frequency of 0 is silence
+TONES = {
+    'blip': [(880, 40)],
+    'low': [(220, 80)],
+    'rise': [(523, 40), (784, 50)],
+    'fall': [(784, 40), (523, 50)],
+    'double': [(440, 35), (0, 25), (440, 35)],
+    'click': [(1760, 15)],
+    'buzz': [(150, 150)],
+}
+
+# Status events tome signals, with the tone each plays by default
+EVENTS = {
+    'empty': 'low',           # Nothing stored at a key
+    'enter_buffer': 'rise',
+    'exit_buffer': 'fall',
+    'boundary': 'double',     # First or last item of a list, history or search results
+    'mode': 'click',          # Mode change
+    'copied': 'blip',         # Value copied to the clipboard
+    'error': 'buzz',
+}
+
+# Mapping an event to this keeps it spoken
+SPEECH = 'speech'
+
+
+def render_tone(notes, rate=SAMPLE_RATE, volume=VOLUME):
+    """Render notes as signed 16-bit mono PCM.
+
+    Args:
+        notes: List of (frequency, milliseconds) pairs
+        rate: Samples per second
+        volume: Peak amplitude, from 0 to 1
+
+    Returns:
+        PCM bytes in little-endian order
+    """
+    samples = array.array('h')
+    peak = volume * 32767
+    for frequency, milliseconds in notes:
+        count = rate * milliseconds // 1000
+        fade = max(min(rate * FADE_MS // 1000, count // 2), 1)
+        for n in range(count):
+            if not frequency:
+                samples.append(0)
+                continue
+            envelope = min(1.0, n / fade, (count - 1 - n) / fade)
+            samples.append(int(peak * envelope * math.sin(2 * math.pi * frequency * n / rate)))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def load_clip(path, rate=SAMPLE_RATE):
+    """Decode a WAV file into PCM for the channel.
+
+    Returns:
+        PCM bytes, or None if the file is missing or not 16-bit mono at rate
+    """
+    try:
+        with wave.open(path, 'rb') as clip:
+            if (clip.getnchannels(), clip.getsampwidth(), clip.getframerate()) != (1, SAMPLE_WIDTH, rate):
+                print(f"Earcon {path} must be 16-bit mono at {rate} Hz")
+                return None
+            return clip.readframes(clip.getnframes())
+    except (OSError, wave.Error, EOFError) as e:
+        print(f"Could not load earcon {path}: {e}")
+        return None
+
+
+class NullSink:
+    """Sink that discards every clip."""
+
+    name = 'null'
+
+    def play(self, pcm):
+        pass
+
+    def close(self):
+        pass
+
+
+class FileSink:
+    """Sink that appends every clip to a WAV file."""
+
+    name = 'file'
+
+    def __init__(self, path, rate=SAMPLE_RATE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = wave.open(path, 'wb')
+        self.file.setnchannels(1)
+        self.file.setsampwidth(SAMPLE_WIDTH)
+        self.file.setframerate(rate)
+
+    def play(self, pcm):
+        with self.lock:
+            if self.file is not None:
+                self.file.writeframes(pcm)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class AplaySink:
+    """Sink that streams clips into one long-lived aplay reading raw PCM.
+
+    Clips are written to aplay by a worker thread, so play() never blocks
+    the key handler. Only the newest clip waits for the worker; one played
+    while another is waiting replaces it, and the worker writes a clip only
+    once the previous one has had time to play, so a burst of events never
+    builds up a backlog of stale tones.
+    """
+
+    name = 'aplay'
+
+    def __init__(self, rate=SAMPLE_RATE):
+        self.command = ['aplay', '-q', '-t', 'raw', '-f', 'S16_LE', '-c', '1', '-r', str(rate)]
+        self.bytes_per_second = rate * SAMPLE_WIDTH
+        self.condition = threading.Condition()
+        self.clip = None      # Newest clip waiting for the worker
+        self.closed = False
+        self.failed = False   # Set once aplay could not be started
+        self.process = None   # Only touched by the worker thread
+        self.thread = None
+
+    def play(self, pcm):
+        with self.condition:
+            if self.failed or self.closed:
+                return
+            self.clip = pcm
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='earcons', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        """Write clips to aplay one at a time until the sink is closed."""
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.clip is not None or self.closed)
+                if self.clip is None:
+                    break
+                pcm, self.clip = self.clip, None
+            if not self.write(pcm):
+                break
+            # Let the clip play out so the next one is not queued behind it
+            time.sleep(len(pcm) / self.bytes_per_second)
+
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+            self.process = None
+
+    def write(self, pcm):
+        """Write one clip to aplay, starting it if needed.
+
+        Returns:
+            False if aplay could not be started
+        """
+        for attempt in range(2):
+            try:
+                if self.process is None or self.process.poll() is not None:
+                    self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                self.process.stdin.write(pcm)
+                self.process.stdin.flush()
+                return True
+            except BrokenPipeError:
+                self.process = None  # aplay exited; start another
+            except OSError as e:
+                with self.condition:
+                    self.failed = True
+                    self.clip = None
+                print(f"Earcons unavailable: {e}")
+                return False
+        return True
+
+    def close(self):
+        """Let aplay finish what it was given and exit."""
+        with self.condition:
+            self.closed = True
+            self.clip = None
+            self.condition.notify()
+            thread = self.thread
+        if thread is not None:
+            thread.join(CLOSE_TIMEOUT)
+
+
+SINKS = {
+    'aplay': AplaySink,
+    'file': FileSink,
+    'null': NullSink,
+}
+
+
+class Channel:
+    """Decoded clips for each mapped event and the sink they are played to."""
+
+    def __init__(self, mapping, sink):
+        """Render or load the clip for every event in mapping.
+
+        Args:
+            mapping: Event name -> tone name, WAV file path, or SPEECH
+            sink: Object with play(pcm) and close()
+        """
+        self.sink = sink
+        self.clips = {}
+        for event, source in mapping.items():
+            if not source or source == SPEECH:
+                continue
+            if source in TONES:
+                self.clips[event] = render_tone(TONES[source])
+            elif source.lower().endswith('.wav'):
+                pcm = load_clip(os.path.expanduser(source))
+                if pcm is not None:
+                    self.clips[event] = pcm
+            else:
+                print(f"Unknown earcon {source} for {event}, speaking it instead")
+
+    def play(self, event):
+        """Play the clip for event.
+
+        Returns:
+            True if the event has a clip, False if it should be spoken
+        """
+        clip = self.clips.get(event)
+        if clip is None:
+            return False
+        self.sink.play(clip)
+        return True
+
+    def close(self):
+        self.sink.close()
+
+
+# Channel earcons are played through (None while earcons are off)
+channel_state = {
+    'channel': None,
+}
+
+
+def configure(mapping, sink):
+    """Replace the channel with one for mapping played to sink.
+
+    Returns:
+        The new channel
+    """
+    close()
+    channel_state['channel'] = Channel(mapping, sink)
+    return channel_state['channel']
+
+
+def play(event):
+    """Play the earcon for event if earcons are on and it has one.
+
+    Returns:
+        True if an earcon was played, False if the event should be spoken
+    """
+    channel = channel_state['channel']
+    return channel is not None and channel.play(event)
+
+
+def close():
+    """Turn earcons off, closing the sink."""
+    if channel_state['channel'] is not None:
+        channel_state['channel'].close()
+        channel_state['channel'] = None
+
+
+atexit.register(close)
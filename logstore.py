@@ -0,0 +1,394 @@
+"""Log-structured storage backend for tome.
+
+An alternative to the SQLite lore table for value registers, selected
+with the 'storage_backend' setting. Entries are appended to segment files and never
+changed in place. An in-memory index maps every register (buffer_id, key)
+to the IDs of its versions and every entry ID to the place its record is
+stored, so reading the newest version of a register is one dictionary
+lookup and one read.
+
+The index is saved to a hint file when the store is closed and after each
+merge, so opening the store only has to replay what was written since.
+Deleted records and their tombstones are reclaimed by merging the older segments
+into new ones in a background thread.
+
+Each record is a header holding the CRC-32 and length of its payload,
+followed by the payload: the entry as UTF-8 JSON.
+"""
+import bisect
+import datetime
+import json
+import os
+import struct
+import threading
+import zlib
+
+# A new segment is started once the active one grows past this size
+SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.data'
+HINT_FILE = 'index.hint'
+
+# Merge once at least this many bytes, and this share of the store, are dead
+MERGE_MIN_DEAD_BYTES = 1024 * 1024
+MERGE_DEAD_RATIO = 0.5
+# Records copied per turn of the lock while merging
+MERGE_BATCH_SIZE = 1000
+
+HEADER = struct.Struct('>II')  # CRC-32 of the payload, payload length
+
+# Columns of an entry, matching the lore table
+ENTRY_FIELDS = ('id', 'data_type', 'buffer_id', 'parent_id', 'item_index', 'value', 'label', 'key', 'datetime')
+
+
+class LogStore:
+    """Append-only store of tome entries with an in-memory index.
+
+    All methods may be called from several threads; writes and index
+    changes are serialized by one lock.
+    """
+
+    def __init__(self, directory, first_id=1, sync=False):
+        """Open the store in directory, creating it if needed.
+
+        Args:
+            directory: Directory holding the segments and the hint file
+            first_id: Lowest ID to give a new entry, so IDs can be kept apart from another store's
+            sync: If True, fsync every record before returning from a write
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.RLock()
+        self.files = {}      # Segment ID -> open file
+        self.sizes = {}      # Segment ID -> bytes written
+        self.entries = {}    # Entry ID -> (segment ID, offset, record length)
+        self.registers = {}  # (buffer_id, key) -> entry IDs, oldest first
+        self.lists = {}      # List entry ID -> IDs of its items
+        self.dead_bytes = 0  # Bytes held by deleted records and their tombstones
+        self.next_id = 1
+        self.sync = sync
+        self.active = None
+        self.merge_thread = None
+
+        self.load()
+        self.next_id = max(self.next_id, first_id)
+
+    # Segment files
+
+    def segment_path(self, segment_id):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment_id:06d}{SEGMENT_SUFFIX}")
+
+    def segment_ids(self):
+        """Return the IDs of the segment files on disk, in order."""
+        ids = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                ids.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(ids)
+
+    def open_segment(self, segment_id):
+        """Open a segment for reading and appending."""
+        f = open(self.segment_path(segment_id), 'a+b')
+        self.files[segment_id] = f
+        self.sizes[segment_id] = f.seek(0, os.SEEK_END)
+        return f
+
+    def new_segment(self):
+        """Start a new, empty segment and return its ID."""
+        segment_id = max(self.files, default=0) + 1
+        self.open_segment(segment_id)
+        return segment_id
+
+    def rotate(self):
+        """Make a new segment the one that is appended to."""
+        with self.lock:
+            self.active = self.new_segment()
+
+    def write_record(self, segment_id, data):
+        """Append encoded record bytes to a segment and return their location."""
+        f = self.files[segment_id]
+        offset = self.sizes[segment_id]
+        f.write(data)
+        f.flush()
+        self.sizes[segment_id] += len(data)
+        return (segment_id, offset, len(data))
+
+    def append(self, record):
+        """Append a record to the active segment and return its location."""
+        payload = json.dumps(record, separators=(',', ':')).encode('utf-8')
+        location = self.write_record(self.active, HEADER.pack(zlib.crc32(payload), len(payload)) + payload)
+        if self.sync:
+            os.fsync(self.files[self.active].fileno())
+        if self.sizes[self.active] >= SEGMENT_MAX_BYTES:
+            self.rotate()
+        return location
+
+    def read(self, location):
+        """Read the record at a location."""
+        segment_id, offset, length = location
+        data = os.pread(self.files[segment_id].fileno(), length, offset)
+        return json.loads(data[HEADER.size:])
+
+    def scan(self, segment_id, start=0):
+        """Yield (location, record) for every complete record in a segment from an offset.
+
+        A torn record at the end of the segment, left by a crash while
+        writing, is cut off.
+        """
+        f = self.files[segment_id]
+        end = self.sizes[segment_id]
+        offset = start
+
+        while offset < end:
+            header = os.pread(f.fileno(), HEADER.size, offset)
+            if len(header) < HEADER.size:
+                break
+            checksum, length = HEADER.unpack(header)
+            payload = os.pread(f.fileno(), length, offset + HEADER.size)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            yield (segment_id, offset, HEADER.size + length), json.loads(payload)
+            offset += HEADER.size + length
+
+        if offset < end:
+            f.truncate(offset)
+            self.sizes[segment_id] = offset
+
+    # Index
+
+    def index_put(self, location, record):
+        """Add a stored entry to the index."""
+        entry_id = record['id']
+        known = entry_id in self.entries
+        self.entries[entry_id] = location
+        self.next_id = max(self.next_id, entry_id + 1)
+        if known:
+            # A copy of a record already indexed, e.g. from an interrupted merge
+            return
+
+        if record['key'] is not None:
+            bisect.insort(self.registers.setdefault((record['buffer_id'], record['key']), []), entry_id)
+        elif record['parent_id'] is not None:
+            self.lists.setdefault(record['parent_id'], set()).add(entry_id)
+
+    def index_delete(self, entry_id):
+        """Remove an entry from the index."""
+        location = self.entries.pop(entry_id, None)
+        if location is None:
+            return
+        record = self.read(location)
+        self.dead_bytes += location[2]
+
+        if record['key'] is not None:
+            ids = self.registers[(record['buffer_id'], record['key'])]
+            ids.remove(entry_id)
+            if not ids:
+                del self.registers[(record['buffer_id'], record['key'])]
+        elif record['parent_id'] is not None:
+            self.lists[record['parent_id']].discard(entry_id)
+
+    def load(self):
+        """Open the segments and rebuild the index from the hint file and the log."""
+        for segment_id in self.segment_ids():
+            self.open_segment(segment_id)
+
+        covered = self.load_hint()
+
+        # Tombstones can be replayed before the record they delete (merged
+        # segments hold older records under newer IDs), so apply them last
+        deleted = set()
+        for segment_id in sorted(self.files):
+            for location, record in self.scan(segment_id, covered.get(segment_id, 0)):
+                if record.get('op') == 'delete':
+                    deleted.add(record['id'])
+                    self.dead_bytes += location[2]
+                else:
+                    self.index_put(location, record)
+        for entry_id in deleted:
+            self.index_delete(entry_id)
+
+        self.active = max(self.files) if self.files else self.new_segment()
+
+    def load_hint(self):
+        """Load the index saved in the hint file.
+
+        Returns:
+            Dict of segment ID -> bytes covered by the hint, empty if there is no usable hint
+        """
+        path = os.path.join(self.directory, HINT_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                hint = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        covered = {int(segment_id): size for segment_id, size in hint['segments'].items()}
+        if any(segment_id not in self.sizes or self.sizes[segment_id] < size for segment_id, size in covered.items()):
+            # The segments changed after the hint was written
+            return {}
+
+        self.entries = {int(entry_id): tuple(location) for entry_id, location in hint['entries'].items()}
+        self.registers = {(buffer_id, key): ids for buffer_id, key, ids in hint['registers']}
+        self.lists = {parent_id: set(ids) for parent_id, ids in hint['lists']}
+        self.next_id = hint['next_id']
+        self.dead_bytes = hint['dead_bytes']
+        return covered
+
+    def write_hint(self):
+        """Save the index so the next open does not have to replay the whole log."""
+        with self.lock:
+            hint = {
+                'segments': self.sizes,
+                'next_id': self.next_id,
+                'dead_bytes': self.dead_bytes,
+                'entries': self.entries,
+                'registers': [[buffer_id, key, ids] for (buffer_id, key), ids in self.registers.items()],
+                'lists': [[parent_id, sorted(ids)] for parent_id, ids in self.lists.items()],
+            }
+            path = os.path.join(self.directory, HINT_FILE)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(hint, f, separators=(',', ':'))
+            os.replace(path + '.tmp', path)
+
+    # Entry operations, mirroring tome.store(), tome.retrieve() and tome.delete_entry()
+
+    def store(self, key, value, label=None, data_type='value', buffer_id=1, parent_id=None, item_index=None):
+        """Append a new entry.
+
+        Returns:
+            The ID of the new entry
+        """
+        with self.lock:
+            record = {
+                'op': 'put',
+                'id': self.next_id,
+                'data_type': data_type,
+                'buffer_id': buffer_id,
+                'parent_id': parent_id,
+                'item_index': item_index,
+                'value': value,
+                'label': label,
+                'key': None if key is None else str(key),
+                'datetime': str(datetime.datetime.now()),
+            }
+            self.index_put(self.append(record), record)
+            return record['id']
+
+    def entry(self, entry_id):
+        """Return a stored entry as a dict of lore columns, or None."""
+        location = self.entries.get(entry_id)
+        if location is None:
+            return None
+        record = self.read(location)
+        return {field: record[field] for field in ENTRY_FIELDS}
+
+    def retrieve(self, key, buffer_id, fetch='last', parent_id=None):
+        """Read entries the way tome.retrieve() does.
+
+        Args:
+            key: The key to retrieve
+            buffer_id: The buffer to retrieve from
+            fetch: 'last', 'last_value', 'history' (newest first), 'all' (oldest first) or 'list_items'
+            parent_id: For 'list_items', the ID of the list
+        """
+        with self.lock:
+            if fetch == 'list_items':
+                items = [self.entry(entry_id) for entry_id in self.lists.get(parent_id, ())]
+                return sorted(items, key=lambda item: (item['item_index'], item['id']))
+
+            ids = self.registers.get((buffer_id, str(key)), [])
+            if fetch == 'last':
+                return self.entry(ids[-1]) if ids else None
+            if fetch == 'last_value':
+                return {'value': self.entry(ids[-1])['value']} if ids else None
+            if fetch == 'history':
+                return [self.entry(entry_id) for entry_id in reversed(ids)]
+            return [self.entry(entry_id) for entry_id in ids]
+
+    def delete(self, entry_id):
+        """Delete an entry by appending a tombstone.
+
+        Returns:
+            True if the entry existed
+        """
+        with self.lock:
+            if entry_id not in self.entries:
+                return False
+            location = self.append({'op': 'delete', 'id': entry_id})
+            self.index_delete(entry_id)
+            self.dead_bytes += location[2]
+
+        self.maybe_merge()
+        return True
+
+    # Merging
+
+    def total_bytes(self):
+        return sum(self.sizes.values())
+
+    def maybe_merge(self):
+        """Start a background merge once enough of the log is dead."""
+        if self.dead_bytes < MERGE_MIN_DEAD_BYTES or self.dead_bytes < MERGE_DEAD_RATIO * self.total_bytes():
+            return False
+        if self.merge_thread is not None and self.merge_thread.is_alive():
+            return False
+        self.merge_thread = threading.Thread(target=self.merge, name='tome-log-merge', daemon=True)
+        self.merge_thread.start()
+        return True
+
+    def merge(self):
+        """Copy the live records of every older segment into new segments and drop the old ones.
+
+        Writes continue to the active segment meanwhile; the lock is only
+        held while a batch of records is copied.
+
+        Returns:
+            Number of bytes reclaimed
+        """
+        with self.lock:
+            self.rotate()
+            merging = [segment_id for segment_id in self.files if segment_id != self.active]
+            live = [(entry_id, location) for entry_id, location in self.entries.items() if location[0] in merging]
+            before = sum(self.sizes[segment_id] for segment_id in merging)
+            dead_before = self.dead_bytes
+            output = self.new_segment()
+            outputs = [output]
+
+        for start in range(0, len(live), MERGE_BATCH_SIZE):
+            with self.lock:
+                for entry_id, location in live[start:start + MERGE_BATCH_SIZE]:
+                    # Skip entries deleted since the merge began
+                    if self.entries.get(entry_id) != location:
+                        continue
+                    if self.sizes[output] >= SEGMENT_MAX_BYTES:
+                        output = self.new_segment()
+                        outputs.append(output)
+                    segment_id, offset, length = location
+                    data = os.pread(self.files[segment_id].fileno(), length, offset)
+                    self.entries[entry_id] = self.write_record(output, data)
+
+        with self.lock:
+            if self.sync:
+                # The copies must be on disk before the originals are removed
+                for segment_id in outputs:
+                    os.fsync(self.files[segment_id].fileno())
+            for segment_id in merging:
+                self.files.pop(segment_id).close()
+                del self.sizes[segment_id]
+                os.remove(self.segment_path(segment_id))
+            # Bytes that died during the merge are in the segments still kept
+            self.dead_bytes -= dead_before
+            self.write_hint()
+
+            return before - sum(self.sizes[segment_id] for segment_id in outputs)
+
+    def close(self):
+        """Finish any merge, save the index and close the segments."""
+        if self.merge_thread is not None:
+            self.merge_thread.join()
+        with self.lock:
+            self.write_hint()
+            for f in self.files.values():
+                f.close()
+            self.files.clear()
@@ -0,0 +1,819 @@
+"""Speech output backends and queue for tome.
+
+tome's speak() and kill_speech() hand every utterance to a queue, which a
+worker thread drains into the active backend, chosen with the
+'speech_backend' setting:
+
+- espeak: espeak processes reading utterances from stdin, with one always
+  started and waiting to take over
+- spawn: a new espeak process for every utterance, stopped with killall
+- null: says nothing
+- cached: plays clips rendered ahead of time from an on-disk cache,
+  falling back to the espeak backend for anything not yet rendered
+- recording: keeps every call instead of speaking, for tests and benchmarks
+
+A new espeak process has to load its voice before it makes a sound, so the
+espeak backend starts its processes ahead of time. Interrupting kills only
+the process that is speaking, and the waiting one takes its place.
+
+Every utterance has a priority. Navigation feedback replaces navigation
+feedback that is queued or being spoken, status messages wait their turn,
+and errors go ahead of everything else queued and are never dropped.
+Everything said while handling one key press is merged into one utterance.
+
+Long utterances are split at line and sentence boundaries into chunks that
+are handed to the backend one at a time, so speech starts with the first
+chunk and skip() can move to the next or previous one.
+"""
+import atexit
+import hashlib
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+DEFAULT_SPEED = 270
+DEFAULT_VOICE = 'en+18'
+
+# Rendered clip cache (cached backend)
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+RENDER_WORKERS = 2
+PLAYER_COMMAND = ('aplay', '-q')
+
+# Utterances longer than this are spoken in chunks of at most this many characters
+CHUNK_CHARS = 200
+SENTENCE_END = re.compile(r'(?<=[.!?;])\s+')
+
+
+def espeak_command(speed=DEFAULT_SPEED, voice=DEFAULT_VOICE, args=()):
+    """Build the espeak command line.
+
+    Args:
+        speed: Words per minute
+        voice: espeak voice name
+        args: Extra espeak arguments
+
+    Returns:
+        List of command line arguments
+    """
+    return ['espeak', f'-s{speed}', f'-v{voice}', '-z', *args]
+
+
+# Utterance priorities
+NAVIGATION = 0  # Replaced by newer navigation feedback
+STATUS = 1      # Spoken after everything queued before it
+ERROR = 2       # Spoken ahead of other queued speech, never dropped
+
+
+class NullBackend:
+    """Backend that says nothing."""
+
+    name = 'null'
+
+    def speak(self, text, speed=DEFAULT_SPEED):
+        pass
+
+    def wait(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class RecordingBackend(NullBackend):
+    """Backend that records what would have been said."""
+
+    name = 'recording'
+
+    def __init__(self):
+        self.events = []  # (time, action, text, speed)
+
+    def speak(self, text, speed=DEFAULT_SPEED):
+        self.events.append((time.perf_counter(), 'speak', text, speed))
+
+    def stop(self):
+        self.events.append((time.perf_counter(), 'stop', None, None))
+
+    @property
+    def spoken(self):
+        """Texts spoken so far, oldest first."""
+        return [text for _, action, text, _ in self.events if action == 'speak']
+
+
+class SpawnBackend:
+    """Backend that starts espeak for every utterance.
+
+    Stopping runs killall, which also silences espeak processes that tome
+    did not start.
+    """
+
+    name = 'spawn'
+
+    def __init__(self, voice=DEFAULT_VOICE, args=(), stdout=subprocess.DEVNULL):
+        self.voice = voice
+        self.args = tuple(args)
+        self.stdout = stdout
+        self.process = None
+
+    def speak(self, text, speed=DEFAULT_SPEED):
+        self.stop()
+        self.process = subprocess.Popen(espeak_command(speed, self.voice, self.args) + [text],
+                                        stdout=self.stdout, stderr=subprocess.DEVNULL)
+
+    def wait(self):
+        if self.process is not None:
+            self.process.wait()
+
+    def stop(self):
+        try:
+            subprocess.call(['killall', 'espeak'], stderr=subprocess.DEVNULL)
+        except OSError:
+            pass
+
+    def close(self):
+        pass
+
+
+class EspeakBackend:
+    """Backend that writes utterances to the stdin of a waiting espeak.
+
+    One process speaks while a standby process waits with its voice loaded.
+    Each utterance kills the speaking process, if it has been given text,
+    writes to the standby, and only then starts the next standby, so no
+    process start sits between a key press and the sound.
+    """
+
+    name = 'espeak'
+
+    def __init__(self, voice=DEFAULT_VOICE, args=(), stdout=subprocess.DEVNULL):
+        self.voice = voice
+        self.args = tuple(args)
+        self.stdout = stdout
+        self.lock = threading.Lock()
+        self.active = None   # Process that has been given text
+        self.standby = None  # (speed, process) started but not yet used
+        self.failed = False  # Set once espeak could not be started
+
+    def spawn(self, speed):
+        """Start an espeak process that reads lines from stdin."""
+        return subprocess.Popen(espeak_command(speed, self.voice, self.args + ('--stdin',)),
+                                stdin=subprocess.PIPE, stdout=self.stdout, stderr=subprocess.DEVNULL)
+
+    def take_standby(self, speed):
+        """Return the standby process for speed, starting one if needed."""
+        if self.standby is not None:
+            standby_speed, process = self.standby
+            self.standby = None
+            if standby_speed == speed and process.poll() is None:
+                return process
+            kill(process)
+        return self.spawn(speed)
+
+    def speak(self, text, speed=DEFAULT_SPEED):
+        line = (' '.join(str(text).splitlines()) + '\n').encode('utf-8')
+        with self.lock:
+            if self.failed:
+                return
+            self.stop_active()
+            try:
+                process = self.take_standby(speed)
+                try:
+                    process.stdin.write(line)
+                    process.stdin.flush()
+                except OSError:
+                    # The standby died; a fresh process still beats staying silent
+                    kill(process)
+                    process = self.spawn(speed)
+                    process.stdin.write(line)
+                    process.stdin.flush()
+                self.active = process
+                self.standby = (speed, self.spawn(speed))
+            except OSError as e:
+                self.failed = True
+                print(f"Speech unavailable: {e}")
+
+    def wait(self):
+        """Wait until the speaking process has finished or been stopped."""
+        with self.lock:
+            process = self.active
+            if process is None:
+                return
+            # espeak exits once it has spoken everything before end of input
+            end_input(process)
+        process.wait()
+
+    def stop_active(self):
+        """Kill the speaking process. Call with the lock held."""
+        if self.active is not None:
+            kill(self.active)
+            self.active = None
+
+    def stop(self):
+        with self.lock:
+            self.stop_active()
+
+    def close(self):
+        """Let the speaking process finish on its own and kill the standby."""
+        with self.lock:
+            if self.active is not None:
+                end_input(self.active)
+                self.active = None
+            if self.standby is not None:
+                kill(self.standby[1])
+                self.standby = None
+
+
+def end_input(process):
+    """Close an espeak process's stdin."""
+    try:
+        process.stdin.close()
+    except OSError:
+        pass
+
+
+def kill(process):
+    """Kill an espeak process and reap it."""
+    try:
+        process.kill()
+        process.wait(timeout=1)
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+
+
+class AudioCache:
+    """Size-bounded cache of rendered speech, one WAV file per clip.
+
+    Clips are keyed by (text, voice, speed). The least recently played
+    clips are removed first once the cache grows past max_bytes. Playing a
+    clip touches its file, so the order survives restarts.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_BYTES, voice=DEFAULT_VOICE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.voice = voice
+        self.lock = threading.Lock()
+        self.clips = OrderedDict()  # File name -> size, least recently used first
+        self.size = 0
+        self.stats = {'hits': 0, 'misses': 0, 'renders': 0, 'failures': 0, 'evictions': 0}
+
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith('.wav'):
+                found.append((os.path.getmtime(path), name, os.path.getsize(path)))
+            elif name.endswith('.tmp'):
+                os.remove(path)  # Left behind by an interrupted render
+        for _, name, size in sorted(found):
+            self.clips[name] = size
+            self.size += size
+
+    def clip_name(self, text, speed):
+        """Return the file name of the clip for text spoken at speed."""
+        digest = hashlib.sha1(f'{self.voice}\0{speed}\0{text}'.encode('utf-8')).hexdigest()
+        return f'{digest}.wav'
+
+    def __contains__(self, key):
+        text, speed = key
+        with self.lock:
+            return self.clip_name(text, speed) in self.clips
+
+    def get(self, text, speed):
+        """Return the path of the clip for text, or None, counting the lookup.
+
+        Args:
+            text: Text that is about to be spoken
+            speed: Words per minute
+
+        Returns:
+            Path to a WAV file, or None if the text has not been rendered
+        """
+        name = self.clip_name(text, speed)
+        with self.lock:
+            if name not in self.clips:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self.clips.move_to_end(name)
+        path = os.path.join(self.directory, name)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def render(self, text, speed):
+        """Synthesize text into the cache with espeak.
+
+        Returns:
+            True if the clip was rendered
+        """
+        name = self.clip_name(text, speed)
+        path = os.path.join(self.directory, name)
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            subprocess.run(espeak_command(speed, self.voice, ('-w', temporary, '--stdin')),
+                           input=text.encode('utf-8'), stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, check=True, timeout=60)
+            os.replace(temporary, path)
+        except (OSError, subprocess.SubprocessError):
+            with self.lock:
+                self.stats['failures'] += 1
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return False
+
+        size = os.path.getsize(path)
+        with self.lock:
+            self.size += size - self.clips.pop(name, 0)
+            self.clips[name] = size
+            self.stats['renders'] += 1
+            self.evict()
+        return True
+
+    def evict(self):
+        """Remove least recently used clips until the cache fits. Call with the lock held."""
+        while self.size > self.max_bytes and len(self.clips) > 1:
+            name, size = self.clips.popitem(last=False)
+            self.size -= size
+            self.stats['evictions'] += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def hit_rate(self):
+        """Return the share of lookups that found a clip (0 before any lookup)."""
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return self.stats['hits'] / lookups if lookups else 0.0
+
+
+class CachedBackend:
+    """Backend that plays pre-rendered clips and synthesizes only on a miss.
+
+    Clips are rendered by a pool of background workers from the texts given
+    to prerender(). Anything not in the cache goes to an EspeakBackend.
+    """
+
+    name = 'cached'
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_CACHE_BYTES, voice=DEFAULT_VOICE,
+                 player=PLAYER_COMMAND, stdout=subprocess.DEVNULL, workers=RENDER_WORKERS):
+        if directory is None:
+            cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+            directory = os.path.join(cache_home, 'tome', 'speech')
+        self.cache = AudioCache(directory, max_bytes, voice)
+        self.synthesizer = EspeakBackend(voice, stdout=stdout)
+        self.player_command = list(player)
+        self.stdout = stdout
+        self.lock = threading.Lock()
+        self.player = None         # Process playing a cached clip
+        self.synthesizing = False  # Whether the last utterance went to the synthesizer
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='speech-render')
+        self.rendering = set()     # (text, speed) submitted to the pool and not finished
+
+    def speak(self, text, speed=DEFAULT_SPEED):
+        path = self.cache.get(text, speed)
+        with self.lock:
+            self.stop_player()
+            self.synthesizing = True
+            if path is not None:
+                try:
+                    self.player = subprocess.Popen(self.player_command + [path], stdout=self.stdout,
+                                                   stderr=subprocess.DEVNULL)
+                    self.synthesizing = False
+                except OSError:
+                    pass
+        if self.synthesizing:
+            self.synthesizer.speak(text, speed)
+
+    def wait(self):
+        if self.synthesizing:
+            self.synthesizer.wait()
+        else:
+            with self.lock:
+                player = self.player
+            if player is not None:
+                player.wait()
+
+    def stop_player(self):
+        """Kill the clip being played. Call with the lock held."""
+        if self.player is not None:
+            kill(self.player)
+            self.player = None
+
+    def stop(self):
+        with self.lock:
+            self.stop_player()
+        self.synthesizer.stop()
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.synthesizer.close()
+
+    def prerender(self, texts, speed=DEFAULT_SPEED):
+        """Render texts that are not cached yet in the background.
+
+        Args:
+            texts: Texts likely to be spoken soon
+            speed: Words per minute they will be spoken at
+        """
+        for text in texts:
+            key = (str(text), speed)
+            with self.lock:
+                if key in self.rendering or key in self.cache:
+                    continue
+                self.rendering.add(key)
+            try:
+                self.pool.submit(self.render, key)
+            except RuntimeError:
+                return  # Closed
+
+    def render(self, key):
+        try:
+            self.cache.render(*key)
+        finally:
+            with self.lock:
+                self.rendering.discard(key)
+
+
+BACKENDS = {
+    'espeak': EspeakBackend,
+    'spawn': SpawnBackend,
+    'cached': CachedBackend,
+    'null': NullBackend,
+    'recording': RecordingBackend,
+}
+
+# Backend every utterance goes to (created on first use, see get_backend())
+backend_state = {
+    'backend': None,
+}
+
+
+def set_backend(backend):
+    """Switch speech to another backend, closing the current one.
+
+    Args:
+        backend: A BACKENDS name or a backend object
+
+    Returns:
+        The backend now in use
+    """
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            print(f"Unknown speech backend {backend}, using espeak")
+            backend = 'espeak'
+        if backend_state['backend'] is not None and backend_state['backend'].name == backend:
+            return backend_state['backend']
+        backend = BACKENDS[backend]()
+
+    if backend_state['backend'] is not None:
+        backend_state['backend'].close()
+    backend_state['backend'] = backend
+    return backend
+
+
+def get_backend():
+    """Return the backend in use, starting the espeak backend if there is none."""
+    if backend_state['backend'] is None:
+        backend_state['backend'] = EspeakBackend()
+    return backend_state['backend']
+
+
+def split_chunks(text, max_chars=CHUNK_CHARS):
+    """Split text into chunks at line and sentence boundaries.
+
+    Sentences are packed into chunks of up to max_chars characters; a
+    sentence longer than that is split between words.
+
+    Args:
+        text: Text to split
+        max_chars: Longest chunk, in characters
+
+    Returns:
+        List of chunks, at least one
+    """
+    if len(text) <= max_chars and '\n' not in text:
+        return [text]
+
+    pieces = []
+    for line in text.splitlines():
+        for sentence in SENTENCE_END.split(line.strip()):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(' ', 0, max_chars + 1)
+                if cut <= 0:
+                    cut = max_chars
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].lstrip()
+            if sentence:
+                pieces.append(sentence)
+
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + 1 + len(piece) <= max_chars:
+            chunks[-1] += ' ' + piece
+        else:
+            chunks.append(piece)
+    return chunks or ['']
+
+
+class Utterance:
+    """Text waiting to be spoken, in one or more chunks."""
+
+    __slots__ = ('text', 'chunks', 'position', 'speed', 'priority', 'skippable', 'interrupted', 'skipped', 'done')
+
+    def __init__(self, text, speed, priority, skippable=False):
+        self.text = text
+        self.chunks = split_chunks(text)
+        self.position = 0       # Chunk being spoken, or to be spoken next
+        self.speed = speed
+        self.priority = priority
+        self.skippable = skippable  # Set for values read out, which skip() moves through
+        self.interrupted = False
+        self.skipped = False    # Set when skip() moved away from the chunk being spoken
+        self.done = threading.Event()  # Set once spoken, interrupted or dropped
+
+    def remaining(self):
+        """Return the text from the current chunk on."""
+        return ' '.join(self.chunks[self.position:])
+
+
+class SpeechQueue:
+    """Utterances waiting to be spoken, drained by a worker thread."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = []    # Utterances in the order they will be spoken
+        self.current = None  # Utterance being spoken
+        self.skippable = None  # Long value most recently read out, which skip() moves through
+        self.thread = None
+
+    def put(self, utterance):
+        """Queue an utterance according to its priority."""
+        with self.condition:
+            if utterance.priority == NAVIGATION:
+                self.drop(lambda queued: queued.priority == NAVIGATION)
+                self.pending.append(utterance)
+            elif utterance.priority == ERROR:
+                # Errors stay at the front, in the order they were raised
+                position = sum(1 for queued in self.pending if queued.priority == ERROR)
+                self.pending.insert(position, utterance)
+            else:
+                self.pending.append(utterance)
+            if utterance.skippable:
+                # Status messages said meanwhile (e.g. "End of value") do not replace it
+                self.skippable = utterance if len(utterance.chunks) > 1 else None
+
+            if utterance.priority != STATUS and self.current is not None and self.current.priority == NAVIGATION:
+                self.interrupt()
+
+            self.wake()
+
+        # Render the rest of a long utterance while the first chunk is spoken
+        if len(utterance.chunks) > 1:
+            prerender(utterance.chunks[1:], utterance.speed)
+
+    def wake(self):
+        """Start the worker, or tell it there is work. Call with the condition held."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='speech', daemon=True)
+            self.thread.start()
+        self.condition.notify_all()
+
+    def resume(self, utterance):
+        """Put an utterance back to continue from its position. Call with the condition held."""
+        position = sum(1 for queued in self.pending if queued.priority == ERROR)
+        self.pending.insert(position, utterance)
+
+    def skip(self, step):
+        """Move the long value read out most recently forward or back by step chunks.
+
+        Skipping back from the first chunk starts it again. Skipping an
+        utterance that has finished or been interrupted speaks it again from
+        the new chunk.
+
+        Returns:
+            False if there is nothing to skip through or no chunk that far ahead
+        """
+        with self.condition:
+            utterance = self.skippable
+            if utterance is None:
+                return False
+            position = max(utterance.position + step, 0)
+            if position >= len(utterance.chunks):
+                return False
+            utterance.position = position
+
+            if utterance is self.current:
+                self.interrupt()
+                utterance.skipped = True
+            elif utterance not in self.pending:
+                utterance.interrupted = False
+                utterance.done.clear()
+                self.resume(utterance)
+                self.wake()
+            return True
+
+    def drop(self, matches):
+        """Remove queued utterances for which matches returns True."""
+        kept = []
+        for queued in self.pending:
+            if matches(queued):
+                queued.done.set()
+            else:
+                kept.append(queued)
+        self.pending = kept
+
+    def stop(self):
+        """Interrupt the current utterance and drop everything queued but errors."""
+        with self.condition:
+            self.drop(lambda queued: queued.priority != ERROR)
+            if self.current is not None:
+                self.interrupt()
+            else:
+                get_backend().stop()
+
+    def interrupt(self):
+        """Stop the current utterance. Call with the condition held."""
+        self.current.interrupted = True
+        self.current.skipped = False
+        get_backend().stop()
+
+    def run(self):
+        """Speak queued utterances one after another."""
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending)
+                utterance = self.current = self.pending.pop(0)
+                backend = get_backend()
+
+            # Speak without holding the condition so put() never waits on a process start
+            backend.speak(utterance.chunks[utterance.position], utterance.speed)
+            with self.condition:
+                interrupted = utterance.interrupted
+            if interrupted:
+                # Interrupted before it started; the earlier stop() missed it
+                backend.stop()
+            else:
+                backend.wait()
+
+            with self.condition:
+                self.current = None
+                if utterance.skipped:
+                    # skip() already moved the position
+                    utterance.skipped = False
+                    utterance.interrupted = False
+                    self.resume(utterance)
+                elif not utterance.interrupted and utterance.position + 1 < len(utterance.chunks):
+                    utterance.position += 1
+                    self.resume(utterance)
+                else:
+                    utterance.done.set()
+                self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until everything queued has been spoken.
+
+        Returns:
+            True if the queue emptied before the timeout
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.pending and self.current is None, timeout)
+
+    def close(self):
+        """Hand whatever is still queued to the backend without waiting for it."""
+        with self.condition:
+            pending, self.pending = self.pending, []
+            if pending:
+                utterance = merge(pending)
+                get_backend().speak(utterance.remaining(), utterance.speed)
+            for queued in pending:
+                queued.done.set()
+
+
+speech_queue = SpeechQueue()
+
+# Per-thread speech context: the priority of bare speak() calls, whether
+# they read out a value, and the utterances collected during a key press
+context = threading.local()
+
+
+def merge(utterances):
+    """Join utterances into one, keeping the highest priority."""
+    if len(utterances) == 1:
+        return utterances[0]
+    parts = []
+    for utterance in utterances:
+        text = utterance.remaining().strip()
+        if parts and parts[-1][-1] not in '.,:;!?':
+            parts[-1] += '.'
+        if text:
+            parts.append(text)
+    return Utterance(' '.join(parts), utterances[0].speed, max(utterance.priority for utterance in utterances),
+                     any(utterance.skippable for utterance in utterances))
+
+
+@contextmanager
+def feedback(priority):
+    """Speak at priority inside the block (or the decorated function)."""
+    previous = getattr(context, 'priority', None)
+    context.priority = priority
+    try:
+        yield
+    finally:
+        context.priority = previous
+
+
+@contextmanager
+def reading():
+    """Mark what is said inside the block as a value read out, which skip() moves through."""
+    previous = getattr(context, 'reading', False)
+    context.reading = True
+    try:
+        yield
+    finally:
+        context.reading = previous
+
+
+@contextmanager
+def keystroke():
+    """Collect everything said inside the block and queue it as one utterance."""
+    if getattr(context, 'batch', None) is not None:
+        yield
+        return
+    context.batch = []
+    try:
+        yield
+    finally:
+        batch, context.batch = context.batch, None
+        if batch:
+            speech_queue.put(merge(batch))
+
+
+def speak(text, speed=DEFAULT_SPEED, wait=False, priority=None):
+    """Queue text to be said.
+
+    Args:
+        text: Text to say
+        speed: Words per minute
+        wait: Block until the text has been spoken, interrupted or dropped
+        priority: NAVIGATION, STATUS or ERROR (the feedback() priority, or STATUS, if None)
+    """
+    if priority is None:
+        priority = getattr(context, 'priority', None)
+    utterance = Utterance(str(text), speed, STATUS if priority is None else priority,
+                          getattr(context, 'reading', False))
+
+    batch = getattr(context, 'batch', None)
+    if batch is not None and not wait:
+        batch.append(utterance)
+        return
+    if batch:
+        # Say what this key press already said first
+        speech_queue.put(merge(batch))
+        batch.clear()
+
+    speech_queue.put(utterance)
+    if wait:
+        utterance.done.wait()
+
+
+def skip(step):
+    """Move through the chunks of the value read out last (see SpeechQueue.skip())."""
+    return speech_queue.skip(step)
+
+
+def stop():
+    """Stop speaking, dropping queued speech other than errors."""
+    batch = getattr(context, 'batch', None)
+    if batch:
+        batch[:] = [utterance for utterance in batch if utterance.priority == ERROR]
+    speech_queue.stop()
+
+
+def prerender(texts, speed=DEFAULT_SPEED):
+    """Render texts ahead of time if the backend keeps a cache."""
+    backend = backend_state['backend']
+    if hasattr(backend, 'prerender'):
+        backend.prerender(texts, speed)
+
+
+def close_backend():
+    """Shut down the backend, letting it finish what it was last given."""
+    if backend_state['backend'] is not None:
+        speech_queue.close()
+        backend_state['backend'].close()
+        backend_state['backend'] = None
+
+
+atexit.register(close_backend)
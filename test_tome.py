@@ -2,6 +2,8 @@ import pytest
 import sqlite3
 import os
 import sys
+import threading
+import time
 from unittest.mock import patch, MagicMock
 
 # Set up mocks for pynput before importing tome
@@ -123,6 +125,7 @@ def file_db():
     
     # Clean up
     conn.close()
+    tome.close_connection()
     
     # Restore original database path
     tome.database = original_database
@@ -154,6 +157,10 @@ def mock_db():
     cursor.executescript(schema)
     conn.commit()
     
+    # Apply the migrations tome runs on startup
+    import tome
+    tome.migrate(conn, cursor)
+    
     # Create patch for connect function
     connect_patch = patch('tome.connect', return_value=(conn, cursor))
     connect_patch.start()
@@ -235,6 +242,8 @@ def reset_globals():
         'key': None,
         'buffer_id': None,
         'entries': [],
+        'window_start': 0,
+        'total': 0,
         'current_index': 0,
         'global_mode': False
     }
@@ -274,6 +283,35 @@ def test_dict_factory():
     assert result['value'] == 'test value'
 
 
+def test_record_factory():
+    """Test that Record rows read like the dicts made by dict_factory."""
+    from utilities import record_factory
+    
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = record_factory
+    row = conn.execute("SELECT 1 AS id, 'a' AS key, NULL AS label, 2 AS count").fetchone()
+    
+    assert row['id'] == 1 and row['key'] == 'a'
+    assert row.id == 1 and row.key == 'a'
+    assert row[0] == 1 and row[:2] == (1, 'a')
+    assert row.get('label') is None and row.get('missing', 'default') == 'default'
+    assert 'key' in row and 'missing' not in row and 'a' not in row
+    assert list(row.keys()) == ['id', 'key', 'label', 'count']
+    assert dict(row) == {'id': 1, 'key': 'a', 'label': None, 'count': 2}
+    assert row == {'id': 1, 'key': 'a', 'label': None, 'count': 2}
+    assert row != {'id': 1}
+    # Columns named like tuple methods stay readable by key
+    assert row['count'] == 2 and row.count(2) == 1
+    with pytest.raises(KeyError):
+        row['missing']
+    
+    # Rows of the same query share one class
+    rows = conn.execute("SELECT 1 AS a UNION ALL SELECT 2").fetchall()
+    assert type(rows[0]) is type(rows[1])
+    assert not hasattr(rows[0], '__dict__')
+    conn.close()
+
+
 def test_store_and_retrieve(mock_db, reset_globals):
     """Test storing and retrieving a simple key/value pair."""
     # Import tome after mocks are set up
@@ -659,4 +697,1232 @@ def test_new_buffer_id_function(mock_db, reset_globals):
     # Test new_buffer_id generates a value higher than max
     next_id = tome.new_buffer_id()
     assert next_id > updated_max_id
-    assert next_id == updated_max_id + 1  # Should be max + 1
\ No newline at end of file
+    assert next_id == updated_max_id + 1  # Should be max + 1
+
+
+def test_connection_is_reused(file_db, reset_globals):
+    """Test that storage functions share one long-lived connection.
+    
+    The connection should be opened once, reused across calls, and reopened
+    only when the database path changes.
+    """
+    db_path, conn, cursor = file_db
+    import tome
+    
+    connection, shared_cursor = tome.connect()
+    tome.store('a', 'first')
+    tome.retrieve('a')
+    tome.get_config('debug_mode', 'off')
+    
+    # Every call should hand back the same connection and cursor
+    assert tome.connect() == (connection, shared_cursor)
+    
+    # The schema check should have created the config table once at open
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='config'")
+    assert cursor.fetchone() is not None
+    
+    # Closing drops the cached connection so the next call reopens it
+    tome.close_connection()
+    assert tome.connection_state['connection'] is None
+    reopened, _ = tome.connect()
+    assert reopened is not connection
+    assert tome.retrieve('a')['value'] == 'first'
+
+
+def test_migrations_upgrade_legacy_database(file_db, reset_globals):
+    """Test that connecting migrates a database created by old versions of tome.
+    
+    The file_db schema uses the legacy column order from connect(). Opening it
+    should reorder the columns to match CREATE.sql, keep existing rows, add
+    the lookup indexes and record the schema version.
+    """
+    db_path, conn, cursor = file_db
+    import tome
+    
+    cursor.execute(
+        'INSERT INTO lore (key, value, data_type, datetime, buffer_id) VALUES (?, ?, ?, ?, ?);',
+        ('k', 'kept', tome.TYPE_VALUE, tome.datetime.datetime.now(), 1)
+    )
+    conn.commit()
+    
+    connection, shared_cursor = tome.connect()
+    
+    assert tome.schema_version(shared_cursor) == tome.MIGRATIONS[-1][0]
+    assert tome.table_columns(shared_cursor, 'lore')[:9] == [
+        'id', 'data_type', 'buffer_id', 'parent_id', 'item_index',
+        'value', 'label', 'key', 'datetime'
+    ]
+    assert tome.retrieve('k', buffer_id=1)['value'] == 'kept'
+    
+    shared_cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='lore'")
+    indexes = {row['name'] for row in shared_cursor.fetchall()}
+    assert {'lore_register', 'lore_list_items', 'lore_datetime'} <= indexes
+    
+    # The register lookup should be answered from the index
+    shared_cursor.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM lore WHERE buffer_id=? and key=? ORDER BY id DESC LIMIT 1;",
+        (1, 'k')
+    )
+    plan = ' '.join(row['detail'] for row in shared_cursor.fetchall())
+    assert 'lore_register' in plan
+    
+    # Running the migrations again is a no-op
+    assert tome.migrate(connection, shared_cursor) == tome.MIGRATIONS[-1][0]
+
+
+def test_buffer_allocator_is_shared_across_processes(file_db, reset_globals):
+    """Test that buffer IDs are unique even across separate connections.
+    
+    A second connection to the same database stands in for a second tome
+    process creating buffers at the same time.
+    """
+    db_path, conn, cursor = file_db
+    import tome
+    
+    first = tome.create_buffer_at_key('a')
+    
+    # Allocate from another "process"
+    other = sqlite3.connect(db_path)
+    other_id = other.execute(
+        "INSERT INTO buffers (parent_id, key, datetime) VALUES (1, 'b', CURRENT_TIMESTAMP)"
+    ).lastrowid
+    other.commit()
+    other.close()
+    
+    second = tome.new_buffer_id(1, 'c')
+    
+    assert len({first, other_id, second}) == 3
+    assert second > other_id > first
+    assert tome.max_buffer_id() == second
+    
+    # The allocator remembers where each buffer lives
+    _, shared_cursor = tome.connect()
+    shared_cursor.execute("SELECT parent_id, key FROM buffers WHERE id = ?", (first,))
+    assert shared_cursor.fetchone() == {'parent_id': 1, 'key': 'a'}
+
+
+def test_register_cache(file_db, reset_globals):
+    """Test that repeat register reads are served from the register cache.
+    
+    Writes through store() and delete_entry() keep the cache current, and a
+    commit from another connection invalidates it via PRAGMA data_version.
+    """
+    db_path, conn, cursor = file_db
+    import tome
+    
+    first_id = tome.store('a', 'one')
+    stats = tome.register_cache_stats()
+    
+    # store() writes through, so both reads are hits
+    assert tome.retrieve('a')['value'] == 'one'
+    assert tome.retrieve('a')['value'] == 'one'
+    assert tome.register_cache_stats()['hits'] == stats['hits'] + 2
+    assert tome.register_cache_stats()['misses'] == stats['misses']
+    
+    # Deleting the newest entry falls back to the previous one
+    second_id = tome.store('a', 'two')
+    assert tome.retrieve('a')['value'] == 'two'
+    tome.delete_entry(second_id)
+    assert tome.retrieve('a')['id'] == first_id
+    
+    # A write from another process is noticed
+    other = sqlite3.connect(db_path)
+    other.execute(
+        'INSERT INTO lore (key, value, data_type, datetime, buffer_id) VALUES (?, ?, ?, ?, ?);',
+        ('a', 'from elsewhere', tome.TYPE_VALUE, tome.datetime.datetime.now(), 1)
+    )
+    other.commit()
+    other.close()
+    
+    misses = tome.register_cache_stats()['misses']
+    assert tome.retrieve('a')['value'] == 'from elsewhere'
+    assert tome.register_cache_stats()['misses'] == misses + 1
+
+
+def test_deferred_durability_groups_commits(file_db, reset_globals):
+    """Test that the deferred profile holds writes until they are flushed.
+    
+    Other connections should see nothing until flush_writes() commits the
+    whole group, and a list creation counts as a single logical write.
+    """
+    db_path, conn, cursor = file_db
+    import tome
+    
+    connection, shared_cursor = tome.connect()
+    tome.apply_durability(connection, shared_cursor, 'deferred')
+    tome.writer_state['commit_window'] = 60  # Keep the flush timer out of the way
+    
+    try:
+        tome.store('a', 'one')
+        tome.store('b', 'two')
+        tome.create_list('c')
+        
+        # Our own connection sees the writes straight away
+        assert tome.retrieve('b')['value'] == 'two'
+        
+        other = sqlite3.connect(db_path)
+        count = "SELECT COUNT(*) FROM lore WHERE key IN ('a', 'b', 'c')"
+        assert other.execute(count).fetchone()[0] == 0
+        
+        assert tome.flush_writes() == 3
+        assert other.execute(count).fetchone()[0] == 3
+        other.close()
+    finally:
+        tome.apply_durability(connection, shared_cursor, 'full')
+        tome.writer_state['commit_window'] = tome.DEFAULT_COMMIT_WINDOW_MS / 1000
+
+
+def test_search_mode(mock_db, mock_speech, reset_globals):
+    """Test full-text search across buffers, kept in sync with store and delete."""
+    conn, cursor = mock_db
+    import tome
+    
+    tome.store('a', 'deploy notes for the example server')
+    buffer_id = tome.create_buffer_at_key('w')
+    tome.store('u', 'https://example.com/login', buffer_id=buffer_id)
+    unrelated_id = tome.store('b', 'grocery list')
+    
+    results = tome.search_lore('exam')
+    assert {row['value'] for row in results} == {
+        'deploy notes for the example server', 'https://example.com/login'
+    }
+    assert tome.search_lore('example deploy')[0]['key'] == 'a'
+    
+    # Deleting an entry removes it from the index
+    tome.delete_entry(unrelated_id)
+    assert tome.search_lore('grocery') == []
+    
+    # Typing a query and pressing enter announces the best match with its location
+    tome.enter_search_mode()
+    for char in 'login':
+        tome.search(MockKeyCode(char=char))
+    mock_speech.reset_mock()
+    with patch.object(tome.keyboard.Key, 'enter', 'enter'):
+        tome.search('enter')
+    mock_speech.assert_any_call("1 results")
+    mock_speech.assert_any_call("Buffer w, key u: https://example.com/login")
+
+
+def test_history_is_paged(mock_db, mock_speech, reset_globals):
+    """Test that history navigation loads pages on demand.
+    
+    Walking the whole history one entry at a time should visit every
+    version in order while never holding more than the window in memory,
+    and deleting entries should keep the count and window consistent.
+    """
+    conn, cursor = mock_db
+    import tome
+    
+    with patch.object(tome, 'HISTORY_PAGE_SIZE', 3), patch.object(tome, 'HISTORY_WINDOW_SIZE', 6):
+        for n in range(20):
+            tome.store('a', f'version {n}')
+        tome.store('b', 'other key')
+        
+        assert tome.open_history(False, 'a', 1) == 20
+        assert len(tome.history_state['entries']) == 3
+        
+        seen = [tome.history_entry(0)['value']]
+        for _ in range(19):
+            tome.navigate_history('previous')
+            seen.append(tome.history_entry(tome.history_state['current_index'])['value'])
+            assert len(tome.history_state['entries']) <= 6
+        assert seen == [f'version {n}' for n in range(19, -1, -1)]
+        
+        # Walk back toward the newest entry
+        for _ in range(19):
+            tome.navigate_history('next')
+        assert tome.history_entry(tome.history_state['current_index'])['value'] == 'version 19'
+        
+        # Deleting keeps the count and neighbours right
+        tome.history_state['current_index'] = 5
+        tome.history_entry(5)
+        tome.delete_history_entry()
+        assert tome.history_state['total'] == 19
+        assert tome.history_entry(5)['value'] == 'version 13'
+        
+        # Global history pages by (datetime, id) across all keys
+        assert tome.open_history(True) == 20
+        assert tome.history_entry(0)['value'] == 'other key'
+        assert tome.history_entry(19)['value'] == 'version 0'
+    
+    # The count comes from the trigger-maintained row, not a scan of lore
+    cursor.execute("SELECT COUNT(*) AS n FROM lore WHERE id != 1")
+    assert cursor.fetchone()['n'] == 20
+    connection, shared_cursor = tome.connect()
+    statements = []
+    connection.set_trace_callback(statements.append)
+    tome.open_history(True)
+    connection.set_trace_callback(None)
+    assert not any('COUNT(' in statement.upper() for statement in statements)
+
+
+def test_compaction_respects_retention(file_db, reset_globals):
+    """Test that compaction trims old versions but never live data.
+    
+    The current value of each register, items of lists and buffers with
+    contents are always kept, and per-buffer policies override the global one.
+    """
+    db_path, conn, cursor = file_db
+    import tome
+    
+    for n in range(10):
+        tome.store('a', f'version {n}')
+    
+    # A list that is later replaced still has items pointing at it
+    list_id = tome.create_list('l')
+    tome.append_to_list(list_id, 'item')
+    tome.store('l', 'replaced list')
+    
+    # A buffer with its own, stricter policy
+    buffer_id = tome.create_buffer_at_key('w')
+    for n in range(5):
+        tome.store('z', f'inner {n}', buffer_id=buffer_id)
+    tome.set_buffer_retention(buffer_id, keep_versions=1)
+    
+    tome.set_config('retention_keep_versions', '3')
+    deleted = tome.compact(batch_size=2, pause=0)
+    assert deleted == 7 + 4
+    
+    history = tome.retrieve('a', buffer_id=1, fetch='history')
+    assert [row['value'] for row in history] == ['version 9', 'version 8', 'version 7']
+    assert tome.retrieve('z', buffer_id=buffer_id, fetch='history')[0]['value'] == 'inner 4'
+    assert len(tome.retrieve('z', buffer_id=buffer_id, fetch='history')) == 1
+    assert tome.get_list_items(list_id)[0]['value'] == 'item'
+    assert len(tome.retrieve('l', buffer_id=1, fetch='history')) == 2
+    
+    # Deleted versions are gone from the search index too
+    assert tome.search_lore('version') and len(tome.search_lore('version')) == 3
+    
+    # Compaction never runs a full VACUUM on a database created without
+    # incremental auto-vacuum; converting it is an explicit step
+    _, shared_cursor = tome.connect()
+    shared_cursor.execute("PRAGMA auto_vacuum")
+    assert shared_cursor.fetchone()['auto_vacuum'] == 0
+    assert tome.enable_incremental_vacuum()
+    assert not tome.enable_incremental_vacuum()
+    
+    # Afterwards free pages are handed back by incremental vacuum
+    for n in range(40):
+        tome.store('b', f'filler {n} ' + 'y' * 2000)
+    tome.compact(batch_size=50, pause=0)
+    shared_cursor.execute("PRAGMA freelist_count")
+    assert shared_cursor.fetchone()['freelist_count'] == 0
+    
+    # New databases use incremental auto-vacuum from the start
+    tome.close_connection()
+    tome.database = os.path.join(os.path.dirname(db_path), 'fresh.db')
+    _, fresh_cursor = tome.connect()
+    fresh_cursor.execute("PRAGMA auto_vacuum")
+    assert fresh_cursor.fetchone()['auto_vacuum'] == 2
+
+
+def test_values_are_deduplicated(mock_db, reset_globals):
+    """Test that long values are stored once and repeat stores only touch the register."""
+    conn, cursor = mock_db
+    import tome
+    
+    snippet = 'https://example.com/' + 'x' * tome.DEDUP_MIN_LENGTH
+    
+    first_id = tome.store('a', snippet)
+    
+    # Storing the same value again at the same key is a timestamp touch
+    assert tome.store('a', snippet) == first_id
+    assert len(tome.retrieve('a', fetch='history')) == 1
+    
+    # The same value elsewhere shares the stored copy
+    tome.store('b', snippet)
+    tome.store('a', 'short value')
+    tome.store('a', snippet)
+    cursor.execute("SELECT COUNT(*) AS total FROM lore_values")
+    assert cursor.fetchone()['total'] == 1
+    
+    # Readers still see plain values
+    assert tome.retrieve('b')['value'] == snippet
+    assert [row['value'] for row in tome.retrieve('a', fetch='history')] == [snippet, 'short value', snippet]
+    assert tome.search_lore('example')[0]['value'] == snippet
+    
+    # The stored copy is released once nothing references it
+    for row in tome.retrieve('a', fetch='history') + [tome.retrieve('b')]:
+        tome.delete_entry(row['id'])
+    cursor.execute("SELECT COUNT(*) AS total FROM lore_values")
+    assert cursor.fetchone()['total'] == 0
+
+
+def test_large_values_are_compressed(mock_db, reset_globals):
+    """Test that large values are compressed on disk and decoded transparently.
+    
+    Values stored before the threshold was lowered are picked up by the
+    batched recompress() maintenance pass.
+    """
+    conn, cursor = mock_db
+    import tome
+    
+    log_excerpt = '\n'.join(f'2024-01-01 12:00:{n:02d} INFO request served' for n in range(60))
+    smaller = 'y' * 200
+    
+    tome.store('a', log_excerpt)
+    tome.store('b', smaller)
+    list_id = tome.create_list('l')
+    tome.append_to_list(list_id, log_excerpt + ' again')
+    
+    assert tome.storage_stats(cursor)['encodings']['zlib']['values'] == 2
+    assert tome.storage_stats(cursor)['encodings']['plain']['values'] == 1
+    
+    # Readers see plain text everywhere
+    assert tome.retrieve('a')['value'] == log_excerpt
+    assert tome.get_list_items(list_id)[0]['value'] == log_excerpt + ' again'
+    total = tome.open_history(True)
+    assert log_excerpt in [tome.history_entry(n)['value'] for n in range(total)]
+    
+    # Lowering the threshold and recompressing shrinks the remaining value
+    with patch.dict(tome.compression_state, {'min_bytes': 100}):
+        stats = tome.recompress(conn, batch_size=1)
+    assert stats['rewritten'] == 1
+    assert stats['bytes_after'] < stats['bytes_before']
+    assert list(tome.storage_stats(cursor)['encodings']) == ['zlib']
+    assert tome.retrieve('b')['value'] == smaller
+
+
+def test_attachments_stream_through_blobs(mock_db, mock_speech, mock_clipboard, reset_globals, tmp_path):
+    """Test storing and reading attachments in chunks without loading them whole."""
+    conn, cursor = mock_db
+    import tome
+    
+    copy_mock, paste_mock = mock_clipboard
+    document = 'First line of a long document.\n' * 5000 + 'The end.'
+    
+    # Large clipboard text is stored as an attachment
+    paste_mock.return_value = document
+    with patch.object(tome, 'get_config', return_value=str(1024)):
+        tome.clipboard(MockKeyCode(char='d'))
+    entry = tome.retrieve('d')
+    assert entry['data_type'] == tome.TYPE_ATTACHMENT
+    
+    # The info lookup never selects the payload
+    info = tome.attachment_info(entry['value'])
+    assert info['size'] == len(document.encode('utf-8'))
+    assert info['preview'].startswith('First line')
+    assert 'data' not in info
+    
+    # Reading streams chunk by chunk
+    with patch.object(tome, 'ATTACHMENT_CHUNK_SIZE', 4096):
+        chunks = list(tome.read_attachment(entry['value'], chunk_size=4096))
+    assert max(len(chunk) for chunk in chunks) == 4096
+    assert b''.join(chunks).decode('utf-8') == document
+    
+    # Files are attached in binary
+    binary = tmp_path / 'image.bin'
+    binary.write_bytes(bytes(range(256)) * 1000)
+    with patch.object(tome, 'ATTACHMENT_CHUNK_SIZE', 1000):
+        tome.attach_file('f', str(binary))
+    info = tome.attachment_info(tome.retrieve('f')['value'])
+    assert info['kind'] == 'binary' and info['name'] == 'image.bin'
+    assert b''.join(tome.read_attachment(info['id'])) == binary.read_bytes()
+    
+    # Reading the key speaks the preview; deleting the register frees the blob
+    tome.change_mode('read')
+    tome.read(MockKeyCode(char='d'))
+    assert mock_speech.call_args[0][0].startswith(f"Attachment, {len(document) // 1024} kilobytes: First line")
+    tome.delete_entry(entry['id'])
+    assert tome.attachment_info(entry['value']) is None
+    
+    # The release trigger finds remaining references through the partial index
+    plan = cursor.execute(
+        f"EXPLAIN QUERY PLAN SELECT 1 FROM lore WHERE data_type = '{tome.TYPE_ATTACHMENT}' AND value = '1'"
+    ).fetchall()
+    assert any('lore_attachment_value' in row['detail'] for row in plan)
+    
+    # The threshold counts bytes, not characters
+    paste_mock.return_value = '\u00e9' * 600
+    with patch.object(tome, 'get_config', return_value=str(1024)):
+        tome.clipboard(MockKeyCode(char='e'))
+    assert tome.retrieve('e')['data_type'] == tome.TYPE_ATTACHMENT
+
+
+@pytest.mark.parametrize("file_format", ["jsonl", "csv"])
+def test_export_and_import(mock_db, reset_globals, tmp_path, file_format):
+    """Test a round trip through export and import.
+    
+    Importing back into the same tome should add a second copy of every
+    buffer, register, list and attachment under new IDs, with references
+    between them remapped.
+    """
+    conn, cursor = mock_db
+    import tome
+    
+    long_value = 'https://example.com/' + 'a' * 100
+    tome.store('a', 'first')
+    tome.store('a', long_value)
+    buffer_id = tome.create_buffer_at_key('w')
+    tome.store('u', 'inside buffer', buffer_id=buffer_id)
+    list_id = tome.create_list('l')
+    tome.append_to_list(list_id, 'item one')
+    tome.attach_text('d', 'attached text ' * 10000)
+    
+    tome.set_config('retention_keep_versions', '3')
+    tome.set_config('durability', 'deferred')
+    
+    path = str(tmp_path / f'tome.{file_format}')
+    exported = tome.export_tome(path)
+    assert exported['entry'] == 7
+    assert exported['attachment_chunk'] >= 2
+    
+    # Shared settings are carried over; machine-local ones are left alone
+    tome.set_config('retention_keep_versions', '0')
+    tome.set_config('durability', 'full')
+    imported = tome.import_tome(path)
+    assert imported == exported
+    assert tome.get_config('retention_keep_versions') == '3'
+    assert tome.get_config('durability') == 'full'
+    with open(path, encoding='utf-8') as f:
+        assert 'deferred' not in f.read()
+    
+    # Root registers get a new newest version with the same history
+    history = tome.retrieve('a', buffer_id=1, fetch='history')
+    assert [row['value'] for row in history] == [long_value, 'first', long_value, 'first']
+    
+    # The imported buffer has a new ID and keeps its contents
+    new_buffer_id = int(tome.retrieve('w', buffer_id=1)['value'])
+    assert new_buffer_id != buffer_id
+    assert tome.retrieve('u', buffer_id=new_buffer_id)['value'] == 'inside buffer'
+    assert tome.new_buffer_id() > new_buffer_id
+    
+    # Lists and attachments point at their imported copies
+    new_list = tome.retrieve('l', buffer_id=1)
+    assert new_list['id'] != list_id
+    assert [row['value'] for row in tome.get_list_items(new_list['id'])] == ['item one']
+    attachment = tome.retrieve('d', buffer_id=1)['value']
+    assert b''.join(tome.read_attachment(attachment)).decode('utf-8') == 'attached text ' * 10000
+    assert len(tome.search_lore('inside')) == 2
+
+
+def test_csv_import_keeps_nulls(mock_db, reset_globals, tmp_path):
+    """Test that empty CSV cells come back as NULL, so compaction keeps list items."""
+    conn, cursor = mock_db
+    import tome
+    
+    list_id = tome.create_list('l')
+    for n in range(5):
+        tome.append_to_list(list_id, f'item {n}')
+    
+    path = str(tmp_path / 'tome.csv')
+    tome.export_tome(path)
+    tome.import_tome(path)
+    
+    new_list = tome.retrieve('l', buffer_id=1)
+    items = tome.get_list_items(new_list['id'])
+    assert [row['key'] for row in items] == [None] * 5
+    assert [row['label'] for row in items] == [None] * 5
+    
+    tome.set_config('retention_keep_versions', '1')
+    tome.compact(conn)
+    assert [row['value'] for row in tome.get_list_items(new_list['id'])] == [f'item {n}' for n in range(5)]
+
+
+def test_backup_and_restore(file_db, reset_globals, tmp_path):
+    """Test online backups in small steps, rotation and restoring a backup."""
+    db_path, conn, cursor = file_db
+    import tome
+    
+    for i in range(200):
+        tome.store(f'k{i % 20}', f'value {i} ' + 'x' * 500)
+    tome.store('a', 'before backup')
+    
+    progress = []
+    first = tome.backup(str(tmp_path / 'lore-1.db'), pages=4, progress=lambda remaining, total: progress.append(remaining))
+    assert first['steps'] > 1
+    assert progress[-1] == 0
+    assert first['pages'] > 4
+    
+    # Rotation keeps only the newest backups
+    tome.backup(str(tmp_path / 'lore-2.db'))
+    tome.backup(str(tmp_path / 'lore-3.db'))
+    removed = tome.rotate_backups(keep=2, directory=str(tmp_path))
+    assert removed == [str(tmp_path / 'lore-1.db')]
+    assert tome.list_backups(str(tmp_path)) == [str(tmp_path / 'lore-2.db'), str(tmp_path / 'lore-3.db')]
+    
+    tome.store('a', 'after backup')
+    assert tome.retrieve('a', buffer_id=1)['value'] == 'after backup'
+    
+    tome.restore_backup(str(tmp_path / 'lore-3.db'))
+    assert tome.retrieve('a', buffer_id=1)['value'] == 'before backup'
+    assert len(tome.retrieve('k0', buffer_id=1, fetch='history')) == 10
+
+
+def test_current_registers_follow_history(mock_db, reset_globals):
+    """Test that current_registers always points at the newest version of a register."""
+    conn, cursor = mock_db
+    import tome
+    
+    def current(key):
+        cursor.execute("SELECT lore_id FROM current_registers WHERE buffer_id = 1 AND key = ?", (key,))
+        row = cursor.fetchone()
+        return row['lore_id'] if row else None
+    
+    for i in range(50):
+        tome.store('a', f'version {i}')
+    history = tome.retrieve('a', buffer_id=1, fetch='history')
+    assert current('a') == history[0]['id']
+    assert tome.retrieve('a', buffer_id=1)['value'] == 'version 49'
+    
+    # Deleting the newest version brings back the one before it
+    tome.delete_entry(history[0]['id'])
+    assert current('a') == history[1]['id']
+    assert tome.retrieve('a', buffer_id=1)['value'] == 'version 48'
+    
+    # Deleting an older version leaves the register alone
+    tome.delete_entry(history[10]['id'])
+    assert current('a') == history[1]['id']
+    
+    # A register with no versions left disappears
+    tome.store('b', 'only')
+    tome.delete_entry(tome.retrieve('b', buffer_id=1)['id'])
+    assert current('b') is None
+    assert tome.retrieve('b', buffer_id=1) is None
+    
+    # List items have no key and are not registers
+    list_id = tome.create_list('l')
+    tome.append_to_list(list_id, 'item')
+    assert tome.is_key_a_list('l', buffer_id=1)
+    cursor.execute("SELECT COUNT(*) AS n FROM current_registers")
+    assert cursor.fetchone()['n'] == 2
+
+
+def test_buffer_paths(mock_db, mock_speech, reset_globals):
+    """Test resolving typed buffer paths and naming buffers by their path."""
+    conn, cursor = mock_db
+    import tome
+    
+    a = tome.create_buffer_at_key('a', parent_buffer_id=1)
+    b = tome.create_buffer_at_key('b', parent_buffer_id=a)
+    c = tome.create_buffer_at_key('c', parent_buffer_id=b)
+    tome.store('x', 'deep value', buffer_id=c)
+    
+    assert tome.resolve_buffer_path('abc') == [1, a, b, c]
+    assert tome.resolve_buffer_path('') == [1]
+    assert tome.resolve_buffer_path('ax') is None
+    assert tome.resolve_buffer_path('abcx') is None
+    
+    assert tome.buffer_path_name(c) == 'abc'
+    assert tome.buffer_path_name(1) == 'root'
+    assert tome.buffer_path_name(c + 100) == f'buffer {c + 100}'
+    
+    # Jump mode takes a typed path straight to the buffer
+    tome.current_buffer_id = 1
+    tome.enter_jump_mode()
+    for char in 'abc':
+        tome.jump(MockKeyCode(char=char))
+    with patch.object(tome.keyboard.Key, 'enter', 'enter'):
+        tome.jump('enter')
+    assert tome.mode == 'read'
+    assert tome.current_buffer_id == c
+    assert tome.buffer_stack == [1, a, b, c]
+    mock_speech.assert_any_call("Entering buffer abc")
+    
+    # Backspace walks back up the path
+    tome.exit_buffer()
+    assert tome.current_buffer_id == b
+    
+    # Global history names buffers by their path
+    tome.format_global_history_entry(tome.retrieve('x', buffer_id=c))
+    mock_speech.assert_any_call("Buffer abc, key x: deep value")
+    tome.open_history(True)
+    tome.restore_history_entry()
+    mock_speech.assert_any_call("Restored to buffer abc, key x: deep value")
+    tome.open_history(True)
+    tome.delete_history_entry()
+    mock_speech.assert_any_call("Deleted entry from buffer abc, key x: deep value")
+
+
+def test_list_operations(mock_db, mock_speech, reset_globals):
+    """Test gapped list indexes and the list mode insert, remove, get and pop commands.
+    
+    Appends and middle inserts only write the new row; the list is
+    renumbered only once two neighbours have no gap left between them.
+    """
+    conn, cursor = mock_db
+    import tome
+    
+    def values(list_id):
+        return [row['value'] for row in tome.get_list_items(list_id)]
+    
+    list_id = tome.create_list('l', buffer_id=1)
+    for value in ['one', 'two', 'three']:
+        tome.append_to_list(list_id, value)
+    assert [row['item_index'] for row in tome.get_list_items(list_id)] == [0, tome.LIST_INDEX_GAP, 2 * tome.LIST_INDEX_GAP]
+    
+    # Repeated inserts into the same gap eventually renumber the list
+    items = tome.get_list_items(list_id)
+    lower, upper = items[0], items[1]
+    renumbered = False
+    for n in range(12):
+        entry, renumbered = tome.insert_into_list(list_id, f'middle {n}', lower, upper)
+        if renumbered:
+            break
+        upper = entry
+    assert renumbered
+    assert values(list_id)[0] == 'one'
+    assert values(list_id)[-2:] == ['two', 'three']
+    assert len(set(row['item_index'] for row in tome.get_list_items(list_id))) == len(values(list_id))
+    
+    assert tome.get_list_item(list_id, 0)['value'] == 'one'
+    assert tome.pop_from_list(list_id)['value'] == 'three'
+    remaining = len(values(list_id))
+    assert tome.clear_list(list_id) == remaining
+    assert values(list_id) == []
+    
+    # List mode commands, with item 1 being the newest item
+    for value in ['one', 'two', 'three']:
+        tome.append_to_list(list_id, value)
+    enter_key = MockKey('enter')
+    with patch.object(tome.keyboard, 'Key', MockKey), patch.object(MockKey, 'enter', enter_key, create=True), \
+         patch.object(tome, 'paste', return_value='inserted'):
+        tome.enter_list_mode('l', buffer_id=1)
+        
+        # i 2 enter: the clipboard becomes item 2
+        tome.list_mode(MockKeyCode(char='i'))
+        tome.list_mode(MockKeyCode(char='2'))
+        tome.list_mode(enter_key)
+        assert values(list_id) == ['one', 'two', 'inserted', 'three']
+        mock_speech.assert_any_call("Inserted item 2 of 4: inserted")
+        
+        # g 4 enter moves to the oldest item
+        tome.list_mode(MockKeyCode(char='g'))
+        tome.list_mode(MockKeyCode(char='4'))
+        tome.list_mode(enter_key)
+        mock_speech.assert_any_call("Item 4 of 4: one")
+        
+        # y inserts at the cursor, moving the current item down
+        tome.list_mode(MockKeyCode(char='y'))
+        assert values(list_id) == ['one', 'inserted', 'two', 'inserted', 'three']
+        
+        # r 1 enter removes the newest item
+        tome.list_mode(MockKeyCode(char='r'))
+        tome.list_mode(MockKeyCode(char='1'))
+        tome.list_mode(enter_key)
+        assert values(list_id) == ['one', 'inserted', 'two', 'inserted']
+        assert [row['value'] for row in tome.list_state['items']] == values(list_id)
+        
+        # o pops the newest item to the clipboard and exits
+        with patch.object(tome, 'copy') as mock_copy, pytest.raises(SystemExit):
+            tome.list_mode(MockKeyCode(char='o'))
+        mock_copy.assert_called_once_with('inserted')
+        assert values(list_id) == ['one', 'inserted', 'two']
+
+
+def test_list_mode_loads_a_window(file_db, mock_speech, reset_globals):
+    """Test that list mode only keeps a window of a long list in memory.
+    
+    Opening the list loads just the newest page, neighbouring pages are
+    prefetched in the background, and jumps to the ends or to an item number
+    load the page they need directly.
+    """
+    db_path, conn, cursor = file_db
+    import tome
+    
+    connection, tome_cursor = tome.connect()
+    list_id = tome.create_list('l', buffer_id=1)
+    tome_cursor.executemany(
+        "INSERT INTO lore (data_type, buffer_id, parent_id, item_index, value) VALUES (?, 1, ?, ?, ?)",
+        [(tome.TYPE_VALUE, list_id, n * tome.LIST_INDEX_GAP, f'item {n}') for n in range(1000)]
+    )
+    connection.commit()
+    
+    statements = []
+    with patch.object(tome, 'LIST_PAGE_SIZE', 10), patch.object(tome, 'LIST_WINDOW_SIZE', 30):
+        # The newest page is found from the index, not by skipping every older item
+        connection.set_trace_callback(statements.append)
+        tome.enter_list_mode('l', buffer_id=1)
+        tome.list_state['prefetch_thread'].join()
+        connection.set_trace_callback(None)
+        assert statements and not any('OFFSET' in statement for statement in statements)
+        assert tome.list_state['total'] == 1000
+        assert len(tome.list_state['items']) == 10
+        mock_speech.assert_any_call("Item 1 of 1000: item 999")
+        
+        # Walking towards older items uses the prefetched page when it is ready
+        tome.list_state['prefetch_thread'].join()
+        assert tome.list_state['prefetched'] is not None
+        for n in range(40):
+            assert tome.navigate_list('prev')
+            assert len(tome.list_state['items']) <= 30
+            thread = tome.list_state['prefetch_thread']
+            if thread:
+                thread.join()
+        mock_speech.assert_any_call("Item 41 of 1000: item 959")
+        
+        # End jumps and go-to-item load one page directly
+        assert tome.navigate_list('end')
+        mock_speech.assert_any_call("Last item 1000 of 1000: item 0")
+        assert tome.list_state['window_start'] == 0
+        assert tome.list_get_at(500)
+        mock_speech.assert_any_call("Item 500 of 1000: item 500")
+        assert len(tome.list_state['items']) == 10
+        
+        # Inserting and removing keep the window and the count in step
+        assert tome.list_insert_at(500, 'new')
+        assert tome.list_state['total'] == 1001
+        assert tome.list_item(tome.internal_index(500, 1001))['value'] == 'new'
+        assert tome.list_item(tome.internal_index(501, 1001))['value'] == 'item 500'
+        assert tome.list_remove_at(500)
+        assert tome.list_item(tome.internal_index(500, 1000))['value'] == 'item 500'
+        assert [row['value'] for row in tome.get_list_items(list_id)][499:502] == ['item 499', 'item 500', 'item 501']
+        
+        # A list shorter than a page is loaded from its start, without a negative offset
+        short_id = tome.create_list('s', buffer_id=1)
+        for n in range(3):
+            tome.append_to_list(short_id, f'short {n}')
+        tome.open_list(short_id)
+        statements.clear()
+        connection.set_trace_callback(statements.append)
+        assert tome.list_item(2)['value'] == 'short 2'
+        connection.set_trace_callback(None)
+        assert not any('OFFSET' in statement for statement in statements)
+
+
+def test_bulk_append_splits_clipboard(mock_db, mock_speech, reset_globals):
+    """Test appending every clipboard line to a list in one go."""
+    conn, cursor = mock_db
+    import tome
+    
+    assert tome.split_list_items(' a \n\nb\na\n', 'newline', dedupe=True) == ['a', 'b']
+    assert tome.split_list_items('a,b,a', ',', dedupe=False) == ['a', 'b', 'a']
+    assert tome.split_list_items('a\tb', 'tab', dedupe=False) == ['a', 'b']
+    
+    list_id = tome.create_list('l', buffer_id=1)
+    tome.append_to_list(list_id, 'existing')
+    hosts = '\n'.join(f'host{n}.example.com' for n in range(1000)) + '\nhost1.example.com\n' + 'x' * 100
+    tome.set_config('list_dedupe', 'on')
+    
+    with patch.object(tome.keyboard, 'Key', MockKey), patch.object(tome, 'paste', return_value=hosts):
+        tome.enter_list_mode('l', buffer_id=1)
+        tome.list_mode(MockKeyCode(char='A'))
+    
+    items = tome.get_list_items(list_id)
+    assert len(items) == 1002
+    assert [row['value'] for row in items[:3]] == ['existing', 'host0.example.com', 'host1.example.com']
+    assert items[-1]['value'] == 'x' * 100
+    gaps = {b['item_index'] - a['item_index'] for a, b in zip(items, items[1:])}
+    assert gaps == {tome.LIST_INDEX_GAP}
+    mock_speech.assert_any_call(f"Added 1001 items. Item 1 of 1002: {'x' * 100}")
+    assert tome.list_state['total'] == 1002
+    assert tome.list_state['current_index'] == 1001
+    
+    # The new items are searchable like any other
+    assert [row['value'] for row in tome.search_lore('host999')] == ['host999.example.com']
+
+
+def test_log_store(tmp_path):
+    """Test the append-only log backend: reads, deletes, reopening and merging."""
+    import logstore
+    from logstore import LogStore
+    
+    store = LogStore(str(tmp_path))
+    first = store.store('a', 'first', buffer_id=1)
+    second = store.store('a', 'second', buffer_id=1)
+    list_id = store.store('l', '', label='list', data_type='list', buffer_id=1, parent_id=1)
+    store.store(None, 'item b', buffer_id=1, parent_id=list_id, item_index=1024)
+    store.store(None, 'item a', buffer_id=1, parent_id=list_id, item_index=0)
+    
+    assert store.retrieve('a', 1)['value'] == 'second'
+    assert [row['value'] for row in store.retrieve('a', 1, fetch='history')] == ['second', 'first']
+    assert [row['value'] for row in store.retrieve(None, 1, fetch='list_items', parent_id=list_id)] == ['item a', 'item b']
+    assert store.retrieve('b', 1) is None
+    
+    # Deleting the newest version brings back the previous one
+    assert store.delete(second)
+    assert not store.delete(second)
+    assert store.retrieve('a', 1)['id'] == first
+    
+    # Reopening loads the hint file, then replays what was written after it
+    store.close()
+    store = LogStore(str(tmp_path))
+    third = store.store('a', 'third', buffer_id=1)
+    store.files[store.active].close()  # Simulate a crash: no hint written for 'third'
+    with open(store.segment_path(store.active), 'ab') as f:
+        f.write(b'\x00\x00\x00\x01torn')
+    store = LogStore(str(tmp_path))
+    assert store.retrieve('a', 1)['id'] == third
+    assert store.store('c', 'after recovery', buffer_id=1) == third + 1
+    
+    # Merging drops deleted records and keeps the rest readable
+    with patch.object(logstore, 'SEGMENT_MAX_BYTES', 2048):
+        for n in range(200):
+            store.delete(store.store('x', 'y' * 100, buffer_id=1))
+    dead = store.dead_bytes
+    size = store.total_bytes()
+    reclaimed = store.merge()
+    assert reclaimed > 0
+    assert store.total_bytes() < size - dead / 2
+    assert store.retrieve('x', 1) is None
+    assert [row['value'] for row in store.retrieve('a', 1, fetch='history')] == ['third', 'first']
+    store.close()
+    
+    store = LogStore(str(tmp_path))
+    assert store.retrieve('c', 1)['value'] == 'after recovery'
+    assert [row['value'] for row in store.retrieve(None, 1, fetch='list_items', parent_id=list_id)] == ['item a', 'item b']
+    store.close()
+
+
+def test_log_backend_selected_by_config(file_db, mock_speech, reset_globals):
+    """Test that value registers go to the log when configured.
+    
+    Lists stay in SQLite, and lore stored before the switch stays readable.
+    """
+    db_path, conn, cursor = file_db
+    import tome
+    
+    tome.store('a', 'in sqlite', buffer_id=1)
+    tome.set_config('storage_backend', 'log')
+    tome.close_connection()
+    
+    first_id = tome.store('a', 'in the log', buffer_id=1)
+    entry_id = tome.store('a', 'newer', buffer_id=1)
+    assert tome.storage_state['log'] is not None
+    assert tome.storage_state['log'].sync  # The default 'full' profile fsyncs the log
+    assert first_id >= tome.LOG_FIRST_ID
+    assert tome.retrieve('a', buffer_id=1)['value'] == 'newer'
+    assert tome.delete_entry(entry_id)
+    assert tome.retrieve('a', buffer_id=1)['value'] == 'in the log'
+    assert tome.retrieve('a', buffer_id=1, fetch='last_value')['value'] == 'in the log'
+    assert [row['value'] for row in tome.retrieve('a', buffer_id=1, fetch='history')] == ['in the log', 'in sqlite']
+    assert tome.open_history(False, 'a', 1) == 2
+    assert tome.history_entry(1)['value'] == 'in sqlite'
+    
+    # Only the register written before the switch is in the lore table
+    connection, shared_cursor = tome.connect()
+    shared_cursor.execute("SELECT COUNT(*) AS n FROM lore WHERE key = 'a'")
+    assert shared_cursor.fetchone()['n'] == 1
+    
+    # Lists and their items are kept in SQLite, where list mode reads them
+    list_id = tome.create_list('l', buffer_id=1)
+    for n in range(3):
+        tome.append_to_list(list_id, f'item {n}')
+    assert list_id < tome.LOG_FIRST_ID
+    assert [row['item_index'] for row in tome.get_list_items(list_id)] == [0, tome.LIST_INDEX_GAP, 2 * tome.LIST_INDEX_GAP]
+    tome.enter_list_mode('l', buffer_id=1)
+    mock_speech.assert_any_call("Item 1 of 3: item 2")
+    
+    # Deleting a SQLite entry still works with the log on
+    assert tome.delete_entry(tome.retrieve('a', buffer_id=1, fetch='all')[0]['id'])
+    assert [row['value'] for row in tome.retrieve('a', buffer_id=1, fetch='all')] == ['in the log']
+    
+    tome.close_connection()
+    assert tome.storage_state['log'] is None
+    assert os.path.exists(os.path.join(os.path.dirname(db_path), 'lore.log', 'index.hint'))
+
+
+def test_espeak_backend_reuses_processes():
+    """Test that the espeak backend speaks through warm processes and kills only its own."""
+    import speech
+    
+    def start_process(*args, **kwargs):
+        process = MagicMock()
+        process.poll.return_value = None
+        return process
+    
+    with patch('speech.subprocess.Popen', side_effect=start_process) as popen, \
+         patch('speech.subprocess.call') as call:
+        backend = speech.EspeakBackend()
+        backend.speak("first")
+        first = backend.active
+        first.stdin.write.assert_called_once_with(b"first\n")
+        assert '--stdin' in popen.call_args[0][0]
+        
+        # The standby started after "first" takes the next utterance
+        standby = backend.standby[1]
+        backend.speak("second\nline")
+        first.kill.assert_called_once()
+        assert backend.active is standby
+        standby.stdin.write.assert_called_once_with(b"second line\n")
+        
+        # Waiting ends the process's input so it exits after speaking
+        backend.wait()
+        standby.stdin.close.assert_called_once()
+        standby.wait.assert_called()
+        
+        # A different speed needs a process started with that speed
+        backend.speak("faster", speed=400)
+        assert '-s400' in popen.call_args[0][0]
+        
+        backend.stop()
+        assert backend.active is None
+        backend.close()
+        assert backend.standby is None
+        call.assert_not_called()
+
+
+def test_speech_routes_through_backend(mock_db, reset_globals):
+    """Test that speak(), kill_speech() and Control-Alt-v use the configured backend."""
+    import tome
+    import speech
+    
+    tome.set_config('speech_backend', 'recording')
+    try:
+        backend = speech.set_backend(tome.get_config('speech_backend'))
+        assert isinstance(backend, speech.RecordingBackend)
+        
+        tome.speak("hello", speed=300)
+        assert speech.speech_queue.flush(timeout=5)
+        tome.kill_speech()
+        tome.pressed['ctrl'] = True
+        tome.pressed['alt'] = True
+        tome.key_handler(MockKeyCode(char='v'))
+        assert speech.speech_queue.flush(timeout=5)
+        
+        actions = [(action, text) for _, action, text, _ in backend.events]
+        assert actions == [('speak', 'hello'), ('stop', None), ('stop', None), ('speak', 'Silenced')]
+        assert backend.events[0][3] == 300
+    finally:
+        speech.set_backend(speech.NullBackend())
+
+
+@pytest.fixture
+def gated_speech():
+    """Speak through a recording backend whose utterances last until stopped or released.
+    
+    Yields the backend and a function that waits until a given text is being spoken.
+    """
+    import speech
+    
+    class GatedBackend(speech.RecordingBackend):
+        def __init__(self):
+            super().__init__()
+            self.finished = threading.Event()
+            self.released = threading.Event()
+        
+        def speak(self, text, speed=speech.DEFAULT_SPEED):
+            self.finished.clear()
+            super().speak(text, speed)
+        
+        def wait(self):
+            while not self.finished.is_set() and not self.released.is_set():
+                self.finished.wait(0.01)
+        
+        def stop(self):
+            super().stop()
+            self.finished.set()
+    
+    def speaking(text):
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            if backend.spoken and backend.spoken[-1] == text and not backend.finished.is_set():
+                return True
+            time.sleep(0.005)
+        return False
+    
+    backend = speech.set_backend(GatedBackend())
+    try:
+        yield backend, speaking
+    finally:
+        backend.released.set()
+        speech.speech_queue.flush(timeout=5)
+        speech.set_backend(speech.NullBackend())
+
+
+def test_speech_queue_priorities(gated_speech):
+    """Test that navigation replaces navigation, status waits and errors go first."""
+    import speech
+    backend, speaking = gated_speech
+    
+    speech.speak("Entry 1 of 9", priority=speech.NAVIGATION)
+    assert speaking("Entry 1 of 9")
+    
+    # Status waits for the navigation feedback; newer navigation cuts it off
+    speech.speak("Copied to clipboard")
+    speech.speak("Entry 2 of 9", priority=speech.NAVIGATION)
+    assert speaking("Copied to clipboard")
+    
+    # Stale navigation is replaced and errors jump the queue; silencing drops
+    # what is queued except errors
+    speech.speak("Entry 3 of 9", priority=speech.NAVIGATION)
+    speech.speak("Backup failed", priority=speech.ERROR)
+    speech.stop()
+    assert speaking("Backup failed")
+    
+    # Everything said during one key press becomes one utterance
+    with speech.keystroke():
+        speech.speak("Entry 4 of 9", priority=speech.NAVIGATION)
+        speech.speak("Buffer root, key a: value", priority=speech.NAVIGATION)
+    backend.released.set()
+    assert speech.speech_queue.flush(timeout=5)
+    
+    assert backend.spoken == ["Entry 1 of 9", "Copied to clipboard", "Backup failed",
+                              "Entry 4 of 9. Buffer root, key a: value"]
+
+
+def test_split_chunks():
+    """Test that long text is split at lines, then sentences, then words."""
+    import speech
+    
+    assert speech.split_chunks("Short value") == ["Short value"]
+    assert speech.split_chunks("line one\nline two", max_chars=20) == ["line one line two"]
+    
+    text = "First sentence here. Second one! Third sentence is a bit longer than the rest."
+    assert speech.split_chunks(text, max_chars=35) == [
+        "First sentence here. Second one!",
+        "Third sentence is a bit longer than",
+        "the rest.",
+    ]
+    assert all(len(chunk) <= 40 for chunk in speech.split_chunks("word " * 100, max_chars=40))
+
+
+def test_long_value_streams_in_chunks(mock_db, gated_speech, reset_globals):
+    """Test that a long value is spoken chunk by chunk and the arrow keys move through it."""
+    import tome
+    import speech
+    backend, speaking = gated_speech
+    
+    sentences = [f"Sentence number {n} of the notes, padded out to be long enough to fill a chunk." for n in range(6)]
+    tome.store('n', ' '.join(sentences), buffer_id=1)
+    tome.mode = 'read'
+    
+    with patch.object(tome.keyboard, 'Key', MockKey), \
+         patch.object(MockKey, 'right', MockKey('right'), create=True), \
+         patch.object(MockKey, 'left', MockKey('left'), create=True):
+        tome.key_handler(MockKeyCode(char='n'))
+        first, second, third = speech.split_chunks(' '.join(sentences))
+        assert speaking(first)
+        
+        tome.read(MockKey.right)
+        assert speaking(second)
+        tome.read(MockKey.left)
+        assert speaking(first)
+        
+        # Down stops; right picks the value up again without reading the register
+        with patch.object(tome, 'retrieve') as retrieve:
+            tome.read(MockKey.down)
+            assert speech.speech_queue.flush(timeout=5)
+            tome.read(MockKey.right)
+            assert speaking(second)
+            retrieve.assert_not_called()
+        
+        # "End of value" at the last chunk does not become what left moves through
+        tome.read(MockKey.right)
+        assert speaking(third)
+        tome.read(MockKey.right)
+        tome.read(MockKey.left)
+        assert speaking(second)
+    
+    backend.released.set()
+    assert speech.speech_queue.flush(timeout=5)
+    assert backend.spoken == [first, second, first, second, third, second, third, "End of value"]
+
+
+def test_audio_cache(tmp_path):
+    """Test that rendered clips are cached, evicted least recently used first and played without espeak."""
+    import speech
+    
+    def fake_espeak(command, input=None, **kwargs):
+        # Write a clip as long as the text to the -w path
+        with open(command[command.index('-w') + 1], 'wb') as clip:
+            clip.write(b'RIFF' + input * 100)
+    
+    def start_process(*args, **kwargs):
+        process = MagicMock()
+        process.poll.return_value = None
+        return process
+    
+    directory = str(tmp_path / 'speech')
+    with patch('speech.subprocess.run', side_effect=fake_espeak), \
+         patch('speech.subprocess.Popen', side_effect=start_process) as popen:
+        backend = speech.CachedBackend(directory, max_bytes=4000, player=('play',))
+        backend.prerender(["Copied to clipboard", "End of list"])
+        backend.pool.shutdown(wait=True)
+        assert backend.cache.stats['renders'] == 2
+        
+        # A cached phrase goes to the player, anything else to espeak
+        backend.speak("End of list")
+        assert popen.call_args[0][0][0] == 'play'
+        assert popen.call_args[0][0][1].endswith('.wav')
+        backend.speak("Not rendered yet")
+        assert '--stdin' in popen.call_args[0][0]
+        assert backend.cache.hit_rate() == 0.5
+        
+        # Over the size limit the least recently played clip goes first
+        backend.cache.render("Returning to buffer root", speech.DEFAULT_SPEED)
+        assert ("Copied to clipboard", speech.DEFAULT_SPEED) not in backend.cache
+        assert ("End of list", speech.DEFAULT_SPEED) in backend.cache
+        assert backend.cache.stats['evictions'] == 1
+        backend.close()
+    
+    # Clips survive a restart
+    reopened = speech.AudioCache(directory)
+    assert ("Returning to buffer root", speech.DEFAULT_SPEED) in reopened
+    assert reopened.size <= 4000
+
+
+def test_earcons_replace_status_messages(mock_db, mock_speech, reset_globals, tmp_path):
+    """Test that mapped status events play tones from memory and unmapped ones are spoken."""
+    import tome
+    import earcons
+    import wave
+    
+    clip_file = str(tmp_path / 'earcons.wav')
+    tome.set_config('earcons', 'on')
+    tome.set_config('earcon_sink', 'file')
+    tome.set_config('earcon_file', clip_file)
+    tome.set_config('earcon_mode', 'speech')
+    tome.mode = 'read'
+    try:
+        channel = tome.open_earcons()
+        assert 'empty' in channel.clips and 'mode' not in channel.clips
+        
+        # An empty register plays its tone instead of being spoken
+        tome.read(MockKeyCode(char='z'))
+        assert not any("No data at key z" in str(call) for call in mock_speech.call_args_list)
+        
+        # Mode changes are mapped to speech, so they are still spoken
+        tome.change_mode('options')
+        mock_speech.assert_any_call(tome.mode_map['options']['message'])
+        
+        # Turning earcons off speaks everything again
+        tome.set_config('earcons', 'off')
+        assert tome.open_earcons() is None
+        tome.read(MockKeyCode(char='z'))
+        mock_speech.assert_any_call("No data at key z")
+    finally:
+        earcons.close()
+    
+    with wave.open(clip_file, 'rb') as clip:
+        assert clip.getnframes() * earcons.SAMPLE_WIDTH == len(earcons.render_tone(earcons.TONES['low']))
+
+
+def test_aplay_sink_plays_newest_clip():
+    """Test that the aplay sink never blocks the caller and drops clips that were overtaken."""
+    import earcons
+    
+    written = []
+    writing = threading.Event()
+    unblocked = threading.Event()
+    
+    def start_aplay(*args, **kwargs):
+        process = MagicMock()
+        process.poll.return_value = None
+        def write(pcm):
+            # A full pipe: the write hangs until aplay catches up
+            writing.set()
+            unblocked.wait(5)
+            written.append(pcm)
+        process.stdin.write.side_effect = write
+        return process
+    
+    with patch('earcons.subprocess.Popen', side_effect=start_aplay) as popen:
+        sink = earcons.AplaySink()
+        sink.play(bytes([0]) * 4)
+        assert writing.wait(5)
+        started = time.time()
+        for n in range(1, 20):
+            sink.play(bytes([n]) * 4)
+        assert time.time() - started < 1
+        
+        unblocked.set()
+        deadline = time.time() + 5
+        while len(written) < 2 and time.time() < deadline:
+            time.sleep(0.005)
+        sink.close()
+    
+    # The clip being written finishes, then only the newest one follows
+    assert written == [bytes([0]) * 4, bytes([19]) * 4]
+    assert popen.call_count == 1
+    assert not sink.thread.is_alive()
@@ -6,18 +6,37 @@
 #     "pyperclip",
 # ]
 # ///
-from subprocess import call, Popen, DEVNULL
+from subprocess import Popen, DEVNULL, PIPE
+import atexit
+import threading
+import time
+from contextlib import contextmanager
 import pynput
 from pynput import keyboard
 from pynput.keyboard import Key, Controller
 import os
+import io
+import sys
+import csv
+import json
+import base64
+import argparse
+import shutil
 import webbrowser
 import re
+import string
 from Xlib.error import ConnectionClosedError
 import sqlite3
 import datetime
+import hashlib
+import zlib
+from collections import OrderedDict
 from pyperclip import copy, paste
-from utilities import dict_factory, get_global_history
+from logstore import LogStore
+import speech
+import earcons
+from utilities import (record_factory, get_global_history, count_global_history, get_key_history, count_key_history,
+                       get_list_page, count_list_items)
 
 # Terminology:
 # - Register: Any key-value pair where a key stores some data (e.g., 'a' → "hello world")
@@ -31,6 +50,7 @@ from utilities import dict_factory, get_global_history
 TYPE_VALUE = "value"  # Normal key-value pair
 TYPE_BUFFER = "buffer"  # Nested buffer container
 TYPE_LIST = "list"  # List container for multiple values
+TYPE_ATTACHMENT = "attachment"  # Large text or file kept in the attachments table
 
 # Buffer-related state
 current_buffer_id = 1  # ID of the buffer we're currently in (1 is the root buffer)
@@ -47,10 +67,167 @@ key_presses = {}     # Track key presses for read functionality
 # Get absolute paths for more reliable file access
 tome_directory = os.path.abspath(os.path.dirname(__file__))
 database = os.path.join(tome_directory, 'lore.db')
+schema_file = os.path.join(tome_directory, 'CREATE.sql')
 
 # This initial print is always shown as it's needed to identify the database location
 print(f"Database path: {database}")
 
+# Number of compiled statements SQLite keeps per connection. Every storage
+# function uses a handful of fixed queries, so these stay warm across calls.
+STATEMENT_CACHE_SIZE = 256
+
+# Process-wide database connection (opened once, see connect())
+connection_state = {
+    'connection': None,  # Long-lived SQLite connection
+    'cursor': None,      # Shared cursor handed out to storage functions
+    'database': None,    # Path the connection was opened against
+    'search': False,     # Whether the lore_fts full-text index is available
+}
+
+# Durability profiles for the writer (selected with the 'durability' config setting):
+# - full: every logical write is committed and fsynced before returning
+# - normal: write-ahead log with synchronous=NORMAL, committed per logical write
+# - deferred: like normal, but commits are held back and flushed together when
+#   the commit window elapses or tome exits
+DURABILITY_PROFILES = {
+    'full': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'deferred': False},
+    'normal': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'deferred': False},
+    'deferred': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'deferred': True},
+}
+DEFAULT_DURABILITY = 'full'
+DEFAULT_COMMIT_WINDOW_MS = 250
+
+# Writer state (see write_transaction())
+writer_state = {
+    'lock': threading.RLock(),  # Serializes writes from the listener and flush timer threads
+    'depth': 0,                 # Nesting depth of open write_transaction() blocks
+    'pending': 0,               # Logical writes made since the last commit
+    'profile': DEFAULT_DURABILITY,
+    'commit_window': DEFAULT_COMMIT_WINDOW_MS / 1000,
+    'timer': None,              # Pending flush for the deferred profile
+}
+
+# Compaction deletes at most this many rows per transaction, pausing in between
+COMPACTION_BATCH_SIZE = 500
+COMPACTION_PAUSE = 0.05
+COMPACTION_VACUUM_PAGES = 256
+
+# Background compaction state (see start_compaction())
+compaction_state = {
+    'thread': None,  # Running compaction thread, if any
+    'deleted': 0,    # Rows deleted by the last (or current) run
+}
+
+# History entries loaded per page, and the most kept in memory at once
+HISTORY_PAGE_SIZE = 50
+HISTORY_WINDOW_SIZE = 150
+
+# List items loaded per page, and the most kept in memory at once
+LIST_PAGE_SIZE = 50
+LIST_WINDOW_SIZE = 150
+
+# Maximum number of matches returned by a full-text search
+SEARCH_RESULT_LIMIT = 100
+
+# Values at least this long are stored once in lore_values and referenced by
+# hash; shorter values stay inline, where a hash would cost more than it saves
+DEDUP_MIN_LENGTH = 64
+
+# Values stored in lore_values at least this many bytes long are zlib
+# compressed (the 'compress_min_bytes' setting overrides it; 0 turns it off)
+DEFAULT_COMPRESS_MIN_BYTES = 1024
+COMPRESSION_LEVEL = 6
+COMPRESSION_BATCH_SIZE = 200
+
+# Compression settings and read-path counters
+compression_state = {
+    'min_bytes': DEFAULT_COMPRESS_MIN_BYTES,  # Threshold loaded from config when connecting
+    'decoded': 0,                             # Compressed values decoded by readers
+    'decode_seconds': 0.0,                    # Time spent decoding them
+}
+
+# Attachments are streamed through SQLite incremental blob I/O in chunks of this size
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+ATTACHMENT_PREVIEW_CHARS = 200
+# Clipboard text at least this long is stored as an attachment ('attachment_min_bytes' setting)
+DEFAULT_ATTACHMENT_MIN_BYTES = 1024 * 1024
+
+# Record layouts used by export and import. Every line of a JSONL export (or
+# row of a CSV export) is one record, tagged with its type in 'record'.
+EXPORT_FIELDS = {
+    'config': ['key', 'value', 'description'],
+    'buffer': ['id', 'parent_id', 'key', 'datetime', 'keep_versions', 'keep_days'],
+    'attachment': ['id', 'name', 'kind', 'size', 'preview'],
+    'attachment_chunk': ['id', 'offset', 'data'],
+    'entry': ['id', 'data_type', 'buffer_id', 'parent_id', 'item_index', 'value', 'label', 'key', 'datetime'],
+}
+EXPORT_INTEGER_FIELDS = {'id', 'parent_id', 'buffer_id', 'item_index', 'size', 'offset', 'keep_versions', 'keep_days'}
+# Text fields that may be NULL; CSV writes NULL as an empty cell, so empty cells read back as NULL
+EXPORT_NULLABLE_FIELDS = {
+    'attachment': {'name', 'preview'},
+    'entry': {'value', 'label', 'key'},
+}
+IMPORT_BATCH_SIZE = 5000
+# Settings that describe this machine rather than the tome: storage, durability,
+# speech, earcons and backups. Like schema_version they are never exported,
+# and importing an older export that has them leaves this machine's values alone.
+LOCAL_CONFIG_KEYS = {
+    'schema_version', 'debug_mode', 'durability', 'commit_window_ms', 'storage_backend', 'log_directory',
+    'backup_interval_hours', 'backup_directory', 'backup_step_pages', 'backup_keep',
+    'speech_backend', 'speech_cache_mb', 'speech_cache_directory',
+}
+LOCAL_CONFIG_PREFIX = 'earcon'
+
+# Online backups copy this many pages per step ('backup_step_pages' setting),
+# pausing between steps so interactive reads and writes can get in
+DEFAULT_BACKUP_STEP_PAGES = 256
+BACKUP_PAUSE = 0.005
+DEFAULT_BACKUP_KEEP = 5
+BACKUP_PREFIX = 'lore-'
+
+# State of the most recent backup, for progress reports
+backup_state = {
+    'thread': None,       # Scheduled backup thread
+    'remaining': 0,       # Pages left to copy in the running backup
+    'total': 0,           # Pages in the database being backed up
+    'duration': None,     # Seconds taken by the last completed backup
+}
+
+# List items are numbered this far apart so an item can be inserted between
+# two others without renumbering the rest; only when neighbours end up
+# adjacent is the list renumbered
+LIST_INDEX_GAP = 1024
+
+# Fixed phrases rendered ahead of time when the cached speech backend is on,
+# along with the mode messages and "No data at key" for every letter and digit
+SPOKEN_PHRASES = [
+    "Tome of lore", "Quit", "Silenced", "Copied to clipboard", "Returning to buffer root",
+    "Already at root buffer", "End of list", "Beginning of list", "No list active or list is empty",
+    "At oldest entry", "At newest entry", "No history available", "At first result", "At last result",
+    "No search results", "Clipboard is empty", "Opening in browser", "Not a valid URL",
+]
+DEFAULT_SPEECH_CACHE_MB = 64
+
+# Storage engine for value registers (see logstore.py)
+storage_state = {
+    'log': None,  # Open LogStore when 'storage_backend' is 'log', otherwise None
+}
+# Entries in the log are numbered from here, far above any ID SQLite hands out,
+# so lore rows and log entries never share an ID
+LOG_FIRST_ID = 1 << 48
+
+# Maximum number of registers kept in the register cache
+REGISTER_CACHE_SIZE = 512
+
+# Newest entry per (buffer_id, key), most recently used last (see retrieve())
+register_cache = {
+    'entries': OrderedDict(),  # (buffer_id, key) -> newest row, or None for an empty register
+    'connection': None,        # Connection the cached rows were read through
+    'data_version': None,      # PRAGMA data_version when the rows were read
+    'hits': 0,                 # Lookups answered from memory
+    'misses': 0,               # Lookups that went to SQLite
+}
+
 
 pressed = {
     'shift': False,
@@ -71,22 +248,41 @@ def max_buffer_id():
 
     connection, cursor = connect()
 
-    query = "SELECT buffer_id from lore;"
-    results = cursor.execute(query)
-    results = results.fetchall()
+    # Both lookups are answered from the end of an index, not a table scan.
+    # lore is checked too so buffer IDs written outside the allocator count.
+    query = """
+        SELECT MAX(COALESCE((SELECT MAX(id) FROM buffers), 0),
+                   COALESCE((SELECT MAX(buffer_id) FROM lore), 0)) AS buffer_id;
+    """
+    result = cursor.execute(query).fetchone()
+    return result['buffer_id'] if result else 0
 
-    results = [result['buffer_id'] for result in results if result['buffer_id']]
 
-    if not results:
-        return 0  # Return 0 if no buffers exist yet
+def new_buffer_id(parent_id=None, key=None):
+    """Allocate a new unique buffer ID.
     
-    highest_buffer_id = max(results)
-    return highest_buffer_id
-
+    The ID is handed out by a single INSERT into the buffers table. SQLite
+    holds the write lock for the whole statement, so two tome processes
+    creating buffers at the same time always get different IDs.
+    
+    Args:
+        parent_id: The buffer the new buffer is created in
+        key: The key the new buffer is stored at
+        
+    Returns:
+        The new buffer ID
+    """
+    with write_transaction() as (connection, cursor):
+        cursor.execute(
+            """
+            INSERT INTO buffers (id, parent_id, key, datetime)
+            VALUES (MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'buffers'), 0),
+                        COALESCE((SELECT MAX(buffer_id) FROM lore), 0)) + 1, ?, ?, ?);
+            """,
+            (parent_id, key, datetime.datetime.now())
+        )
 
-def new_buffer_id():
-    """Create a new unique buffer ID."""
-    return max_buffer_id() + 1
+    return cursor.lastrowid
 
 
 def is_key_a_buffer(key, parent_buffer_id=None):
@@ -119,12 +315,13 @@ def create_buffer_at_key(key, parent_buffer_id=None):
     if parent_buffer_id is None:
         parent_buffer_id = current_buffer_id
         
-    # Create a new buffer ID
-    buffer_id = new_buffer_id()
-    
-    # Store the buffer with parent reference
-    store(key, buffer_id, label='buffer', data_type=TYPE_BUFFER, 
-          buffer_id=parent_buffer_id, parent_id=parent_buffer_id)
+    with write_transaction():
+        # Create a new buffer ID
+        buffer_id = new_buffer_id(parent_buffer_id, key)
+        
+        # Store the buffer with parent reference
+        store(key, buffer_id, label='buffer', data_type=TYPE_BUFFER, 
+              buffer_id=parent_buffer_id, parent_id=parent_buffer_id)
     
     return buffer_id
 
@@ -135,22 +332,35 @@ def status(boolean):
     return 'on' if boolean else 'off'
 
 def kill_speech():
-    """Kill any running espeak processes"""
-    try:
-        # Try to kill any running espeak processes
-        call(["killall", "espeak"], stderr=DEVNULL)
-    except:
-        # Ignore errors if no processes were killed
-        pass
+    """Stop whatever the speech backend is saying."""
+    speech.stop()
 
-def speak(text_to_speak, speed=270, asynchronous=True):
-    # Kill any ongoing speech before starting a new one
-    kill_speech()
+def speak(text_to_speak, speed=270, asynchronous=True, priority=None):
+    """Queue text to be said by the speech backend.
     
-    if asynchronous:
-        Popen(["espeak", f"-s{speed} -ven+18 -z", text_to_speak])
-    else:
-        call(["espeak", f"-s{speed} -ven+18 -z", text_to_speak])
+    Args:
+        text_to_speak: Text to say
+        speed: Words per minute
+        asynchronous: Return immediately instead of waiting for the speech to end
+        priority: speech.NAVIGATION, STATUS or ERROR (see speech.speak())
+    """
+    if priority == speech.ERROR:
+        earcons.play('error')
+    speech.speak(text_to_speak, speed, wait=not asynchronous, priority=priority)
+
+
+def signal(event, text, content=None):
+    """Play the earcon for a status event, or say text if it has none.
+    
+    Args:
+        event: Name of an earcons.EVENTS entry
+        text: Message spoken when the event has no earcon
+        content: Spoken after the earcon, for events that carry information
+    """
+    if not earcons.play(event):
+        speak(text)
+    elif content:
+        speak(content)
 
 
 
@@ -165,12 +375,6 @@ def get_config(key, default=None):
     """Get a configuration value from the database."""
     try:
         connection, cursor = connect(skip_debug=True)  # Avoid circular reference
-        
-        # Check if the config table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='config'")
-        if not cursor.fetchone():
-            # If table doesn't exist, return default
-            return default
             
         # Get the config value
         cursor.execute("SELECT value FROM config WHERE key = ?", (key,))
@@ -187,42 +391,571 @@ def get_config(key, default=None):
 def set_config(key, value, description=None):
     """Set a configuration value in the database."""
     try:
-        connection, cursor = connect(skip_debug=True)  # Avoid circular reference
-        
-        # Check if the config table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='config'")
-        if not cursor.fetchone():
-            # Create the config table if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE config (
-                    key TEXT PRIMARY KEY,
-                    value TEXT,
-                    description TEXT
-                )
-            ''')
+        with write_transaction() as (connection, cursor):
+            # Get current description if available and none provided
+            if description is None:
+                cursor.execute("SELECT description FROM config WHERE key = ?", (key,))
+                result = cursor.fetchone()
+                if result:
+                    description = result['description']
             
-        # Get current description if available and none provided
-        if description is None:
-            cursor.execute("SELECT description FROM config WHERE key = ?", (key,))
-            result = cursor.fetchone()
-            if result:
-                description = result['description']
-        
-        # Insert or update the config value
-        cursor.execute('''
-            INSERT OR REPLACE INTO config (key, value, description)
-            VALUES (?, ?, ?)
-        ''', (key, value, description))
+            # Insert or update the config value
+            cursor.execute('''
+                INSERT OR REPLACE INTO config (key, value, description)
+                VALUES (?, ?, ?)
+            ''', (key, value, description))
         
-        connection.commit()
         return True
     except Exception as e:
         print(f"Error setting config {key}: {e}")
         return False
 
 
+def run_sql_script(cursor, path):
+    """Execute each statement of a SQL script file with the given cursor.
+    
+    Unlike executescript(), this does not commit, so the script can run inside
+    a migration's transaction.
+    """
+    with open(path, 'r') as f:
+        script = f.read()
+
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            cursor.execute(statement)
+            statement = ''
+
+
+def canonical_table_sql(table):
+    """Return the CREATE TABLE statement for a table as CREATE.sql defines it."""
+    scratch = sqlite3.connect(':memory:')
+    try:
+        with open(schema_file) as schema:
+            scratch.executescript(schema.read())
+        row = scratch.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+        return row[0]
+    finally:
+        scratch.close()
+
+
+def table_exists(cursor, table):
+    """Check whether a table (or virtual table) exists in the database."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    return cursor.fetchone() is not None
+
+
+def table_columns(cursor, table):
+    """Return the column names of a table in their physical order."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [column['name'] for column in cursor.fetchall()]
+
+
+def migrate_base_schema(connection, cursor):
+    """Create the lore and config tables, root buffer and default settings."""
+    if not table_exists(cursor, 'lore'):
+        speak("Initializing database")
+
+    run_sql_script(cursor, schema_file)
+
+
+def migrate_lore_column_order(connection, cursor):
+    """Rebuild the lore table if its columns are not in the CREATE.sql order.
+    
+    Databases created by older versions of connect() laid the columns out
+    differently from CREATE.sql.
+    """
+    create_sql = canonical_table_sql('lore')
+    scratch = sqlite3.connect(':memory:')
+    scratch.execute(create_sql)
+    canonical = [column[1] for column in scratch.execute("PRAGMA table_info(lore)")]
+    scratch.close()
+
+    existing = table_columns(cursor, 'lore')
+    if existing == canonical:
+        return
+
+    debug_print(f"Rebuilding lore table: {existing} -> {canonical}")
+    columns = ', '.join(canonical)
+    cursor.execute("ALTER TABLE lore RENAME TO lore_legacy")
+    cursor.execute(create_sql)
+    cursor.execute(f"INSERT INTO lore ({columns}) SELECT {columns} FROM lore_legacy")
+    cursor.execute("DROP TABLE lore_legacy")
+
+
+def migrate_lookup_indexes(connection, cursor):
+    """Index the register, list item and global history lookups."""
+    # retrieve(): WHERE buffer_id=? AND key=? ORDER BY id DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS lore_register ON lore (buffer_id, key, id)")
+    # get_list_items(): WHERE parent_id=? ORDER BY item_index
+    cursor.execute("CREATE INDEX IF NOT EXISTS lore_list_items ON lore (parent_id, item_index)")
+    # get_global_history(): ORDER BY datetime DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS lore_datetime ON lore (datetime)")
+
+
+def migrate_buffer_allocator(connection, cursor):
+    """Create the buffers table that hands out buffer IDs.
+    
+    Existing buffers are registered so their IDs are never handed out again.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS buffers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            parent_id INTEGER,    -- Buffer this buffer was created in (NULL for root)
+            key TEXT,             -- Key the buffer was created at (NULL for root)
+            datetime TIMESTAMP    -- When the buffer was created
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO buffers (id, datetime) VALUES (1, CURRENT_TIMESTAMP)")
+    cursor.execute(f"""
+        INSERT OR IGNORE INTO buffers (id, parent_id, key, datetime)
+        SELECT CAST(value AS INTEGER), parent_id, key, MIN(datetime)
+        FROM lore WHERE data_type = '{TYPE_BUFFER}'
+        GROUP BY CAST(value AS INTEGER)
+    """)
+
+    # Never reuse an ID that appears in lore, even without a buffer row
+    cursor.execute("""
+        UPDATE sqlite_sequence
+        SET seq = MAX(seq, COALESCE((SELECT MAX(buffer_id) FROM lore), 0))
+        WHERE name = 'buffers'
+    """)
+
+
+def migrate_durability_settings(connection, cursor):
+    """Add the writer durability settings to config."""
+    cursor.executemany(
+        "INSERT OR IGNORE INTO config (key, value, description) VALUES (?, ?, ?)",
+        [
+            ('durability', DEFAULT_DURABILITY, 'Write durability profile: full, normal or deferred'),
+            ('commit_window_ms', str(DEFAULT_COMMIT_WINDOW_MS), 'How long the deferred profile holds writes before committing'),
+        ]
+    )
+
+
+def migrate_search_index(connection, cursor):
+    """Create the full-text search index and fill it from existing values.
+    
+    The index is contentless: it stores only the tokens and points back at
+    lore rows by ID, so values are not duplicated on disk. SQLite builds
+    without FTS5 simply go without search.
+    """
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS lore_fts USING fts5(value, label, content='')")
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search unavailable: {e}")
+        return
+
+    cursor.execute(f"""
+        INSERT INTO lore_fts (rowid, value, label)
+        SELECT id, COALESCE(value, ''), COALESCE(label, '') FROM lore WHERE data_type = '{TYPE_VALUE}'
+    """)
+
+
+def migrate_retention_settings(connection, cursor):
+    """Add global and per-buffer history retention settings."""
+    cursor.execute("ALTER TABLE buffers ADD COLUMN keep_versions INTEGER")  # NULL = use global setting
+    cursor.execute("ALTER TABLE buffers ADD COLUMN keep_days INTEGER")      # NULL = use global setting
+    cursor.executemany(
+        "INSERT OR IGNORE INTO config (key, value, description) VALUES (?, ?, ?)",
+        [
+            ('retention_keep_versions', '0', 'Versions kept per key by compaction (0 = all)'),
+            ('retention_keep_days', '0', 'Days of history kept by compaction (0 = all)'),
+        ]
+    )
+
+
+def stored_size(value):
+    """Return the number of bytes a stored value takes (text counted as UTF-8)."""
+    return len(value) if isinstance(value, bytes) else len(str(value).encode('utf-8'))
+
+
+def encode_value(value):
+    """Prepare a value for lore_values, compressing it if it is large enough.
+    
+    Returns:
+        A (stored value, encoding) tuple; encoding is None for plain text
+    """
+    min_bytes = compression_state['min_bytes']
+    data = str(value).encode('utf-8')
+
+    if min_bytes and len(data) >= min_bytes:
+        compressed = zlib.compress(data, COMPRESSION_LEVEL)
+        if len(compressed) < len(data):
+            return compressed, 'zlib'
+
+    return str(value), None
+
+
+def decode_value(stored, encoding):
+    """Turn a value from lore_values back into plain text."""
+    if encoding is None:
+        return stored
+
+    started = time.perf_counter()
+    if encoding == 'zlib':
+        stored = zlib.decompress(stored).decode('utf-8')
+    else:
+        raise ValueError(f"Unknown value encoding {encoding}")
+    compression_state['decoded'] += 1
+    compression_state['decode_seconds'] += time.perf_counter() - started
+    return stored
+
+
+def value_digest(value):
+    """Return the content address (SHA-256 digest) of a value."""
+    return hashlib.sha256(str(value).encode('utf-8')).digest()
+
+
+def migrate_value_deduplication(connection, cursor):
+    """Store long values once, addressed by their hash.
+    
+    lore rows reference lore_values through value_hash. The lore_entries view
+    joins them back so readers always see plain values, and a trigger drops a
+    stored value once no lore row references it.
+    """
+    cursor.execute("ALTER TABLE lore ADD COLUMN value_hash BLOB")  # SHA-256 of the value, if stored in lore_values
+    cursor.execute('''
+        CREATE TABLE lore_values (
+            hash BLOB PRIMARY KEY,  -- SHA-256 of the value
+            value VARCHAR           -- The value, stored once
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX lore_value_hash ON lore (value_hash) WHERE value_hash IS NOT NULL")
+    cursor.execute('''
+        CREATE VIEW lore_entries AS
+        SELECT lore.id, lore.data_type, lore.buffer_id, lore.parent_id, lore.item_index,
+               COALESCE(lore_values.value, lore.value) AS value,
+               lore.label, lore.key, lore.datetime, lore.value_hash
+        FROM lore LEFT JOIN lore_values ON lore_values.hash = lore.value_hash
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER lore_values_release AFTER DELETE ON lore
+        WHEN old.value_hash IS NOT NULL
+        BEGIN
+            DELETE FROM lore_values
+            WHERE hash = old.value_hash
+              AND NOT EXISTS (SELECT 1 FROM lore WHERE value_hash = old.value_hash);
+        END
+    ''')
+
+    # Move existing long values into lore_values
+    connection.create_function('tome_value_digest', 1, value_digest, deterministic=True)
+    long_values = f"data_type = '{TYPE_VALUE}' AND length(value) >= {DEDUP_MIN_LENGTH}"
+    cursor.execute(f"INSERT OR IGNORE INTO lore_values (hash, value) SELECT tome_value_digest(value), value FROM lore WHERE {long_values}")
+    cursor.execute(f"UPDATE lore SET value_hash = tome_value_digest(value), value = NULL WHERE {long_values}")
+
+
+def migrate_value_compression(connection, cursor):
+    """Allow values in lore_values to be stored compressed.
+    
+    The encoding column marks how a value is stored, and lore_entries
+    decodes it so readers still see plain text.
+    """
+    cursor.execute("ALTER TABLE lore_values ADD COLUMN encoding TEXT")  # NULL for plain text, 'zlib' if compressed
+    cursor.execute("DROP VIEW lore_entries")
+    cursor.execute('''
+        CREATE VIEW lore_entries AS
+        SELECT lore.id, lore.data_type, lore.buffer_id, lore.parent_id, lore.item_index,
+               CASE WHEN lore_values.hash IS NULL THEN lore.value
+                    WHEN lore_values.encoding IS NULL THEN lore_values.value
+                    ELSE tome_decode(lore_values.value, lore_values.encoding) END AS value,
+               lore.label, lore.key, lore.datetime, lore.value_hash
+        FROM lore LEFT JOIN lore_values ON lore_values.hash = lore.value_hash
+    ''')
+    cursor.execute(
+        "INSERT OR IGNORE INTO config (key, value, description) VALUES (?, ?, ?)",
+        ('compress_min_bytes', str(DEFAULT_COMPRESS_MIN_BYTES), 'Compress stored values at least this many bytes long (0 = off)')
+    )
+
+
+def migrate_attachments(connection, cursor):
+    """Add the attachments table for large text and files.
+    
+    An attachment register is a lore row of type 'attachment' whose value is
+    the attachment ID. The payload is the last column so that reading the
+    size or preview never touches its overflow pages.
+    """
+    cursor.execute('''
+        CREATE TABLE attachments (
+            id INTEGER PRIMARY KEY,
+            name TEXT,          -- File name, or NULL for pasted text
+            kind TEXT,          -- 'text' or 'binary'
+            size INTEGER,       -- Payload size in bytes
+            preview TEXT,       -- First few hundred characters of text payloads
+            data BLOB           -- The payload, written and read in chunks
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER attachments_release AFTER DELETE ON lore
+        WHEN old.data_type = '{TYPE_ATTACHMENT}'
+        BEGIN
+            DELETE FROM attachments
+            WHERE id = CAST(old.value AS INTEGER)
+              AND NOT EXISTS (SELECT 1 FROM lore WHERE data_type = '{TYPE_ATTACHMENT}' AND value = old.value);
+        END
+    ''')
+    cursor.execute(
+        "INSERT OR IGNORE INTO config (key, value, description) VALUES (?, ?, ?)",
+        ('attachment_min_bytes', str(DEFAULT_ATTACHMENT_MIN_BYTES), 'Store clipboard text at least this many bytes long as an attachment')
+    )
+
+
+def migrate_backup_settings(connection, cursor):
+    """Add settings for scheduled backups."""
+    cursor.executemany(
+        "INSERT OR IGNORE INTO config (key, value, description) VALUES (?, ?, ?)",
+        [
+            ('backup_interval_hours', '0', 'Hours between scheduled backups (0 turns them off)'),
+            ('backup_keep', str(DEFAULT_BACKUP_KEEP), 'Number of backups kept when rotating'),
+            ('backup_step_pages', str(DEFAULT_BACKUP_STEP_PAGES), 'Pages copied per backup step'),
+            ('backup_directory', '', 'Directory for backups (empty for a backups directory next to the database)'),
+        ]
+    )
+
+
+def migrate_current_registers(connection, cursor):
+    """Add the current_registers table, kept up to date by triggers.
+    
+    It holds the ID of the newest lore row for every register, so reading a
+    register costs one primary-key lookup however long its history is. When
+    the newest version is deleted, the one before it takes its place.
+    """
+    cursor.execute('''
+        CREATE TABLE current_registers (
+            buffer_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            lore_id INTEGER,
+            PRIMARY KEY (buffer_id, key)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        INSERT INTO current_registers (buffer_id, key, lore_id)
+        SELECT buffer_id, key, MAX(id) FROM lore
+        WHERE key IS NOT NULL AND buffer_id IS NOT NULL
+        GROUP BY buffer_id, key
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER current_registers_insert AFTER INSERT ON lore
+        WHEN new.key IS NOT NULL AND new.buffer_id IS NOT NULL
+        BEGIN
+            INSERT INTO current_registers (buffer_id, key, lore_id) VALUES (new.buffer_id, new.key, new.id)
+            ON CONFLICT (buffer_id, key) DO UPDATE SET lore_id = excluded.lore_id
+            WHERE excluded.lore_id > current_registers.lore_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER current_registers_delete AFTER DELETE ON lore
+        WHEN old.key IS NOT NULL AND old.buffer_id IS NOT NULL
+        BEGIN
+            UPDATE current_registers
+            SET lore_id = (SELECT MAX(id) FROM lore WHERE buffer_id = old.buffer_id AND key = old.key)
+            WHERE buffer_id = old.buffer_id AND key = old.key AND lore_id = old.id;
+            DELETE FROM current_registers
+            WHERE buffer_id = old.buffer_id AND key = old.key AND lore_id IS NULL;
+        END
+    ''')
+
+
+def migrate_list_split_settings(connection, cursor):
+    """Add settings for splitting the clipboard into list items."""
+    cursor.executemany(
+        "INSERT OR IGNORE INTO config (key, value, description) VALUES (?, ?, ?)",
+        [
+            ('list_delimiter', 'newline', "Separator for bulk list appends: 'newline', 'tab', or any text"),
+            ('list_dedupe', 'off', 'Drop repeated items when bulk appending to a list'),
+        ]
+    )
+
+
+def migrate_storage_backend_settings(connection, cursor):
+    """Add settings for choosing the storage backend."""
+    cursor.executemany(
+        "INSERT OR IGNORE INTO config (key, value, description) VALUES (?, ?, ?)",
+        [
+            ('storage_backend', 'sqlite', "Where registers are stored: 'sqlite', or 'log' for the append-only log"),
+            ('log_directory', '', 'Directory of the append-only log (empty for lore.log next to the database)'),
+        ]
+    )
+
+
+def migrate_speech_backend_setting(connection, cursor):
+    """Add the setting for choosing the speech backend."""
+    cursor.execute(
+        "INSERT OR IGNORE INTO config (key, value, description) VALUES (?, ?, ?)",
+        ('speech_backend', 'espeak', "How tome speaks: 'espeak', 'spawn', 'null' or 'recording'")
+    )
+
+
+def migrate_speech_cache_settings(connection, cursor):
+    """Add settings for the cache of rendered speech."""
+    cursor.executemany(
+        "INSERT OR IGNORE INTO config (key, value, description) VALUES (?, ?, ?)",
+        [
+            ('speech_cache_mb', str(DEFAULT_SPEECH_CACHE_MB), 'Most megabytes of rendered speech kept by the cached speech backend'),
+            ('speech_cache_directory', '', 'Directory of rendered speech (empty for ~/.cache/tome/speech)'),
+        ]
+    )
+
+
+def migrate_earcon_settings(connection, cursor):
+    """Add settings for playing earcons in place of status messages."""
+    settings = [
+        ('earcons', 'off', "Play short tones instead of speaking status messages: 'on' or 'off'"),
+        ('earcon_sink', 'aplay', "Where earcons are played: 'aplay', 'file' or 'null'"),
+        ('earcon_file', '', 'WAV file written by the file earcon sink (empty for earcons.wav next to the database)'),
+    ]
+    for event, tone in earcons.EVENTS.items():
+        settings.append((f'earcon_{event}', tone, f"Earcon for {event.replace('_', ' ')}: a tone name, a WAV file, or 'speech'"))
+    cursor.executemany("INSERT OR IGNORE INTO config (key, value, description) VALUES (?, ?, ?)", settings)
+
+
+def migrate_attachment_index(connection, cursor):
+    """Index attachment rows by value.
+
+    Lets the attachments_release trigger check whether an attachment is
+    still referenced without scanning lore on every delete.
+    """
+    cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS lore_attachment_value
+        ON lore(value) WHERE data_type = '{TYPE_ATTACHMENT}'
+    ''')
+
+
+def migrate_history_count(connection, cursor):
+    """Add the history_count table, kept up to date by triggers.
+    
+    It holds the number of lore rows shown in global history (every row but
+    the root buffer record), so opening global history does not have to
+    count the whole table.
+    """
+    cursor.execute('''
+        CREATE TABLE history_count (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT INTO history_count (id, total) SELECT 1, COUNT(*) FROM lore WHERE id != 1")
+    cursor.execute('''
+        CREATE TRIGGER history_count_insert AFTER INSERT ON lore
+        WHEN new.id != 1
+        BEGIN
+            UPDATE history_count SET total = total + 1 WHERE id = 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER history_count_delete AFTER DELETE ON lore
+        WHEN old.id != 1
+        BEGIN
+            UPDATE history_count SET total = total - 1 WHERE id = 1;
+        END
+    ''')
+
+
+# Schema migrations, applied in order on startup. Each entry is
+# (version, description, function); the highest applied version is
+# recorded in config under 'schema_version'. Only ever append to this list.
+MIGRATIONS = [
+    (1, "Create base schema", migrate_base_schema),
+    (2, "Reconcile lore column order with CREATE.sql", migrate_lore_column_order),
+    (3, "Add indexes for register, list and history lookups", migrate_lookup_indexes),
+    (4, "Add buffers table for buffer ID allocation", migrate_buffer_allocator),
+    (5, "Add writer durability settings", migrate_durability_settings),
+    (6, "Add full-text search index", migrate_search_index),
+    (7, "Add history retention settings", migrate_retention_settings),
+    (8, "Store long values once by content hash", migrate_value_deduplication),
+    (9, "Compress large stored values", migrate_value_compression),
+    (10, "Add attachments stored as blobs", migrate_attachments),
+    (11, "Add backup settings", migrate_backup_settings),
+    (12, "Track the newest version of each register", migrate_current_registers),
+    (13, "Add list split settings", migrate_list_split_settings),
+    (14, "Add storage backend settings", migrate_storage_backend_settings),
+    (15, "Add speech backend setting", migrate_speech_backend_setting),
+    (16, "Add speech cache settings", migrate_speech_cache_settings),
+    (17, "Add earcon settings", migrate_earcon_settings),
+    (18, "Index attachment rows", migrate_attachment_index),
+    (19, "Count global history entries", migrate_history_count),
+]
+
+
+def schema_version(cursor):
+    """Return the schema version recorded in the database (0 if none)."""
+    if not table_exists(cursor, 'config'):
+        return 0
+
+    cursor.execute("SELECT value FROM config WHERE key = 'schema_version'")
+    result = cursor.fetchone()
+    return int(result['value']) if result else 0
+
+
+def migrate(connection, cursor):
+    """Bring the database schema up to date by running pending migrations.
+    
+    Each migration runs in its own transaction together with the update of
+    the schema_version record, so an interrupted upgrade resumes cleanly.
+    
+    Returns:
+        The schema version after migrating
+    """
+    register_sql_functions(connection)
+    version = schema_version(cursor)
+
+    # A new, empty database can switch to incremental auto-vacuum without a VACUUM
+    if version == 0 and not table_exists(cursor, 'lore'):
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    for number, description, migration in MIGRATIONS:
+        if number <= version:
+            continue
+
+        debug_print(f"Applying migration {number}: {description}")
+        try:
+            cursor.execute("BEGIN")
+            migration(connection, cursor)
+            cursor.execute(
+                "INSERT OR REPLACE INTO config (key, value, description) VALUES ('schema_version', ?, ?)",
+                (str(number), 'Database schema version (managed by migrations)')
+            )
+            connection.commit()
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+        version = number
+
+    return version
+
+
+def open_connection(**kwargs):
+    """Open a new connection to the database with tome's settings.
+    
+    Background workers use their own connection from here rather than the
+    shared one returned by connect().
+    """
+    # Use a timeout to handle potential locks
+    connection = sqlite3.connect(database, timeout=10, cached_statements=STATEMENT_CACHE_SIZE, **kwargs)
+    connection.row_factory = record_factory
+    register_sql_functions(connection)
+    return connection
+
+
+def register_sql_functions(connection):
+    """Register the SQL functions the lore_entries view relies on."""
+    connection.create_function('tome_decode', 2, decode_value, deterministic=True)
+
+
 def connect(skip_debug=False):
-    """Connect to the database. Returns a tuple containing connection and cursor objects."""
+    """Connect to the database. Returns a tuple containing connection and cursor objects.
+    
+    The connection is opened once per process and reused by every storage
+    function. It is reopened only if the database path changes.
+    """
+    if connection_state['connection'] is not None and connection_state['database'] == database:
+        return connection_state['connection'], connection_state['cursor']
+
+    # The path changed (or this is the first call), so drop any stale connection
+    close_connection()
+
     try:
         if not skip_debug:  # Skip debug prints when called from get_config to avoid circular reference
             debug_print(f"Connecting to database: {database}")
@@ -236,31 +969,21 @@ def connect(skip_debug=False):
         if not os.path.exists(db_dir):
             os.makedirs(db_dir)
             
-        # Use a timeout to handle potential locks and specify URI mode for better diagnostics
-        connection = sqlite3.connect(database, timeout=10)
-        connection.row_factory = dict_factory
-
+        # The keyboard listener calls us from its own thread while start() runs in
+        # the main thread, so the connection is shared between threads.
+        connection = open_connection(check_same_thread=False)
         cursor = connection.cursor()
         
-        # Check if the lore table exists, if not create it
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='lore'")
-        if not cursor.fetchone():
-            speak("Initializing database")
-            # Create the table
-            cursor.execute('''
-                CREATE TABLE lore (
-                    id INTEGER PRIMARY KEY,
-                    key TEXT,
-                    value TEXT,
-                    label TEXT,
-                    data_type TEXT,
-                    datetime TEXT,
-                    buffer_id INTEGER,
-                    parent_id INTEGER,
-                    item_index INTEGER
-                )
-            ''')
-            connection.commit()
+        # Check the schema once, when the connection is opened
+        migrate(connection, cursor)
+        apply_durability(connection, cursor)
+        load_compression_settings(cursor)
+        open_storage_backend(cursor)
+
+        connection_state['connection'] = connection
+        connection_state['cursor'] = cursor
+        connection_state['database'] = database
+        connection_state['search'] = table_exists(cursor, 'lore_fts')
             
         return connection, cursor
     except sqlite3.Error as e:
@@ -269,121 +992,1284 @@ def connect(skip_debug=False):
         print(error_msg)  # Always print errors
         print(f"SQLite version: {sqlite3.sqlite_version}")
         print(f"Python SQLite version: {sqlite3.version}")
-        speak(error_msg)
+        speak(error_msg, priority=speech.ERROR)
+        raise
+
+
+def close_connection():
+    """Close the process-wide database connection if one is open.
+    
+    Writes held back by the deferred durability profile are flushed first.
+    """
+    connection = connection_state['connection']
+    if connection is None:
+        return
+
+    try:
+        flush_writes()
+        connection.close()
+    except sqlite3.Error as e:
+        print(f"Error closing database: {e}")
+
+    connection_state['connection'] = None
+    connection_state['cursor'] = None
+    connection_state['database'] = None
+    connection_state['search'] = False
+
+    if storage_state['log'] is not None:
+        storage_state['log'].close()
+        storage_state['log'] = None
+
+
+def open_storage_backend(cursor):
+    """Open the append-only log if the 'storage_backend' setting selects it.
+    
+    The log holds new versions of value registers. Lists and their items,
+    buffers and attachments are always stored in SQLite, as is everything
+    written before the log was turned on; retrieve() and delete_entry()
+    look in both. Features that query the lore table directly (search,
+    global history, export) only see lore stored in SQLite.
+    """
+    cursor.execute("SELECT key, value FROM config WHERE key IN ('storage_backend', 'log_directory')")
+    settings = {row['key']: row['value'] for row in cursor.fetchall()}
+
+    if settings.get('storage_backend') == 'log' and storage_state['log'] is None:
+        directory = settings.get('log_directory') or os.path.join(os.path.dirname(database), 'lore.log')
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS top FROM lore;")
+        first_id = max(LOG_FIRST_ID, cursor.fetchone()['top'] + 1)
+        storage_state['log'] = LogStore(directory, first_id=first_id, sync=log_sync(writer_state['profile']))
+
+
+def log_sync(profile):
+    """Return whether the log must fsync every write under a durability profile."""
+    return DURABILITY_PROFILES[profile]['synchronous'] == 'FULL'
+
+
+def merge_log_entries(logged, stored, fetch):
+    """Combine a register's entries from the log with those still in SQLite.
+    
+    Args:
+        logged: Result of LogStore.retrieve()
+        stored: Result of the same fetch from the lore table
+        fetch: 'last', 'history' (newest first) or 'all' (oldest first)
+        
+    Returns:
+        stored unchanged if the log is not in use, otherwise the merged result
+    """
+    if storage_state['log'] is None:
+        return stored
+
+    def entry_order(entry):
+        return (str(entry['datetime']), entry['id'])
+
+    if fetch == 'last':
+        return max((entry for entry in (logged, stored) if entry), key=entry_order, default=None)
+    return sorted(list(logged) + list(stored), key=entry_order, reverse=fetch == 'history')
+
+
+def load_compression_settings(cursor):
+    """Read the compression threshold from config."""
+    cursor.execute("SELECT value FROM config WHERE key = 'compress_min_bytes'")
+    row = cursor.fetchone()
+    compression_state['min_bytes'] = int(row['value']) if row else DEFAULT_COMPRESS_MIN_BYTES
+
+
+def apply_durability(connection, cursor, profile=None):
+    """Configure the connection for a durability profile.
+    
+    Args:
+        connection: SQLite connection object
+        cursor: SQLite cursor object
+        profile: Name of a DURABILITY_PROFILES entry (read from config if None)
+    """
+    if profile is None:
+        cursor.execute("SELECT key, value FROM config WHERE key IN ('durability', 'commit_window_ms')")
+        settings = {row['key']: row['value'] for row in cursor.fetchall()}
+        profile = settings.get('durability', DEFAULT_DURABILITY)
+        writer_state['commit_window'] = int(settings.get('commit_window_ms', DEFAULT_COMMIT_WINDOW_MS)) / 1000
+
+    if profile not in DURABILITY_PROFILES:
+        print(f"Unknown durability profile {profile}, using {DEFAULT_DURABILITY}")
+        profile = DEFAULT_DURABILITY
+
+    # The journal mode cannot change inside a transaction
+    if connection.in_transaction:
+        connection.commit()
+
+    settings = DURABILITY_PROFILES[profile]
+    cursor.execute(f"PRAGMA journal_mode={settings['journal_mode']}")
+    cursor.execute(f"PRAGMA synchronous={settings['synchronous']}")
+    writer_state['profile'] = profile
+    if storage_state['log'] is not None:
+        storage_state['log'].sync = log_sync(profile)
+    debug_print(f"Durability profile: {profile}")
+
+
+@contextmanager
+def write_transaction():
+    """Group the writes made inside the block into one transaction.
+    
+    Blocks can be nested; only the outermost block decides when to commit.
+    Each outermost block is wrapped in a savepoint, so a failed operation is
+    rolled back without discarding writes still held by the deferred profile.
+    
+    Yields:
+        The (connection, cursor) tuple from connect()
+    """
+    with writer_state['lock']:
+        connection, cursor = connect()
+        outermost = writer_state['depth'] == 0
+
+        if outermost:
+            if not connection.in_transaction:
+                cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SAVEPOINT tome_write")
+
+        writer_state['depth'] += 1
+        try:
+            yield connection, cursor
+        except BaseException:
+            writer_state['depth'] -= 1
+            if outermost:
+                cursor.execute("ROLLBACK TO tome_write")
+                cursor.execute("RELEASE tome_write")
+            raise
+
+        writer_state['depth'] -= 1
+        if outermost:
+            cursor.execute("RELEASE tome_write")
+            writer_state['pending'] += 1
+            commit_writes(connection)
+
+
+def commit_writes(connection):
+    """Commit finished writes according to the durability profile."""
+    if not DURABILITY_PROFILES[writer_state['profile']]['deferred']:
+        connection.commit()
+        writer_state['pending'] = 0
+        return
+
+    # Deferred: hold the transaction open until the commit window elapses
+    if writer_state['timer'] is None:
+        timer = threading.Timer(writer_state['commit_window'], flush_writes)
+        timer.daemon = True
+        writer_state['timer'] = timer
+        timer.start()
+
+
+def flush_writes():
+    """Commit any writes held back by the deferred durability profile.
+    
+    Returns:
+        The number of logical writes that were committed
+    """
+    with writer_state['lock']:
+        timer = writer_state['timer']
+        writer_state['timer'] = None
+        if timer is not None:
+            timer.cancel()
+
+        connection = connection_state['connection']
+        if connection is None or writer_state['depth'] > 0:
+            return 0
+
+        flushed = writer_state['pending']
+        if connection.in_transaction:
+            connection.commit()
+        writer_state['pending'] = 0
+        if flushed:
+            debug_print(f"Flushed {flushed} deferred writes")
+        return flushed
+
+
+atexit.register(close_connection)
+
+
+def register_cache_key(buffer_id, key):
+    """Build the register cache key for a buffer ID and key.
+    
+    Buffer IDs read back from the value column are strings, so both parts
+    are normalized to strings.
+    """
+    return (str(buffer_id), str(key))
+
+
+def validate_register_cache(connection, cursor):
+    """Drop cached registers that may be stale.
+    
+    PRAGMA data_version changes whenever another connection (e.g. another tome
+    process) commits to the database, while our own writes keep the cache
+    current through store() and delete_entry().
+    """
+    cursor.execute("PRAGMA data_version")
+    data_version = cursor.fetchone()['data_version']
+
+    if register_cache['connection'] is not connection or register_cache['data_version'] != data_version:
+        register_cache['entries'].clear()
+        register_cache['connection'] = connection
+        register_cache['data_version'] = data_version
+
+
+def cache_register(cache_key, row):
+    """Remember the newest row for a register, evicting the least recently used."""
+    entries = register_cache['entries']
+    entries[cache_key] = row
+    entries.move_to_end(cache_key)
+    while len(entries) > REGISTER_CACHE_SIZE:
+        entries.popitem(last=False)
+
+
+def invalidate_register(buffer_id, key):
+    """Forget the cached row for a register."""
+    register_cache['entries'].pop(register_cache_key(buffer_id, key), None)
+
+
+def register_cache_stats():
+    """Return hit/miss counters and the current size of the register cache."""
+    return {
+        'hits': register_cache['hits'],
+        'misses': register_cache['misses'],
+        'size': len(register_cache['entries']),
+    }
+
+
+def search_index_available(cursor):
+    """Check whether the full-text index can be used with this cursor."""
+    if connection_state['connection'] is not None:
+        return connection_state['search']
+    # Connections not opened by connect() (e.g. in tests) are checked directly
+    return table_exists(cursor, 'lore_fts')
+
+
+def index_entry(cursor, entry_id, value, label):
+    """Add a value entry to the full-text index."""
+    if search_index_available(cursor):
+        cursor.execute(
+            'INSERT INTO lore_fts (rowid, value, label) VALUES (?, ?, ?);',
+            (entry_id, str(value or ''), str(label or ''))
+        )
+
+
+def unindex_entry(cursor, entry_id, value, label):
+    """Remove a value entry from the full-text index.
+    
+    The index is contentless, so the original text must be supplied.
+    """
+    if search_index_available(cursor):
+        cursor.execute(
+            "INSERT INTO lore_fts (lore_fts, rowid, value, label) VALUES ('delete', ?, ?, ?);",
+            (entry_id, str(value or ''), str(label or ''))
+        )
+
+
+def retrieve(key, buffer_id=None, fetch='last', parent_id=None):
+    """Retrieve item from database.
+    
+    Args:
+        key: The key to retrieve
+        buffer_id: The buffer ID to retrieve from (uses current_buffer_id if None)
+        fetch: How to fetch - 'last' for most recent entry, 'history' for all entries, 
+               'all' for all entries, 'last_value' for just the value, 'list_items' for items in a list
+        parent_id: For 'list_items' fetch, the ID of the parent list to retrieve items from
+               
+    Returns:
+        The retrieved entry or entries, or None if not found
+    """
+    global current_buffer_id
+    
+    try:
+        if buffer_id is None:
+            buffer_id = current_buffer_id
+            
+        connection, cursor = connect()
+
+        # Handle key object in a more robust way
+        if hasattr(key, 'char'):  # Check for char attribute instead of isinstance
+            key = key.char
+            debug_print(f"Retrieved key.char: {key}")
+
+        # Print diagnostic information
+        debug_print(f"Retrieving: key={key}, buffer_id={buffer_id}, fetch={fetch}, parent_id={parent_id}")
+
+        logged = None
+        if storage_state['log'] is not None and fetch != 'list_items':
+            if fetch == 'last_value':
+                entry = retrieve(key, buffer_id, 'last')
+                return {'value': entry['value']} if entry else None
+            # The register may have versions both in the log and in SQLite
+            logged = storage_state['log'].retrieve(key, buffer_id, fetch)
+
+        # The newest entry of a register is served from the register cache when possible
+        if fetch == 'last':
+            validate_register_cache(connection, cursor)
+            cache_key = register_cache_key(buffer_id, key)
+            if cache_key in register_cache['entries']:
+                register_cache['hits'] += 1
+                register_cache['entries'].move_to_end(cache_key)
+                debug_print(f"Register cache hit: {cache_key}")
+                return merge_log_entries(logged, register_cache['entries'][cache_key], fetch)
+            register_cache['misses'] += 1
+
+        if fetch == 'list_items' and parent_id is not None:
+            # Special query for list items, ordered by item_index
+            query = "SELECT * FROM lore_entries WHERE parent_id=? ORDER BY item_index ASC;"
+            results = cursor.execute(query, (parent_id,))
+            results = results.fetchall()
+            debug_print(f"Fetched {len(results) if results else 0} list items")
+            return results
+        elif fetch == 'last':
+            # The newest version is looked up through current_registers
+            query = (
+                "SELECT lore_entries.* FROM current_registers "
+                "JOIN lore_entries ON lore_entries.id = current_registers.lore_id "
+                "WHERE current_registers.buffer_id=? and current_registers.key=?;"
+            )
+        elif fetch == 'last_value':
+            query = "SELECT value FROM lore_entries WHERE buffer_id=? and key=?;"
+        else:
+            query = "SELECT * FROM lore_entries WHERE buffer_id=? and key=?;"
+
+        if fetch == 'history':
+            query = query[:-1] + " ORDER BY id DESC;"
+
+        # Print the query and parameters for diagnostics
+        debug_print(f"SQL Query: {query}")
+        debug_print(f"Parameters: buffer_id={buffer_id}, key={str(key)}")
+        
+        results = cursor.execute(query, (buffer_id, str(key)))
+
+        if not results:
+            debug_print("No results returned from query")
+            return None
+
+        if fetch == 'all' or fetch == 'history':
+            results = results.fetchall()
+            debug_print(f"Fetched {len(results)} records")
+        else:
+            results = results.fetchone()
+            debug_print(f"Fetched record: {results}")
+            if fetch == 'last':
+                cache_register(cache_key, results)
+
+        return merge_log_entries(logged, results, fetch)
+    except Exception as e:
+        print(f"Error in retrieve: {e}")  # Always print errors
+        speak(f"Error retrieving data: {e}", priority=speech.ERROR)
+        return None
+
+
+def store(key, value, label=None, data_type=TYPE_VALUE, buffer_id=None, parent_id=None, item_index=None):
+    """Store a key-value pair in the database.
+    
+    Args:
+        key: The key to store the value under
+        value: The value to store
+        label: Optional label for the value
+        data_type: Type of data - TYPE_VALUE for normal values, TYPE_BUFFER for nested buffers, TYPE_LIST for lists
+        buffer_id: The buffer ID to store in (uses current_buffer_id if None)
+        parent_id: The ID of the parent (buffer or list) this entry belongs to
+        item_index: For list items, the position in the list (0-based index)
+    """
+    global current_buffer_id
+
+    if buffer_id is None:
+        buffer_id = current_buffer_id
+    
+    # If creating a buffer and no parent specified, use current buffer as parent
+    if parent_id is None and data_type == TYPE_BUFFER:
+        parent_id = current_buffer_id
+
+    # Opening the connection also opens the log if it is the selected backend;
+    # only value registers go to the log, everything else stays in SQLite
+    connect()
+    if storage_state['log'] is not None and data_type == TYPE_VALUE and key is not None:
+        return storage_state['log'].store(key, value, label, data_type, buffer_id, parent_id, item_index)
+
+    with write_transaction() as (connection, cursor):
+        now = datetime.datetime.now()
+        inline_value, value_hash = value, None
+
+        if data_type == TYPE_VALUE and value is not None and len(str(value)) >= DEDUP_MIN_LENGTH:
+            value_hash = value_digest(value)
+            inline_value = None
+
+        # Storing the register's current value again only touches its timestamp
+        duplicate = None
+        if key is not None and data_type == TYPE_VALUE:
+            cursor.execute(
+                'SELECT lore.id, data_type, value, value_hash, label FROM current_registers '
+                'JOIN lore ON lore.id = current_registers.lore_id WHERE current_registers.buffer_id=? and current_registers.key=?;',
+                (buffer_id, str(key))
+            )
+            current = cursor.fetchone()
+            if (current and current['data_type'] == TYPE_VALUE and current['label'] == label
+                    and current['value_hash'] == value_hash and current['value'] == inline_value):
+                duplicate = current['id']
+
+        if duplicate is not None:
+            cursor.execute('UPDATE lore SET datetime = ? WHERE id = ?;', (now, duplicate))
+            entry_id = duplicate
+        else:
+            if value_hash is not None:
+                cursor.execute(
+                    'INSERT OR IGNORE INTO lore_values (hash, value, encoding) VALUES (?, ?, ?);',
+                    (value_hash, *encode_value(value))
+                )
+            cursor.execute(
+                'INSERT INTO lore (data_type, value, value_hash, label, key, datetime, buffer_id, parent_id, item_index) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);',
+                (data_type, inline_value, value_hash, label, key, now, buffer_id, parent_id, item_index)
+            )
+            entry_id = cursor.lastrowid
+
+            if data_type == TYPE_VALUE:
+                index_entry(cursor, entry_id, value, label)
+
+        # Write the new newest entry through to the register cache
+        if key is not None:
+            validate_register_cache(connection, cursor)
+            cursor.execute('SELECT * FROM lore_entries WHERE id = ?;', (entry_id,))
+            cache_register(register_cache_key(buffer_id, key), cursor.fetchone())
+    
+    # Return the ID of the inserted row
+    return entry_id
+
+
+def delete_entry(entry_id):
+    """Delete an entry from the database by its ID."""
+    connect()
+    if storage_state['log'] is not None and storage_state['log'].delete(entry_id):
+        return True
+
+    with write_transaction() as (connection, cursor):
+        # Look up the entry first so its cached register and search tokens can be removed
+        cursor.execute('SELECT data_type, buffer_id, key, value, label FROM lore_entries WHERE id = ?;', (entry_id,))
+        entry = cursor.fetchone()
+        
+        cursor.execute('DELETE FROM lore WHERE id = ?;', (entry_id,))
+        deleted = cursor.rowcount > 0
+
+        if deleted and entry['data_type'] == TYPE_VALUE:
+            unindex_entry(cursor, entry_id, entry['value'], entry['label'])
+
+    if entry and entry['key'] is not None:
+        invalidate_register(entry['buffer_id'], entry['key'])
+    
+    return deleted  # Return True if at least one row was deleted
+
+
+def retention_policy(cursor, buffer_id, defaults):
+    """Return (keep_versions, keep_days) for a buffer, falling back to the global setting.
+    
+    A value of 0 means the rule keeps everything.
+    """
+    cursor.execute("SELECT keep_versions, keep_days FROM buffers WHERE id = ?", (buffer_id,))
+    row = cursor.fetchone() or {}
+    keep_versions = row.get('keep_versions')
+    keep_days = row.get('keep_days')
+    return (
+        defaults[0] if keep_versions is None else keep_versions,
+        defaults[1] if keep_days is None else keep_days,
+    )
+
+
+def set_buffer_retention(buffer_id, keep_versions=None, keep_days=None):
+    """Override the retention policy for one buffer (None uses the global setting)."""
+    with write_transaction() as (connection, cursor):
+        cursor.execute(
+            "UPDATE buffers SET keep_versions = ?, keep_days = ? WHERE id = ?",
+            (keep_versions, keep_days, buffer_id)
+        )
+
+
+def is_entry_referenced(cursor, entry):
+    """Check whether other rows depend on an entry.
+    
+    List items point at their list through parent_id, and the registers of a
+    buffer point at it through buffer_id, so those rows must be kept.
+    """
+    cursor.execute("SELECT 1 FROM lore WHERE parent_id = ? LIMIT 1", (entry['id'],))
+    if cursor.fetchone():
+        return True
+
+    if entry['data_type'] == TYPE_BUFFER:
+        cursor.execute(
+            "SELECT 1 FROM lore WHERE buffer_id = ? OR parent_id = ? LIMIT 1",
+            (entry['value'], entry['value'])
+        )
+        if cursor.fetchone():
+            return True
+
+    return False
+
+
+def superseded_versions(cursor, buffer_id, key, keep_versions, keep_days):
+    """Return the versions of a register that the retention policy allows deleting.
+    
+    The newest version is always kept. Otherwise a version is kept if any
+    rule keeps it: it is among the newest keep_versions, or it is newer than
+    keep_days.
+    """
+    if not keep_versions and not keep_days:
+        return []
+
+    # Only buffers need their value here (to check for contents); the text of
+    # value versions is read when they are deleted
+    cursor.execute(
+        f"SELECT id, data_type, datetime, CASE WHEN data_type = '{TYPE_BUFFER}' THEN value END AS value "
+        "FROM lore WHERE buffer_id = ? AND key = ? ORDER BY id DESC;",
+        (buffer_id, key)
+    )
+    versions = cursor.fetchall()
+
+    cutoff = None
+    if keep_days:
+        cutoff = str(datetime.datetime.now() - datetime.timedelta(days=keep_days))
+
+    expired = []
+    for number, entry in enumerate(versions[1:], start=2):
+        if keep_versions and number <= keep_versions:
+            continue
+        if cutoff and (entry['datetime'] is None or str(entry['datetime']) >= cutoff):
+            continue
+        if entry['id'] == 1 or is_entry_referenced(cursor, entry):
+            continue
+        expired.append(entry)
+
+    return expired
+
+
+def compact(connection=None, batch_size=None, pause=None):
+    """Delete history versions that fall outside the retention policy.
+    
+    Registers are visited in (buffer_id, key) order and deletions are
+    committed in batches of at most batch_size rows, so other tome processes
+    are never locked out for long. Freed pages are then returned to the
+    file system with incremental vacuum.
+    
+    Args:
+        connection: Connection to use (a new one is opened if None)
+        batch_size: Maximum rows deleted per transaction
+        pause: Seconds to sleep between batches
+        
+    Returns:
+        The number of rows deleted
+    """
+    if batch_size is None:
+        batch_size = COMPACTION_BATCH_SIZE
+    if pause is None:
+        pause = COMPACTION_PAUSE
+
+    own_connection = connection is None
+    if own_connection:
+        connection = open_connection()
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT key, value FROM config WHERE key IN ('retention_keep_versions', 'retention_keep_days')")
+        settings = {row['key']: int(row['value'] or 0) for row in cursor.fetchall()}
+        defaults = (settings.get('retention_keep_versions', 0), settings.get('retention_keep_days', 0))
+
+        compaction_state['deleted'] = 0
+        position = (-1, '')
+        pending = []
+
+        while True:
+            # Walk to the next register using the (buffer_id, key, id) index
+            cursor.execute(
+                "SELECT buffer_id, key FROM lore WHERE key IS NOT NULL AND (buffer_id, key) > (?, ?) ORDER BY buffer_id, key LIMIT 1;",
+                position
+            )
+            register = cursor.fetchone()
+
+            if register:
+                position = (register['buffer_id'], register['key'])
+                policy = retention_policy(cursor, register['buffer_id'], defaults)
+                pending += superseded_versions(cursor, register['buffer_id'], register['key'], *policy)
+
+            while len(pending) >= batch_size or (pending and not register):
+                batch, pending = pending[:batch_size], pending[batch_size:]
+                delete_batch(connection, cursor, batch)
+                compaction_state['deleted'] += len(batch)
+                time.sleep(pause)
+
+            if not register:
+                break
+
+        reclaim_space(connection, cursor)
+        debug_print(f"Compaction deleted {compaction_state['deleted']} rows")
+        return compaction_state['deleted']
+    finally:
+        if own_connection:
+            connection.close()
+
+
+def delete_batch(connection, cursor, entries):
+    """Delete a batch of lore rows, and their search tokens, in one transaction."""
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for entry in entries:
+            if entry['data_type'] == TYPE_VALUE:
+                cursor.execute("SELECT value, label FROM lore_entries WHERE id = ?", (entry['id'],))
+                row = cursor.fetchone()
+                unindex_entry(cursor, entry['id'], row['value'], row['label'])
+        cursor.executemany("DELETE FROM lore WHERE id = ?;", [(entry['id'],) for entry in entries])
+        connection.commit()
+    except sqlite3.Error:
+        connection.rollback()
         raise
 
 
-def retrieve(key, buffer_id=None, fetch='last', parent_id=None):
-    """Retrieve item from database.
+def reclaim_space(connection, cursor):
+    """Return free pages to the file system a few at a time.
+    
+    Only databases using incremental auto-vacuum can do this; older ones
+    are converted on request with enable_incremental_vacuum().
+    """
+    cursor.execute("PRAGMA auto_vacuum")
+    if cursor.fetchone()['auto_vacuum'] != 2:
+        debug_print("Incremental vacuum is off; free pages are kept until the database is converted")
+        return
+
+    while True:
+        cursor.execute("PRAGMA freelist_count")
+        if not cursor.fetchone()['freelist_count']:
+            break
+        cursor.execute(f"PRAGMA incremental_vacuum({COMPACTION_VACUUM_PAGES})")
+        cursor.fetchall()
+        time.sleep(COMPACTION_PAUSE)
+
+
+def enable_incremental_vacuum():
+    """Convert the database to incremental auto-vacuum with one full VACUUM.
+    
+    New databases use incremental auto-vacuum from the start. Older ones
+    need this once before compaction can hand free pages back; it rewrites
+    the whole file, so it only runs when asked for from options mode.
+    
+    Returns:
+        True if the database was converted, False if it already was
+    """
+    flush_writes()
+    connection, cursor = connect()
+    cursor.execute("PRAGMA auto_vacuum")
+    if cursor.fetchone()['auto_vacuum'] == 2:
+        return False
+
+    with writer_state['lock']:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+    return True
+
+
+def start_compaction():
+    """Run compaction in a background thread if it is not already running.
+    
+    Returns:
+        True if a new compaction was started
+    """
+    thread = compaction_state['thread']
+    if thread is not None and thread.is_alive():
+        return False
+
+    def run():
+        try:
+            compact()
+        except sqlite3.Error as e:
+            print(f"Error in compaction: {e}")
+
+    thread = threading.Thread(target=run, name='tome-compaction', daemon=True)
+    compaction_state['thread'] = thread
+    thread.start()
+    return True
+
+
+def recompress(connection=None, batch_size=None):
+    """Re-encode stored values to match the current compression threshold.
+    
+    Values are visited in hash order and rewritten in batches, each in its
+    own transaction, so this can run on a large tome in the background.
+    
+    Args:
+        connection: Connection to use (a new one is opened if None)
+        batch_size: Maximum values rewritten per transaction
+        
+    Returns:
+        Dict with the number of values rewritten and their stored size before and after
+    """
+    if batch_size is None:
+        batch_size = COMPRESSION_BATCH_SIZE
+
+    own_connection = connection is None
+    if own_connection:
+        connection = open_connection()
+    cursor = connection.cursor()
+    stats = {'rewritten': 0, 'bytes_before': 0, 'bytes_after': 0}
+
+    try:
+        position = b''
+        while True:
+            cursor.execute(
+                "SELECT hash, value, encoding FROM lore_values WHERE hash > ? ORDER BY hash LIMIT ?;",
+                (position, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            position = rows[-1]['hash']
+
+            updates = []
+            for row in rows:
+                stored, encoding = encode_value(decode_value(row['value'], row['encoding']))
+                if encoding != row['encoding']:
+                    updates.append((stored, encoding, row['hash']))
+                    stats['bytes_before'] += stored_size(row['value'])
+                    stats['bytes_after'] += stored_size(stored)
+
+            if updates:
+                cursor.executemany("UPDATE lore_values SET value = ?, encoding = ? WHERE hash = ?;", updates)
+                connection.commit()
+                stats['rewritten'] += len(updates)
+                time.sleep(COMPACTION_PAUSE)
+
+        return stats
+    finally:
+        if own_connection:
+            connection.close()
+
+
+def storage_stats(cursor):
+    """Report database size and how stored values are encoded.
+    
+    Returns:
+        Dict with the database size in bytes and, per encoding, the number
+        of stored values and their stored size in bytes
+    """
+    cursor.execute("PRAGMA page_count")
+    page_count = cursor.fetchone()['page_count']
+    cursor.execute("PRAGMA page_size")
+    page_size = cursor.fetchone()['page_size']
+
+    cursor.execute(
+        "SELECT COALESCE(encoding, 'plain') AS encoding, COUNT(*) AS values_stored, SUM(length(value)) AS bytes "
+        "FROM lore_values GROUP BY encoding;"
+    )
+    encodings = {row['encoding']: {'values': row['values_stored'], 'bytes': row['bytes']} for row in cursor.fetchall()}
+
+    return {
+        'database_bytes': page_count * page_size,
+        'encodings': encodings,
+        'decoded': compression_state['decoded'],
+        'decode_seconds': compression_state['decode_seconds'],
+    }
+
+
+def start_recompression():
+    """Recompress stored values in a background thread and announce the result."""
+    def run():
+        try:
+            stats = recompress()
+            saved = (stats['bytes_before'] - stats['bytes_after']) // 1024
+            speak(f"Recompressed {stats['rewritten']} values, saved {saved} kilobytes")
+        except sqlite3.Error as e:
+            print(f"Error in recompression: {e}")
+
+    threading.Thread(target=run, name='tome-recompress', daemon=True).start()
+
+
+def backup_directory():
+    """Return the directory backups are written to."""
+    return get_config('backup_directory') or os.path.join(os.path.dirname(database), 'backups')
+
+
+def list_backups(directory=None):
+    """Return the paths of rotated backups, oldest first."""
+    directory = directory or backup_directory()
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if name.startswith(BACKUP_PREFIX) and name.endswith('.db'))
+    return [os.path.join(directory, name) for name in names]
+
+
+def backup(path=None, pages=None, progress=None):
+    """Copy the live database to a backup file with the SQLite backup API.
+    
+    The copy is made a few pages at a time from a separate connection, so
+    the database is only locked for the length of one step. If another
+    connection writes in the meantime, SQLite restarts the copy. The backup
+    is written to a temporary file and moved into place once complete.
     
     Args:
-        key: The key to retrieve
-        buffer_id: The buffer ID to retrieve from (uses current_buffer_id if None)
-        fetch: How to fetch - 'last' for most recent entry, 'history' for all entries, 
-               'all' for all entries, 'last_value' for just the value, 'list_items' for items in a list
-        parent_id: For 'list_items' fetch, the ID of the parent list to retrieve items from
-               
+        path: Backup file to write (a new timestamped file in the backup directory if None)
+        pages: Pages copied per step (the 'backup_step_pages' setting if None)
+        progress: Optional function called with (remaining, total) pages after each step
+        
     Returns:
-        The retrieved entry or entries, or None if not found
+        Dict with the backup path, its size in pages, the number of steps and the duration in seconds
     """
-    global current_buffer_id
-    
+    if pages is None:
+        pages = int(get_config('backup_step_pages', DEFAULT_BACKUP_STEP_PAGES))
+    if path is None:
+        directory = backup_directory()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{BACKUP_PREFIX}{datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db")
+
+    # Anything held back by the deferred durability profile belongs in the backup
+    flush_writes()
+
+    partial_path = path + '.partial'
+    steps = 0
+
+    def step(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        backup_state['remaining'] = remaining
+        backup_state['total'] = total
+        if progress:
+            progress(remaining, total)
+        time.sleep(BACKUP_PAUSE)
+
+    started = time.perf_counter()
+    source = open_connection()
+    target = sqlite3.connect(partial_path)
     try:
-        if buffer_id is None:
-            buffer_id = current_buffer_id
-            
-        connection, cursor = connect()
+        source.backup(target, pages=pages, progress=step)
+    finally:
+        target.close()
+        source.close()
+    os.replace(partial_path, path)
 
-        # Handle key object in a more robust way
-        if hasattr(key, 'char'):  # Check for char attribute instead of isinstance
-            key = key.char
-            debug_print(f"Retrieved key.char: {key}")
+    backup_state['duration'] = time.perf_counter() - started
+    debug_print(f"Backed up {backup_state['total']} pages to {path} in {backup_state['duration']:.3f}s ({steps} steps)")
+    return {'path': path, 'pages': backup_state['total'], 'steps': steps, 'duration': backup_state['duration']}
 
-        # Print diagnostic information
-        debug_print(f"Retrieving: key={key}, buffer_id={buffer_id}, fetch={fetch}, parent_id={parent_id}")
 
-        if fetch == 'list_items' and parent_id is not None:
-            # Special query for list items, ordered by item_index
-            query = "SELECT * FROM lore WHERE parent_id=? ORDER BY item_index ASC;"
-            results = cursor.execute(query, (parent_id,))
-            results = results.fetchall()
-            debug_print(f"Fetched {len(results) if results else 0} list items")
-            return results
-        elif fetch == 'last_value':
-            query = "SELECT value FROM lore WHERE buffer_id=? and key=?;"
-        else:
-            query = "SELECT * FROM lore WHERE buffer_id=? and key=?;"
+def rotate_backups(keep=None, directory=None):
+    """Delete the oldest backups beyond the number to keep.
+    
+    Returns:
+        List of deleted backup paths
+    """
+    if keep is None:
+        keep = int(get_config('backup_keep', DEFAULT_BACKUP_KEEP))
+    backups = list_backups(directory)
+    expired = backups[:max(len(backups) - keep, 0)]
+    for path in expired:
+        os.remove(path)
+    return expired
 
-        if fetch == 'last':
-            query = query[:-1] + " ORDER BY id DESC LIMIT 1;"
-        elif fetch == 'history':
-            query = query[:-1] + " ORDER BY id DESC;"
 
-        # Print the query and parameters for diagnostics
-        debug_print(f"SQL Query: {query}")
-        debug_print(f"Parameters: buffer_id={buffer_id}, key={str(key)}")
+def restore_backup(path):
+    """Replace the live database with the contents of a backup.
+    
+    The backup is checked before anything is overwritten, then copied in
+    with the backup API so the database file is never left half written.
+    Older backups are migrated when the database is reopened.
+    
+    Args:
+        path: Backup file to restore
         
-        results = cursor.execute(query, (buffer_id, str(key)))
+    Returns:
+        Dict with the number of pages restored and the duration in seconds
+    """
+    started = time.perf_counter()
+    source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = source.execute("PRAGMA quick_check").fetchone()[0]
+        if result != 'ok':
+            raise sqlite3.DatabaseError(f"Backup failed integrity check: {result}")
+
+        # Writes held back by the deferred profile are flushed, then overwritten
+        close_connection()
+        target = sqlite3.connect(database, timeout=10)
+        try:
+            source.backup(target, pages=DEFAULT_BACKUP_STEP_PAGES)
+            pages = target.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+    connect()
+    return {'pages': pages, 'duration': time.perf_counter() - started}
+
+
+def start_backups():
+    """Take backups on the 'backup_interval_hours' schedule in a background thread.
+    
+    Returns:
+        True if the scheduler was started
+    """
+    interval = float(get_config('backup_interval_hours', '0')) * 3600
+    thread = backup_state['thread']
+    if interval <= 0 or (thread is not None and thread.is_alive()):
+        return False
 
-        if not results:
-            debug_print("No results returned from query")
-            return None
+    def run():
+        while True:
+            # Wait until the newest backup is one interval old
+            backups = list_backups()
+            age = time.time() - os.path.getmtime(backups[-1]) if backups else interval
+            if age < interval:
+                time.sleep(interval - age)
+                continue
+            try:
+                backup()
+                rotate_backups()
+            except (sqlite3.Error, OSError) as e:
+                print(f"Error in scheduled backup: {e}")
+                time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='tome-backup', daemon=True)
+    backup_state['thread'] = thread
+    thread.start()
+    return True
 
-        if fetch == 'all' or fetch == 'history':
-            results = results.fetchall()
-            debug_print(f"Fetched {len(results)} records")
-        else:
-            results = results.fetchone()
-            debug_print(f"Fetched record: {results}")
 
-        return results
-    except Exception as e:
-        print(f"Error in retrieve: {e}")  # Always print errors
-        speak(f"Error retrieving data: {e}")
-        return None
+def start_backup():
+    """Take a backup now in a background thread and announce the result."""
+    def run():
+        try:
+            result = backup()
+            rotate_backups()
+            speak(f"Backup complete in {result['duration']:.1f} seconds")
+        except (sqlite3.Error, OSError) as e:
+            error_msg = f"Error in backup: {e}"
+            print(error_msg)
+            speak(error_msg, priority=speech.ERROR)
 
+    threading.Thread(target=run, name='tome-backup-now', daemon=True).start()
 
-def store(key, value, label=None, data_type=TYPE_VALUE, buffer_id=None, parent_id=None, item_index=None):
-    """Store a key-value pair in the database.
+
+def store_attachment(key, stream, size, name=None, buffer_id=None):
+    """Store a large payload at a key, streaming it into a blob.
+    
+    The row is created with a zero-filled blob of the right size, which is
+    then filled chunk by chunk, so the payload is never held in memory whole.
     
     Args:
-        key: The key to store the value under
-        value: The value to store
-        label: Optional label for the value
-        data_type: Type of data - TYPE_VALUE for normal values, TYPE_BUFFER for nested buffers, TYPE_LIST for lists
+        key: The key to store the attachment under
+        stream: Binary file-like object to read the payload from
+        size: Number of bytes the stream will produce
+        name: Optional file name
         buffer_id: The buffer ID to store in (uses current_buffer_id if None)
-        parent_id: The ID of the parent (buffer or list) this entry belongs to
-        item_index: For list items, the position in the list (0-based index)
+        
+    Returns:
+        The ID of the new lore entry
     """
-    global current_buffer_id
+    first = stream.read(ATTACHMENT_CHUNK_SIZE)
+    try:
+        text = first.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A chunk can end part-way through a multi-byte character
+        text = first[:e.start].decode('utf-8') if e.start >= len(first) - 3 else None
+    if text is None or '\0' in text:
+        kind, preview = 'binary', None
+    else:
+        kind, preview = 'text', text[:ATTACHMENT_PREVIEW_CHARS]
+
+    with write_transaction() as (connection, cursor):
+        cursor.execute(
+            'INSERT INTO attachments (name, kind, size, preview, data) VALUES (?, ?, ?, ?, zeroblob(?));',
+            (name, kind, size, preview, size)
+        )
+        attachment_id = cursor.lastrowid
+
+        if hasattr(connection, 'blobopen'):
+            with connection.blobopen('attachments', 'data', attachment_id) as blob:
+                chunk = first
+                while chunk:
+                    blob.write(chunk[:size - blob.tell()])
+                    chunk = stream.read(ATTACHMENT_CHUNK_SIZE)
+        else:
+            # Incremental blob I/O needs Python 3.11; older versions write the payload at once
+            cursor.execute('UPDATE attachments SET data = ? WHERE id = ?;', (first + stream.read(), attachment_id))
+
+        return store(key, attachment_id, label=name, data_type=TYPE_ATTACHMENT, buffer_id=buffer_id)
 
-    if buffer_id is None:
-        buffer_id = current_buffer_id
-    
-    # If creating a buffer and no parent specified, use current buffer as parent
-    if parent_id is None and data_type == TYPE_BUFFER:
-        parent_id = current_buffer_id
 
+def attach_text(key, text, buffer_id=None):
+    """Store a large piece of text as an attachment."""
+    data = text.encode('utf-8')
+    return store_attachment(key, io.BytesIO(data), len(data), buffer_id=buffer_id)
+
+
+def attach_file(key, path, buffer_id=None):
+    """Store a file as an attachment, streaming it from disk."""
+    with open(path, 'rb') as f:
+        return store_attachment(key, f, os.fstat(f.fileno()).st_size,
+                                name=os.path.basename(path), buffer_id=buffer_id)
+
+
+def attachment_info(attachment_id):
+    """Return the name, kind, size and preview of an attachment without loading its payload."""
     connection, cursor = connect()
+    cursor.execute('SELECT id, name, kind, size, preview FROM attachments WHERE id = ?;', (attachment_id,))
+    return cursor.fetchone()
 
-    cursor.execute(
-        'INSERT INTO lore (data_type, value, label, key, datetime, buffer_id, parent_id, item_index) VALUES (?, ?, ?, ?, ?, ?, ?, ?);',
-        (data_type, value, label, key, datetime.datetime.now(), buffer_id, parent_id, item_index)
-    )
-    connection.commit()
+
+def read_attachment(attachment_id, chunk_size=ATTACHMENT_CHUNK_SIZE):
+    """Yield the payload of an attachment in chunks of bytes."""
+    connection, cursor = connect()
+
+    if not hasattr(connection, 'blobopen'):
+        cursor.execute('SELECT data FROM attachments WHERE id = ?;', (attachment_id,))
+        data = cursor.fetchone()['data']
+        for offset in range(0, len(data), chunk_size):
+            yield data[offset:offset + chunk_size]
+        return
+
+    with connection.blobopen('attachments', 'data', int(attachment_id), readonly=True) as blob:
+        chunk = blob.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = blob.read(chunk_size)
+
+
+def describe_attachment(info):
+    """Build the spoken description of an attachment."""
+    size = info['size']
+    size_text = f"{size // 1024} kilobytes" if size >= 1024 else f"{size} bytes"
+    name = f" {info['name']}" if info['name'] else ""
+    if info['preview']:
+        return f"Attachment{name}, {size_text}: {info['preview']}"
+    return f"Attachment{name}, {size_text}"
+
+
+def copy_attachment(attachment_id):
+    """Copy an attachment to the clipboard, streaming it from the blob.
     
-    # Return the ID of the inserted row
-    return cursor.lastrowid
+    With xclip available the payload is piped straight into it; otherwise
+    it has to be assembled in memory for pyperclip.
+    """
+    info = attachment_info(attachment_id)
+    xclip = shutil.which('xclip')
+
+    if xclip:
+        command = [xclip, '-selection', 'clipboard']
+        if info['kind'] == 'binary':
+            command += ['-t', 'application/octet-stream']
+        process = Popen(command, stdin=PIPE, stderr=DEVNULL)
+        for chunk in read_attachment(attachment_id):
+            process.stdin.write(chunk)
+        process.stdin.close()
+    else:
+        copy(b''.join(read_attachment(attachment_id)).decode('utf-8', errors='replace'))
 
 
-def delete_entry(entry_id):
-    """Delete an entry from the database by its ID."""
+def local_config(key):
+    """Return whether a config key is a machine-local setting left out of exports and imports."""
+    return key in LOCAL_CONFIG_KEYS or key.startswith(LOCAL_CONFIG_PREFIX)
+
+
+def export_records(connection):
+    """Yield every record of the tome as (record type, row) pairs.
+    
+    Rows are read straight from cursors and attachment payloads in chunks,
+    so memory use does not grow with the size of the tome.
+    """
+    for row in connection.execute("SELECT key, value, description FROM config ORDER BY key;"):
+        if not local_config(row['key']):
+            yield 'config', row
+
+    for row in connection.execute("SELECT id, parent_id, key, datetime, keep_versions, keep_days FROM buffers ORDER BY id;"):
+        yield 'buffer', row
+
+    for info in connection.execute("SELECT id, name, kind, size, preview FROM attachments ORDER BY id;"):
+        yield 'attachment', info
+        offset = 0
+        for chunk in read_attachment(info['id']):
+            yield 'attachment_chunk', {'id': info['id'], 'offset': offset, 'data': base64.b64encode(chunk).decode('ascii')}
+            offset += len(chunk)
+
+    # The root buffer record (id 1) exists in every tome, so it is not exported
+    columns = ', '.join(EXPORT_FIELDS['entry'])
+    for row in connection.execute(f"SELECT {columns} FROM lore_entries WHERE id != 1 ORDER BY id;"):
+        yield 'entry', row
+
+
+def export_tome(path, file_format=None):
+    """Write the whole tome to a JSONL or CSV file.
+    
+    Args:
+        path: File to write
+        file_format: 'jsonl' or 'csv' (guessed from the file extension if None)
+        
+    Returns:
+        Dict with the number of records written per record type
+    """
     connection, cursor = connect()
+    file_format = file_format or ('csv' if path.endswith('.csv') else 'jsonl')
+    counts = {record_type: 0 for record_type in EXPORT_FIELDS}
+
+    # Hold off writers and read everything inside one transaction, so the
+    # export is a single consistent snapshot
+    with writer_state['lock'], open(path, 'w', newline='', encoding='utf-8') as f:
+        flush_writes()
+        cursor.execute("BEGIN")
+        try:
+            if file_format == 'csv':
+                columns = ['record'] + list(dict.fromkeys(field for fields in EXPORT_FIELDS.values() for field in fields))
+                writer = csv.DictWriter(f, fieldnames=columns)
+                writer.writeheader()
+
+            for record_type, row in export_records(connection):
+                record = {'record': record_type}
+                record.update((field, row[field]) for field in EXPORT_FIELDS[record_type])
+                if file_format == 'csv':
+                    writer.writerow(record)
+                else:
+                    f.write(json.dumps(record) + '\n')
+                counts[record_type] += 1
+        finally:
+            connection.commit()
+
+    return counts
+
+
+def read_records(path, file_format=None):
+    """Yield (record type, row) pairs from a JSONL or CSV export, one at a time."""
+    file_format = file_format or ('csv' if path.endswith('.csv') else 'jsonl')
+
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            for row in csv.DictReader(f):
+                record_type = row.pop('record')
+                record = {}
+                nullable = EXPORT_NULLABLE_FIELDS.get(record_type, set())
+                for field in EXPORT_FIELDS[record_type]:
+                    value = row.get(field)
+                    if field in EXPORT_INTEGER_FIELDS:
+                        # CSV has no NULL, so empty numeric cells stand for one
+                        value = int(value) if value not in (None, '') else None
+                    elif field in nullable and value == '':
+                        value = None
+                    record[field] = value
+                yield record_type, record
+        else:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record.pop('record'), record
+
+
+def import_tome(path, file_format=None):
+    """Load an export into this tome in one transaction.
     
-    cursor.execute('DELETE FROM lore WHERE id = ?;', (entry_id,))
-    connection.commit()
+    Imported buffers, entries and attachments are given new IDs by adding
+    an offset past the highest existing ID, so references between them stay
+    intact without a lookup table and nothing existing is overwritten.
+    Imported root-buffer registers land in this tome's root buffer. Rows
+    are written with executemany in batches of IMPORT_BATCH_SIZE.
     
-    return cursor.rowcount > 0  # Return True if at least one row was deleted
+    Args:
+        path: Export file to read
+        file_format: 'jsonl' or 'csv' (guessed from the file extension if None)
+        
+    Returns:
+        Dict with the number of records imported per record type
+    """
+    counts = {record_type: 0 for record_type in EXPORT_FIELDS}
+
+    with write_transaction() as (connection, cursor):
+        # The write lock is held from here on, so these offsets stay valid
+        buffer_offset = max_buffer_id()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS top FROM lore;")
+        entry_offset = cursor.fetchone()['top']
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS top FROM attachments;")
+        attachment_offset = cursor.fetchone()['top']
+
+        def buffer_id(old):
+            return None if old is None else 1 if int(old) == 1 else int(old) + buffer_offset
+
+        batches = {'buffers': [], 'values': [], 'entries': [], 'search': []}
+
+        def flush_batches():
+            cursor.executemany(
+                "INSERT INTO buffers (id, parent_id, key, datetime, keep_versions, keep_days) VALUES (?, ?, ?, ?, ?, ?);",
+                batches['buffers']
+            )
+            cursor.executemany("INSERT OR IGNORE INTO lore_values (hash, value, encoding) VALUES (?, ?, ?);", batches['values'])
+            cursor.executemany(
+                "INSERT INTO lore (id, data_type, buffer_id, parent_id, item_index, value, value_hash, label, key, datetime) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+                batches['entries']
+            )
+            if search_index_available(cursor):
+                cursor.executemany("INSERT INTO lore_fts (rowid, value, label) VALUES (?, ?, ?);", batches['search'])
+            for batch in batches.values():
+                batch.clear()
+
+        for record_type, row in read_records(path, file_format):
+            counts[record_type] += 1
+
+            if record_type == 'config':
+                if local_config(row['key']):
+                    continue
+                cursor.execute(
+                    "INSERT OR REPLACE INTO config (key, value, description) VALUES (?, ?, ?);",
+                    (row['key'], row['value'], row['description'])
+                )
+            elif record_type == 'buffer':
+                if int(row['id']) != 1:
+                    batches['buffers'].append((
+                        buffer_id(row['id']), buffer_id(row['parent_id']), row['key'],
+                        row['datetime'], row['keep_versions'], row['keep_days']
+                    ))
+            elif record_type == 'attachment':
+                cursor.execute(
+                    "INSERT INTO attachments (id, name, kind, size, preview, data) VALUES (?, ?, ?, ?, ?, zeroblob(?));",
+                    (int(row['id']) + attachment_offset, row['name'], row['kind'], row['size'], row['preview'], row['size'])
+                )
+            elif record_type == 'attachment_chunk':
+                data = base64.b64decode(row['data'])
+                attachment_id, offset = int(row['id']) + attachment_offset, int(row['offset'])
+                if hasattr(connection, 'blobopen'):
+                    with connection.blobopen('attachments', 'data', attachment_id) as blob:
+                        blob.seek(offset)
+                        blob.write(data)
+                else:
+                    # Incremental blob I/O needs Python 3.11; older versions splice the chunk in with SQL
+                    cursor.execute(
+                        "UPDATE attachments SET data = CAST(substr(data, 1, ?) || ? || substr(data, ?) AS BLOB) WHERE id = ?;",
+                        (offset, data, offset + len(data) + 1, attachment_id)
+                    )
+            elif record_type == 'entry':
+                data_type = row['data_type']
+                value = row['value']
+                parent_id = row['parent_id']
+
+                if data_type == TYPE_BUFFER:
+                    value = buffer_id(value)
+                elif data_type == TYPE_ATTACHMENT:
+                    value = int(value) + attachment_offset
+
+                # Buffers and lists hang off a buffer; list items hang off their list entry
+                if data_type in (TYPE_BUFFER, TYPE_LIST):
+                    parent_id = buffer_id(parent_id)
+                elif parent_id is not None:
+                    parent_id = int(parent_id) + entry_offset
+
+                value_hash = None
+                if data_type == TYPE_VALUE and value is not None and len(str(value)) >= DEDUP_MIN_LENGTH:
+                    value_hash = value_digest(value)
+                    batches['values'].append((value_hash, *encode_value(value)))
+                if data_type == TYPE_VALUE:
+                    batches['search'].append((int(row['id']) + entry_offset, str(value or ''), str(row['label'] or '')))
+
+                batches['entries'].append((
+                    int(row['id']) + entry_offset, data_type, buffer_id(row['buffer_id']), parent_id,
+                    row['item_index'], None if value_hash else value, value_hash,
+                    row['label'], row['key'], row['datetime']
+                ))
+
+            if len(batches['entries']) + len(batches['buffers']) >= IMPORT_BATCH_SIZE:
+                flush_batches()
+
+        flush_batches()
+
+    # Imported rows may shadow cached registers
+    register_cache['entries'].clear()
+    return counts
 
 
 def default(key):
@@ -411,19 +2297,48 @@ history_state = {
     'active': False,    # Whether history mode is active
     'key': None,        # Key for which history is being viewed
     'buffer_id': None,  # Buffer ID in which the key exists
-    'entries': [],      # List of history entries
+    'entries': [],      # Window of loaded history entries (see history_entry())
+    'window_start': 0,  # Position in the full history of entries[0]
+    'total': 0,         # Number of entries in the full history
     'current_index': 0, # Current position in history
     'global_mode': False # Whether viewing global history or key-specific history
 }
 
+# Search tracking
+search_state = {
+    'active': False,    # Whether search mode is active
+    'query': '',        # Text typed so far
+    'results': [],      # Ranked list of matching entries
+    'current_index': 0  # Current position in the results
+}
+
+# Buffer jump tracking
+jump_state = {
+    'path': '',         # Keys typed so far
+}
+
+# Spoken key paths of buffers, see buffer_path_name()
+buffer_tree = {
+    'paths': {},        # Buffer ID -> key path ('' for the root)
+    'connection': None, # Connection the paths were read through
+}
+
 # List tracking
 list_state = {
     'active': False,    # Whether list mode is active
     'list_id': None,    # ID of the current list
     'key': None,        # Key associated with the list
     'buffer_id': None,  # Buffer ID containing the list
-    'items': [],        # Array of list items
-    'current_index': 0  # Current position in the list
+    'items': [],        # Window of loaded list items, oldest first (see list_item())
+    'window_start': 0,  # Position in the full list of items[0]
+    'total': 0,         # Number of items in the full list
+    'current_index': 0, # Current position in the list
+    'prompt': None,     # 'insert', 'remove' or 'get' while an item number is typed
+    'number': '',       # Item number typed so far
+    'version': 0,       # Bumped whenever the list changes, to discard stale prefetches
+    'prefetched': None, # (list_id, version, direction, anchor id, page) loaded in the background
+    'prefetch_thread': None,
+    'lock': threading.Lock(),  # Guards 'prefetched' between the prefetch thread and list_item()
 }
 
 def create_list(key, buffer_id=None):
@@ -446,15 +2361,17 @@ def create_list(key, buffer_id=None):
         # Already a list, just return its ID
         return entry['id']
     
-    # Create a new list entry
-    list_id = store(key, '', label='list', data_type=TYPE_LIST, buffer_id=buffer_id, 
-                   parent_id=buffer_id)
-    
-    # If there was a value at this key, convert it to the first item in the list
-    if entry and entry.get('data_type') == TYPE_VALUE:
-        # Add the existing value as first item in the list
-        store(None, entry['value'], data_type=TYPE_VALUE, buffer_id=buffer_id,
-             parent_id=list_id, item_index=0)
+    # Creating the list and moving the old value into it is one logical write
+    with write_transaction():
+        # Create a new list entry
+        list_id = store(key, '', label='list', data_type=TYPE_LIST, buffer_id=buffer_id, 
+                       parent_id=buffer_id)
+        
+        # If there was a value at this key, convert it to the first item in the list
+        if entry and entry.get('data_type') == TYPE_VALUE:
+            # Add the existing value as first item in the list
+            store(None, entry['value'], data_type=TYPE_VALUE, buffer_id=buffer_id,
+                 parent_id=list_id, item_index=0)
     
     return list_id
 
@@ -488,48 +2405,367 @@ def get_list_items(list_id):
 def append_to_list(list_id, value):
     """Add an item to the end of a list.
     
+    Only the current highest item_index is read, so appending does not
+    depend on the length of the list.
+    
     Args:
         list_id: The ID of the list
         value: The value to add
         
     Returns:
-        The index of the new item
+        The item_index of the new item
     """
-    items = get_list_items(list_id)
-    next_index = len(items) if items else 0
-    
-    # Store the new item with the next available index
-    store(None, value, data_type=TYPE_VALUE, parent_id=list_id, item_index=next_index)
+    with write_transaction() as (connection, cursor):
+        cursor.execute("SELECT MAX(item_index) AS top FROM lore WHERE parent_id = ?;", (list_id,))
+        top = cursor.fetchone()['top']
+        next_index = 0 if top is None else top + LIST_INDEX_GAP
+        
+        # Store the new item with the next available index
+        store(None, value, data_type=TYPE_VALUE, parent_id=list_id, item_index=next_index)
     return next_index
 
-def user_index(internal_index, items_list):
+def split_list_items(text, delimiter=None, dedupe=None):
+    """Split text into list items on the configured delimiter.
+    
+    Items are stripped of surrounding whitespace and empty ones dropped.
+    
+    Args:
+        text: The text to split
+        delimiter: Separator ('newline', 'tab' or literal text; the 'list_delimiter' setting if None)
+        dedupe: Whether to drop repeated items (the 'list_dedupe' setting if None)
+        
+    Returns:
+        List of item values in their original order
+    """
+    if delimiter is None:
+        delimiter = get_config('list_delimiter', 'newline')
+    if dedupe is None:
+        dedupe = get_config('list_dedupe', 'off') == 'on'
+    separator = {'newline': '\n', 'tab': '\t', '': '\n'}.get(delimiter, delimiter)
+
+    items = [item.strip() for item in text.split(separator)]
+    items = [item for item in items if item]
+    if dedupe:
+        items = list(dict.fromkeys(items))
+    return items
+
+def extend_list(list_id, values):
+    """Append many items to the end of a list in one transaction.
+    
+    The items get consecutive gapped indexes after the current last item
+    and are written with executemany, so a long paste costs one
+    transaction rather than one per item.
+    
+    Args:
+        list_id: The ID of the list
+        values: The values to append, in order
+        
+    Returns:
+        The number of items appended
+    """
+    if not values:
+        return 0
+
+    with write_transaction() as (connection, cursor):
+        cursor.execute("SELECT buffer_id FROM lore WHERE id = ?;", (list_id,))
+        row = cursor.fetchone()
+        buffer_id = row['buffer_id'] if row else current_buffer_id
+        cursor.execute("SELECT MAX(item_index) AS top FROM lore WHERE parent_id = ?;", (list_id,))
+        top = cursor.fetchone()['top']
+        first_index = 0 if top is None else top + LIST_INDEX_GAP
+
+        # IDs are assigned here so the search index can be filled in the same batch;
+        # the write lock keeps anyone else from taking them
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS top FROM lore;")
+        first_id = cursor.fetchone()['top'] + 1
+        now = datetime.datetime.now()
+
+        entries, stored_values, search_rows = [], [], []
+        for n, value in enumerate(values):
+            inline_value, value_hash = value, None
+            if len(value) >= DEDUP_MIN_LENGTH:
+                value_hash = value_digest(value)
+                inline_value = None
+                stored_values.append((value_hash, *encode_value(value)))
+            entries.append((first_id + n, TYPE_VALUE, inline_value, value_hash, now, buffer_id, list_id,
+                            first_index + n * LIST_INDEX_GAP))
+            search_rows.append((first_id + n, value, ''))
+
+        cursor.executemany('INSERT OR IGNORE INTO lore_values (hash, value, encoding) VALUES (?, ?, ?);', stored_values)
+        cursor.executemany(
+            'INSERT INTO lore (id, data_type, value, value_hash, datetime, buffer_id, parent_id, item_index) VALUES (?, ?, ?, ?, ?, ?, ?, ?);',
+            entries
+        )
+        if search_index_available(cursor):
+            cursor.executemany('INSERT INTO lore_fts (rowid, value, label) VALUES (?, ?, ?);', search_rows)
+
+    return len(values)
+
+def list_extend_from_clipboard():
+    """Append every line (or delimited item) of the clipboard to the active list."""
+    clipboard_content = paste()
+    values = split_list_items(clipboard_content) if clipboard_content else []
+    if not values:
+        speak("Clipboard is empty")
+        return False
+
+    added = extend_list(list_state['list_id'], values)
+
+    # The new items are the newest, so only the page at the end is reloaded
+    list_state['total'] += added
+    list_state['version'] += 1
+    list_state['items'] = []
+    list_state['current_index'] = list_state['total'] - 1
+    newest = list_item(list_state['current_index'])
+    speak(f"Added {added} items. Item 1 of {list_state['total']}: {newest['value']}")
+    return True
+
+def renumber_list(list_id):
+    """Spread a list's item indexes LIST_INDEX_GAP apart again, keeping their order."""
+    with write_transaction() as (connection, cursor):
+        cursor.execute('''
+            UPDATE lore SET item_index = numbered.position * ?
+            FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY item_index, id) - 1 AS position
+                  FROM lore WHERE parent_id = ?) AS numbered
+            WHERE lore.id = numbered.id
+        ''', (LIST_INDEX_GAP, list_id))
+
+def insert_into_list(list_id, value, lower=None, upper=None):
+    """Insert an item between two neighbouring items of a list.
+    
+    The new item takes an item_index between its neighbours', so no other
+    item is touched unless the neighbours are adjacent, in which case the
+    list is renumbered first.
+    
+    Args:
+        list_id: The ID of the list
+        value: The value to insert
+        lower: The neighbouring item with the lower item_index (None to insert first)
+        upper: The neighbouring item with the higher item_index (None to insert last)
+        
+    Returns:
+        Tuple of (new entry, whether the list was renumbered)
+    """
+    renumbered = False
+
+    with write_transaction() as (connection, cursor):
+        if upper is None:
+            cursor.execute("SELECT MAX(item_index) AS top FROM lore WHERE parent_id = ?;", (list_id,))
+            top = cursor.fetchone()['top']
+            item_index = 0 if top is None else top + LIST_INDEX_GAP
+        elif lower is None:
+            item_index = upper['item_index'] - LIST_INDEX_GAP
+        else:
+            low, high = lower['item_index'], upper['item_index']
+            if high - low < 2:
+                renumber_list(list_id)
+                renumbered = True
+                cursor.execute("SELECT id, item_index FROM lore WHERE id IN (?, ?);", (lower['id'], upper['id']))
+                indexes = {row['id']: row['item_index'] for row in cursor.fetchall()}
+                low, high = indexes[lower['id']], indexes[upper['id']]
+            item_index = (low + high) // 2
+
+        entry_id = store(None, value, data_type=TYPE_VALUE, parent_id=list_id, item_index=item_index)
+        cursor.execute("SELECT * FROM lore_entries WHERE id = ?;", (entry_id,))
+        entry = cursor.fetchone()
+
+    return entry, renumbered
+
+def get_list_item(list_id, position):
+    """Get the item at a zero-based position in a list, oldest first, or None."""
+    connection, cursor = connect()
+    cursor.execute(
+        "SELECT * FROM lore_entries WHERE parent_id = ? ORDER BY item_index LIMIT 1 OFFSET ?;",
+        (list_id, position)
+    )
+    return cursor.fetchone()
+
+def pop_from_list(list_id):
+    """Remove and return the last item of a list, or None if it is empty."""
+    with write_transaction() as (connection, cursor):
+        cursor.execute(
+            "SELECT * FROM lore_entries WHERE parent_id = ? ORDER BY item_index DESC LIMIT 1;",
+            (list_id,)
+        )
+        entry = cursor.fetchone()
+        if entry:
+            delete_entry(entry['id'])
+    return entry
+
+def clear_list(list_id):
+    """Remove every item from a list.
+    
+    Returns:
+        The number of items removed
+    """
+    with write_transaction() as (connection, cursor):
+        cursor.execute("SELECT id, data_type, value, label FROM lore_entries WHERE parent_id = ?;", (list_id,))
+        items = cursor.fetchall()
+        for item in items:
+            if item['data_type'] == TYPE_VALUE:
+                unindex_entry(cursor, item['id'], item['value'], item['label'])
+        cursor.executemany("DELETE FROM lore WHERE id = ?;", [(item['id'],) for item in items])
+    return len(items)
+
+def user_index(internal_index, total):
     """Convert internal zero-based index to user-facing one-based index (newest = 1).
     
     Args:
         internal_index: The internal zero-based index
-        items_list: The list of items
+        total: The number of items in the list
         
     Returns:
         The user-facing one-based index (newest item = 1)
     """
-    if not items_list:
+    if not total:
         return 0
-    return len(items_list) - internal_index
+    return total - internal_index
     
-def internal_index(user_index, items_list):
+def internal_index(user_index, total):
     """Convert user-facing one-based index to internal zero-based index.
     
     Args:
         user_index: The user-facing one-based index (newest item = 1)
-        items_list: The list of items
+        total: The number of items in the list
         
     Returns:
         The internal zero-based index
     """
-    if not items_list:
+    if not total:
         return 0
-    return len(items_list) - user_index
+    return total - user_index
+
+def open_list(list_id):
+    """Start viewing a list without loading its items.
+    
+    Only the count is read here; items are fetched a page at a time by
+    list_item() as the cursor reaches them.
+    
+    Returns:
+        The number of items in the list
+    """
+    connection, cursor = connect()
+
+    list_state['list_id'] = list_id
+    list_state['items'] = []
+    list_state['window_start'] = 0
+    list_state['total'] = count_list_items(connection, cursor, list_id)
+    list_state['version'] += 1
+    list_state['prefetched'] = None
+    return list_state['total']
+
+def fetch_list_page(after=None, before=None, offset=None, newest=False):
+    """Fetch a page of the active list next to an item_index, or at an offset from either end."""
+    connection, cursor = connect()
+    return get_list_page(connection, cursor, list_state['list_id'], LIST_PAGE_SIZE,
+                         after=after, before=before, offset=offset, newest=newest)
+
+def take_prefetched_page(direction, anchor):
+    """Return the page prefetched beyond an anchor item, if it is still current."""
+    with list_state['lock']:
+        prefetched = list_state['prefetched']
+        if prefetched and prefetched[:4] == (list_state['list_id'], list_state['version'], direction, anchor['id']):
+            list_state['prefetched'] = None
+            return prefetched[4]
+    return None
+
+def list_item(position):
+    """Return the list item at a position, loading pages as needed.
+    
+    Moving next to the loaded window extends it by a page and trims the
+    other end, so memory stays bounded by LIST_WINDOW_SIZE however long
+    the list is. Jumps further away load a page around the position directly.
+    
+    Args:
+        position: Position in the full list (0 is the oldest item)
+        
+    Returns:
+        The item, or None if the position is out of range
+    """
+    if position < 0 or position >= list_state['total']:
+        return None
+
+    window = list_state['items']
+    start = list_state['window_start']
+
+    while not start <= position < start + len(window):
+        end = start + len(window)
+
+        if window and end <= position < end + LIST_PAGE_SIZE:
+            # Load the next newer page and drop items from the older end
+            page = take_prefetched_page('after', window[-1]) or fetch_list_page(after=window[-1]['item_index'])
+            if not page:
+                return None
+            window = window + page
+            excess = max(0, len(window) - LIST_WINDOW_SIZE)
+            window = window[excess:]
+            start += excess
+        elif window and start - LIST_PAGE_SIZE <= position < start:
+            # Load the next older page and drop items from the newer end
+            page = take_prefetched_page('before', window[0]) or fetch_list_page(before=window[0]['item_index'])
+            if not page:
+                return None
+            window = page + window
+            start -= len(page)
+            window = window[:LIST_WINDOW_SIZE]
+        else:
+            # Far jumps load a page around the position, counting from the nearer end
+            # so that jumps to either end need no OFFSET at all
+            start = max(0, min(position - LIST_PAGE_SIZE // 2, list_state['total'] - LIST_PAGE_SIZE))
+            from_end = max(0, list_state['total'] - start - LIST_PAGE_SIZE)
+            if from_end < start:
+                window = fetch_list_page(offset=from_end, newest=True)
+            else:
+                window = fetch_list_page(offset=start)
+            if not start <= position < start + len(window):
+                return None
+
+    list_state['items'] = window
+    list_state['window_start'] = start
+    return window[position - start]
+
+def prefetch_list_page():
+    """Load the page beyond the window edge the cursor is approaching, in the background."""
+    window = list_state['items']
+    if not window:
+        return
+
+    start = list_state['window_start']
+    position = list_state['current_index']
+    if start + len(window) - position <= LIST_PAGE_SIZE and start + len(window) < list_state['total']:
+        direction, anchor = 'after', window[-1]
+    elif position - start < LIST_PAGE_SIZE and start > 0:
+        direction, anchor = 'before', window[0]
+    else:
+        return
+
+    key = (list_state['list_id'], list_state['version'], direction, anchor['id'])
+    thread = list_state['prefetch_thread']
+    if (list_state['prefetched'] or ())[:4] == key or (thread is not None and thread.is_alive()):
+        return
 
+    def run():
+        try:
+            # The shared connection may be inside a write on the key handler
+            # thread, so query it only between writes; this also lets the
+            # page see writes the deferred profile has not committed yet
+            with writer_state['lock']:
+                connection, cursor = connect()
+                page = get_list_page(connection, connection.cursor(), key[0], LIST_PAGE_SIZE,
+                                     **{direction: anchor['item_index']})
+        except sqlite3.Error as e:
+            debug_print(f"List prefetch failed: {e}")
+            return
+        with list_state['lock']:
+            # Drop the page if the list changed while it was loading
+            if (list_state['list_id'], list_state['version']) == key[:2]:
+                list_state['prefetched'] = key + (page,)
+
+    thread = threading.Thread(target=run, name='tome-list-prefetch', daemon=True)
+    list_state['prefetch_thread'] = thread
+    thread.start()
+
+@speech.feedback(speech.NAVIGATION)
 def navigate_list(direction):
     """Navigate through list entries.
     
@@ -541,54 +2777,48 @@ def navigate_list(direction):
     """
     global list_state
     
-    if not list_state['active'] or not list_state['items']:
+    total = list_state['total']
+    if not list_state['active'] or not total:
         speak("No list active or list is empty")
         return False
     
-    items = list_state['items']
     current_index = list_state['current_index']
     
     # Safety check for index being in bounds
-    if current_index < 0 or current_index >= len(items):
+    if current_index < 0 or current_index >= total:
         # Reset to a valid index if somehow we're out of bounds
-        list_state['current_index'] = len(items) - 1
-        current_index = list_state['current_index']
+        current_index = total - 1
         
-    if direction == 'next' and current_index < len(items) - 1:
+    if direction == 'next' and current_index < total - 1:
         # Move to next (down the list toward higher numbers)
-        list_state['current_index'] += 1
-        current_item = items[list_state['current_index']]
-        user_idx = user_index(list_state['current_index'], items)
-        speak(f"Item {user_idx} of {len(items)}: {current_item['value']}")
-        return True
+        position, prefix = current_index + 1, "Item"
     elif direction == 'prev' and current_index > 0:
         # Move to previous (up the list toward item 1)
-        list_state['current_index'] -= 1
-        current_item = items[list_state['current_index']]
-        user_idx = user_index(list_state['current_index'], items)
-        speak(f"Item {user_idx} of {len(items)}: {current_item['value']}")
-        return True
+        position, prefix = current_index - 1, "Item"
     elif direction == 'end':
         # Jump to end of list
-        list_state['current_index'] = 0
-        current_item = items[list_state['current_index']]
-        user_idx = user_index(list_state['current_index'], items)
-        speak(f"Last item {user_idx} of {len(items)}: {current_item['value']}")
-        return True
+        position, prefix = 0, "Last item"
     elif direction == 'top':
         # Jump to top of list
-        list_state['current_index'] = len(items) - 1
-        current_item = items[list_state['current_index']]
-        speak(f"First item 1 of {len(items)}: {current_item['value']}")
-        return True
+        position, prefix = total - 1, "First item"
     else:
         # Cannot navigate further
         if direction == 'next':
-            speak("End of list")
+            signal('boundary', "End of list")
         else:
-            speak("Beginning of list")
+            signal('boundary', "Beginning of list")
         return False
 
+    current_item = list_item(position)
+    if current_item is None:
+        speak("Item not available")
+        return False
+
+    list_state['current_index'] = position
+    speak(f"{prefix} {user_index(position, total)} of {total}: {current_item['value']}")
+    prefetch_list_page()
+    return True
+
 def read_timestamp(entry):
     """Read the timestamp of an entry."""
     if not entry or 'datetime' not in entry:
@@ -602,6 +2832,7 @@ def read_timestamp(entry):
     speak(f"Created on {date_str}")
 
 
+@speech.feedback(speech.NAVIGATION)
 def read(key):
     """Read data from a key in the current buffer."""
     global mode
@@ -621,8 +2852,11 @@ def read(key):
             if last_retrieved['value']:
                 # Control-c: copy to clipboard and exit
                 if key.char == 'c':
-                    copy(last_retrieved['value'])
-                    speak(f"Copied to clipboard")
+                    if last_retrieved.get('attachment'):
+                        copy_attachment(last_retrieved['attachment'])
+                    else:
+                        copy(last_retrieved['value'])
+                    signal('copied', "Copied to clipboard")
                     exit()
                     
                 # Control-b: browse URL in browser and exit
@@ -656,24 +2890,17 @@ def read(key):
             if last_retrieved['key']:
                 # Control-h: view history for the last accessed key
                 if key.char == 'h':
-                    # Get history entries for this key
-                    history_entries = retrieve(last_retrieved['key'], buffer_id=last_retrieved['buffer_id'], fetch='history')
+                    # Open the history for this key (only the first page is loaded)
+                    total = open_history(False, last_retrieved['key'], last_retrieved['buffer_id'])
                     
-                    if not history_entries or len(history_entries) <= 1:
+                    if total <= 1:
+                        history_state['active'] = False
                         speak(f"No history for key {last_retrieved['key']}")
                         return
                     
-                    # Update history state
-                    history_state['active'] = True
-                    history_state['key'] = last_retrieved['key']
-                    history_state['buffer_id'] = last_retrieved['buffer_id']
-                    history_state['entries'] = history_entries
-                    history_state['current_index'] = 0  # Start with most recent entry (index 0)
-                    history_state['global_mode'] = False  # This is key-specific history, not global
-                    
                     # Display the current (most recent) entry
-                    current_entry = history_entries[0]
-                    speak(f"History for {last_retrieved['key']}, {len(history_entries)} entries. Most recent: {current_entry['value']}")
+                    current_entry = history_entry(0)
+                    speak(f"History for {last_retrieved['key']}, {total} entries. Most recent: {current_entry['value']}")
                     
                     # Switch to history mode
                     change_mode('history')
@@ -740,6 +2967,16 @@ def read(key):
                 read_clipboard()
                 return
                 
+            # Control-s: search all stored lore
+            elif key.char == 's':
+                enter_search_mode()
+                return
+                
+            # Control-e: jump to a buffer by typing its path
+            elif key.char == 'e':
+                enter_jump_mode()
+                return
+                
             # Control-l: enter list mode for the last accessed key
             elif key.char == 'l':
                 if last_retrieved['key'] is not None:
@@ -792,25 +3029,35 @@ def read(key):
         if not result:
             # Still update last_retrieved but with a None value
             last_retrieved['value'] = None
-            speak(f"No data at key {c}")
+            signal('empty', f"No data at key {c}")
             return
             
         value = str(result['value'])
         
         # Update the value in last_retrieved
         last_retrieved['value'] = value
+        last_retrieved['attachment'] = value if result['data_type'] == TYPE_ATTACHMENT else None
         
         # Handle differently based on data type and number of presses
-        if result['data_type'] == TYPE_LIST:
-            # Get list items
-            items = get_list_items(result['id'])
-            
+        if result['data_type'] == TYPE_ATTACHMENT:
+            # Only the size and preview are loaded, never the whole payload
+            if key_presses[current_key_id] == 1:
+                info = attachment_info(value)
+                speak(describe_attachment(info) if info else f"Missing attachment at key {c}")
+            else:
+                copy_attachment(value)
+                signal('copied', "Copied to clipboard")
+                exit()
+        elif result['data_type'] == TYPE_LIST:
             # First press - announce list info and read the newest item (item 1)
             if key_presses[current_key_id] == 1:
-                if items:
-                    speak(f"List with {len(items)} items. Item 1: {items[-1]['value']}")
+                connection, cursor = connect()
+                total = count_list_items(connection, cursor, result['id'])
+                if total:
+                    newest = get_list_page(connection, cursor, result['id'], 1, newest=True)[0]
+                    speak(f"List with {total} items. Item 1: {newest['value']}")
                 else:
-                    speak(f"Empty list at key {c}")
+                    signal('empty', f"Empty list at key {c}")
             # Second consecutive press - enter list mode
             else:
                 enter_list_mode(c, current_buffer_id)
@@ -818,15 +3065,25 @@ def read(key):
             # Standard value handling
             # First press - read it out loud
             if key_presses[current_key_id] == 1:
-                speak(f"{value}")
+                with speech.reading():
+                    speak(f"{value}")
+                # Render it so reading it again plays without synthesizing
+                speech.prerender(speech.split_chunks(value))
             # Second consecutive press of same key - copy to clipboard (backward compatibility)
             else:
                 copy(value)
-                speak(f"Copied to clipboard")
+                signal('copied', "Copied to clipboard")
                 exit()
             
     except AttributeError:
-        pass
+        # Arrow keys move through the chunks of a long value being read out
+        if key == keyboard.Key.right:
+            if not speech.skip(1):
+                signal('boundary', "End of value")
+        elif key == keyboard.Key.left:
+            speech.skip(-1)
+        elif key == keyboard.Key.down:
+            kill_speech()
 
 
 def history(key):
@@ -855,21 +3112,21 @@ def history(key):
                     return
                     
                 # Control-t: Read timestamp of current history entry
-                elif key.char == 't' and history_state['entries']:
-                    current_entry = history_state['entries'][history_state['current_index']]
+                elif key.char == 't' and history_state['total']:
+                    current_entry = history_entry(history_state['current_index'])
                     read_timestamp(current_entry)
                     return
                     
                 # Control-c: Copy current history entry to clipboard
-                elif key.char == 'c' and history_state['entries']:
-                    current_entry = history_state['entries'][history_state['current_index']]
+                elif key.char == 'c' and history_state['total']:
+                    current_entry = history_entry(history_state['current_index'])
                     copy(current_entry['value'])
-                    speak(f"Copied to clipboard")
+                    signal('copied', "Copied to clipboard")
                     return
                     
                 # Control-b: Browse URL in current history entry
-                elif key.char == 'b' and history_state['entries']:
-                    current_entry = history_state['entries'][history_state['current_index']]
+                elif key.char == 'b' and history_state['total']:
+                    current_entry = history_entry(history_state['current_index'])
                     value = current_entry['value']
                     
                     # Check if value is a URL
@@ -925,19 +3182,136 @@ def history(key):
             return
 
 
+def open_history(global_mode, key=None, buffer_id=None):
+    """Start viewing global or key-specific history.
+    
+    Only the count and the first page of entries are loaded; further pages
+    are fetched by history_entry() as navigation reaches them.
+    
+    Args:
+        global_mode: True for the global history of all changes
+        key: For key-specific history, the key to view
+        buffer_id: For key-specific history, the buffer containing the key
+        
+    Returns:
+        The number of entries in the history
+    """
+    connection, cursor = connect()
+
+    history_state['active'] = True
+    history_state['key'] = key
+    history_state['buffer_id'] = buffer_id
+    history_state['global_mode'] = global_mode
+    history_state['current_index'] = 0  # Start with most recent entry (index 0)
+    history_state['window_start'] = 0
+
+    if global_mode:
+        history_state['total'] = count_global_history(connection, cursor)
+    elif storage_state['log'] is not None:
+        # Versions in the log are not in lore, so load the whole merged history;
+        # the log's index keeps it in memory anyway
+        history_state['entries'] = retrieve(key, buffer_id, fetch='history') or []
+        history_state['total'] = len(history_state['entries'])
+        return history_state['total']
+    else:
+        history_state['total'] = count_key_history(connection, cursor, buffer_id, key)
+
+    history_state['entries'] = fetch_history_page()
+    return history_state['total']
+
+
+def fetch_history_page(older_than=None, newer_than=None):
+    """Fetch the page of history entries next to an anchor entry, newest first."""
+    connection, cursor = connect()
+
+    if history_state['global_mode']:
+        return get_global_history(connection, cursor, HISTORY_PAGE_SIZE,
+                                  older_than=older_than, newer_than=newer_than)
+    return get_key_history(connection, cursor, history_state['buffer_id'], history_state['key'],
+                           HISTORY_PAGE_SIZE, older_than=older_than, newer_than=newer_than)
+
+
+def history_entry(index):
+    """Return the history entry at a position, loading pages as needed.
+    
+    The loaded window grows a page at a time in the direction of travel and
+    is trimmed from the other end, so memory stays bounded by
+    HISTORY_WINDOW_SIZE however long the history is.
+    
+    Args:
+        index: Position in the full history (0 is the newest entry)
+        
+    Returns:
+        The entry, or None if the position is out of range
+    """
+    if index < 0 or index >= history_state['total']:
+        return None
+
+    window = history_state['entries']
+    start = history_state['window_start']
+
+    while not start <= index < start + len(window):
+        if not window:
+            return None
+
+        if index >= start + len(window):
+            # Load the next older page and drop entries from the newer end
+            page = fetch_history_page(older_than=window[-1])
+            if not page:
+                return None
+            window = window + page
+            excess = max(0, len(window) - HISTORY_WINDOW_SIZE)
+            window = window[excess:]
+            start += excess
+        else:
+            # Load the next newer page and drop entries from the older end
+            page = fetch_history_page(newer_than=window[0])
+            if not page:
+                return None
+            window = page + window
+            start -= len(page)
+            window = window[:HISTORY_WINDOW_SIZE]
+
+    history_state['entries'] = window
+    history_state['window_start'] = start
+    return window[index - start]
+
+
+def forget_history_entry(index, entry):
+    """Drop a deleted entry from the loaded window and the count."""
+    window = history_state['entries']
+    start = history_state['window_start']
+
+    window.pop(index - start)
+    history_state['total'] -= 1
+
+    # Reload around the deleted entry if it was the last one in memory
+    if not window and history_state['total']:
+        window = fetch_history_page(older_than=entry)
+        if window:
+            start = index
+        else:
+            window = fetch_history_page(newer_than=entry)
+            start = index - len(window)
+
+    history_state['entries'] = window
+    history_state['window_start'] = start
+
+
+@speech.feedback(speech.NAVIGATION)
 def navigate_history(direction):
     """Navigate through history entries."""
     global history_state
     
-    entries = history_state['entries']
     current_index = history_state['current_index']
+    total_entries = history_state['total']
     global_mode = history_state['global_mode']
     
-    if not entries:
+    if not total_entries:
         speak("No history available")
         return
     
-    if direction == 'previous' and current_index < len(entries) - 1:
+    if direction == 'previous' and current_index < total_entries - 1:
         # Move to older entry (higher index)
         current_index += 1
     elif direction == 'next' and current_index > 0:
@@ -945,18 +3319,20 @@ def navigate_history(direction):
         current_index -= 1
     else:
         if direction == 'previous':
-            speak("At oldest entry")
+            signal('boundary', "At oldest entry")
         else:
-            speak("At newest entry")
+            signal('boundary', "At newest entry")
+        return
+    
+    # Get the current entry
+    current_entry = history_entry(current_index)
+    if current_entry is None:
+        speak("History changed, entry not found")
         return
     
     # Update the current index
     history_state['current_index'] = current_index
     
-    # Get the current entry
-    current_entry = entries[current_index]
-    total_entries = len(entries)
-    
     # Format differently depending on whether we're in global or key-specific history
     if global_mode:
         speak(f"Entry {current_index + 1} of {total_entries}")
@@ -970,21 +3346,19 @@ def delete_history_entry():
     """Delete the currently selected history entry."""
     global history_state
     
-    if not history_state['active'] or not history_state['entries']:
+    if not history_state['active'] or not history_state['total']:
         speak("No history entry to delete")
         return
     
     # Get the current entry from history
     current_index = history_state['current_index']
-    entries = history_state['entries']
     global_mode = history_state['global_mode']
     
-    if current_index >= len(entries):
+    # Get the entry to delete
+    entry_to_delete = history_entry(current_index)
+    if entry_to_delete is None:
         speak("Invalid history entry")
         return
-    
-    # Get the entry to delete
-    entry_to_delete = entries[current_index]
     entry_id = entry_to_delete['id']
     
     # Delete the entry from the database
@@ -993,25 +3367,22 @@ def delete_history_entry():
     if success:
         if global_mode:
             key = entry_to_delete['key']
-            buffer_id = entry_to_delete['buffer_id']
-            speak(f"Deleted entry from buffer {buffer_id}, key {key}: {entry_to_delete['value']}")
+            buffer_name = buffer_path_name(entry_to_delete['buffer_id'])
+            speak(f"Deleted entry from buffer {buffer_name}, key {key}: {entry_to_delete['value']}")
         else:
             speak(f"Deleted entry: {entry_to_delete['value']}")
         
-        # Remove the entry from the entries list
-        entries.pop(current_index)
-        
-        # Update entries list
-        history_state['entries'] = entries
+        # Remove the entry from the loaded window and the count
+        forget_history_entry(current_index, entry_to_delete)
         
         # Check if we need to adjust the current index
-        if entries:
+        if history_state['total']:
             # If we've deleted the last entry in the list, move to the previous entry
-            if current_index >= len(entries):
-                history_state['current_index'] = len(entries) - 1
+            if current_index >= history_state['total']:
+                history_state['current_index'] = history_state['total'] - 1
                 
             # Speak the new current entry
-            new_current = entries[history_state['current_index']]
+            new_current = history_entry(history_state['current_index'])
             
             if global_mode:
                 speak("Now at entry")
@@ -1025,7 +3396,7 @@ def delete_history_entry():
             history_state['global_mode'] = False
             return_to_read_mode()
     else:
-        speak("Failed to delete entry")
+        speak("Failed to delete entry", priority=speech.ERROR)
 
 
 def restore_history_entry():
@@ -1033,20 +3404,17 @@ def restore_history_entry():
     global history_state
     global last_retrieved
     
-    if not history_state['active'] or not history_state['entries']:
+    if not history_state['active'] or not history_state['total']:
         speak("No history entry to restore")
         return
     
     # Get the current entry from history
-    current_index = history_state['current_index']
-    entries = history_state['entries']
+    current_entry = history_entry(history_state['current_index'])
     
-    if current_index >= len(entries):
+    if current_entry is None:
         speak("Invalid history entry")
         return
     
-    current_entry = entries[current_index]
-    
     if history_state['global_mode']:
         # Get the key and buffer_id from the entry itself for global history
         key = current_entry['key']
@@ -1058,10 +3426,14 @@ def restore_history_entry():
     
     # Store the value from the history entry to create a new entry
     value = current_entry['value']
-    store(key, value, buffer_id=buffer_id_value)
+    if current_entry['data_type'] == TYPE_ATTACHMENT:
+        store(key, value, label=current_entry['label'], data_type=TYPE_ATTACHMENT, buffer_id=buffer_id_value)
+        value = describe_attachment(attachment_info(value))
+    else:
+        store(key, value, buffer_id=buffer_id_value)
     
     if history_state['global_mode']:
-        speak(f"Restored to buffer {buffer_id_value}, key {key}: {value}")
+        speak(f"Restored to buffer {buffer_path_name(buffer_id_value)}, key {key}: {value}")
     else:
         speak(f"Restored: {value}")
     
@@ -1093,6 +3465,64 @@ def options(key):
             set_config('debug_mode', 'on' if debug_mode else 'off')
             speak(f"Debug mode {status(debug_mode)}")
             
+        # Cycle through the write durability profiles
+        elif key.char == "w":
+            profiles = list(DURABILITY_PROFILES)
+            profile = profiles[(profiles.index(writer_state['profile']) + 1) % len(profiles)]
+            set_config('durability', profile)
+            flush_writes()
+            connection, cursor = connect()
+            apply_durability(connection, cursor, profile)
+            speak(f"Write durability {profile}")
+            
+        # Re-encode stored values with the current compression setting
+        elif key.char == "z":
+            speak("Recompressing values")
+            start_recompression()
+            
+        # Toggle dropping repeated items when bulk appending to a list
+        elif key.char == "u":
+            dedupe = get_config('list_dedupe', 'off') != 'on'
+            set_config('list_dedupe', 'on' if dedupe else 'off')
+            speak(f"Unique list items {status(dedupe)}")
+            
+        # Toggle earcons for status messages
+        elif key.char == "e":
+            enabled = get_config('earcons', 'off') != 'on'
+            set_config('earcons', 'on' if enabled else 'off')
+            open_earcons()
+            speak(f"Earcons {status(enabled)}")
+            
+        # Report how often speech was played from the audio cache
+        elif key.char == "a":
+            backend = speech.get_backend()
+            if isinstance(backend, speech.CachedBackend):
+                stats = backend.cache.stats
+                speak(f"Audio cache hit rate {backend.cache.hit_rate():.0%}, "
+                      f"{stats['hits']} hits, {stats['misses']} misses, {len(backend.cache.clips)} clips")
+            else:
+                speak("Audio cache off")
+            
+        # Back up the database in the background
+        elif key.char == "b":
+            speak("Backing up")
+            start_backup()
+            
+        # Convert an older database so compaction can hand back free space
+        elif key.char == "v":
+            speak("Converting database")
+            if enable_incremental_vacuum():
+                speak("Database converted, compaction now frees disk space")
+            else:
+                speak("Database already frees space on compaction")
+            
+        # Compact history in the background
+        elif key.char == "c":
+            if start_compaction():
+                speak("Compacting history")
+            else:
+                speak("Compaction already running")
+            
         # Return to read mode if escape is pressed
         elif key.char == "\x1b":  # Escape character
             return_to_read_mode()
@@ -1128,7 +3558,7 @@ def browse(key):
         # Get the data for this key
         result = retrieve(key, buffer_id=current_buffer_id)
         if not result:
-            speak(f"No data at key {c}")
+            signal('empty', f"No data at key {c}")
             return
             
         value = str(result['value'])
@@ -1190,10 +3620,9 @@ def enter_buffer(key):
         # Check if this key contains a buffer in the current buffer
         # This is the critical check to fix buffer nesting - we need to ensure the buffer's parent
         # matches our current buffer exactly, not just any buffer with this key
-        if is_key_a_buffer(key, current_buffer_id):
-            # Get the buffer data
-            retrieved = retrieve(key, buffer_id=current_buffer_id, fetch='last')
-            new_buffer_id = retrieved['value']
+        retrieved = retrieve(key, buffer_id=current_buffer_id, fetch='last')
+        if retrieved and retrieved.get('data_type') == TYPE_BUFFER and retrieved.get('parent_id') == current_buffer_id:
+            new_buffer_id = int(retrieved['value'])
             
             # Track the path to this buffer
             if hasattr(key, 'char'):
@@ -1204,7 +3633,7 @@ def enter_buffer(key):
             # Create buffer name from path
             buffer_name = ''.join(buffer_path)
             
-            speak(f"Entering buffer {buffer_name}")
+            signal('enter_buffer', f"Entering buffer {buffer_name}", buffer_name)
             current_buffer_id = new_buffer_id
             buffer_stack.append(current_buffer_id)  # Add to navigation stack
             
@@ -1216,7 +3645,7 @@ def enter_buffer(key):
     except Exception as e:
         # Enhanced error handling
         print(f"Error in enter_buffer: {e}")  # Always print errors
-        speak(f"Error checking for buffer: {e}")
+        speak(f"Error checking for buffer: {e}", priority=speech.ERROR)
 
     return False
 
@@ -1242,7 +3671,7 @@ def exit_buffer():
         # Get buffer name from path
         buffer_name = "root" if not buffer_path else ''.join(buffer_path)
         
-        speak(f"Returning to buffer {buffer_name}")
+        signal('exit_buffer', f"Returning to buffer {buffer_name}", buffer_name)
         return True
     else:
         speak("Already at root buffer")
@@ -1265,9 +3694,26 @@ def clipboard(key):
 
         debug_print(f"Current buffer ID: {current_buffer_id}")
 
+        # Control-key: attach the file whose path is on the clipboard
+        if pressed['ctrl']:
+            path = os.path.expanduser(data.strip())
+            if not os.path.isfile(path):
+                speak("Clipboard does not hold a file path")
+                return
+            attach_file(c, path)
+            speak(f"Attached {os.path.basename(path)} as {c} in buffer {get_buffer_name()}")
+            return
+
         if strip_input:
             data = data.strip()
 
+        # Very large clipboard text is streamed into an attachment
+        size = len(data.encode('utf-8'))
+        if size >= int(get_config('attachment_min_bytes', DEFAULT_ATTACHMENT_MIN_BYTES)):
+            attach_text(c, data)
+            speak(f"Stored {size // 1024} kilobytes as {c} in buffer {get_buffer_name()}")
+            return
+
         # Store the clipboard data at this key in the current buffer
         store(c, data)
         speak(f"Stored {data} as {c} in buffer {get_buffer_name()}")
@@ -1281,10 +3727,10 @@ def clipboard(key):
 def format_global_history_entry(entry):
     """Format and speak a global history entry, including buffer and key information."""
     key = entry['key']
-    buffer_id = entry['buffer_id']
+    buffer_name = buffer_path_name(entry['buffer_id'])
     value = entry['value']
     
-    speak(f"Buffer {buffer_id}, key {key}: {value}")
+    speak(f"Buffer {buffer_name}, key {key}: {value}")
 
 
 def access_global_history():
@@ -1297,27 +3743,20 @@ def access_global_history():
         speak("Global History only available from the root buffer")
         return False
     
-    # Get all history entries
-    connection, cursor = connect()
-    history_entries = get_global_history(connection, cursor)
+    # Count the entries and load only the first page
+    total = open_history(True)
     
-    if not history_entries:
+    if not total:
+        history_state['active'] = False
+        history_state['global_mode'] = False
         speak("No history entries available")
         return False
     
-    # Update history state
-    history_state['active'] = True
-    history_state['key'] = None
-    history_state['buffer_id'] = None
-    history_state['entries'] = history_entries
-    history_state['current_index'] = 0  # Start with most recent entry (index 0)
-    history_state['global_mode'] = True
-    
     # Announce entering global history with count
-    speak(f"Global History: {len(history_entries)} entries")
+    speak(f"Global History: {total} entries")
     
     # Display the current (most recent) entry
-    current_entry = history_entries[0]
+    current_entry = history_entry(0)
     
     # Format the entry differently for global history to include buffer and key
     format_global_history_entry(current_entry)
@@ -1327,10 +3766,342 @@ def access_global_history():
     return True
 
 
+def buffer_path_name(buffer_id):
+    """Return the spoken key path of a buffer, e.g. "ab" or "root".
+    
+    Paths come from the buffers table, which records where each buffer was
+    created, and are cached per buffer ID since that never changes.
+    """
+    connection, cursor = connect()
+    if buffer_id is None:
+        return "root"
+    buffer_id = int(buffer_id)
+
+    if buffer_tree['connection'] is not connection:
+        buffer_tree['paths'].clear()
+        buffer_tree['connection'] = connection
+    if buffer_id in buffer_tree['paths']:
+        return buffer_tree['paths'][buffer_id] or "root"
+
+    # Walk up to the root in one query
+    cursor.execute('''
+        WITH RECURSIVE ancestors(id, parent_id, key, depth) AS (
+            SELECT id, parent_id, key, 0 FROM buffers WHERE id = ? AND id != 1
+            UNION ALL
+            SELECT buffers.id, buffers.parent_id, buffers.key, ancestors.depth + 1
+            FROM buffers JOIN ancestors ON buffers.id = ancestors.parent_id
+            WHERE buffers.id != 1
+        )
+        SELECT key, parent_id FROM ancestors ORDER BY depth DESC
+    ''', (buffer_id,))
+    rows = cursor.fetchall()
+
+    if buffer_id != 1 and (not rows or rows[0]['parent_id'] != 1):
+        # Unknown buffer, or one whose ancestry is broken
+        return f"buffer {buffer_id}"
+
+    path = ''.join(str(row['key']) for row in rows)
+    buffer_tree['paths'][buffer_id] = path
+    return path or "root"
+
+
+def resolve_buffer_path(path, start_buffer_id=1):
+    """Find the buffer reached by typing a key path, in one query.
+    
+    Each key must hold a buffer created in the buffer before it, just as
+    when entering buffers one at a time.
+    
+    Args:
+        path: Keys to follow, e.g. "abc"
+        start_buffer_id: Buffer to start from (the root if not given)
+        
+    Returns:
+        List of buffer IDs along the path, starting with start_buffer_id, or None if the path does not lead to a buffer
+    """
+    connection, cursor = connect()
+    cursor.execute(f'''
+        WITH RECURSIVE walk(depth, buffer_id) AS (
+            SELECT 0, ?2
+            UNION ALL
+            SELECT walk.depth + 1, CAST(lore.value AS INTEGER)
+            FROM walk
+            JOIN current_registers ON current_registers.buffer_id = walk.buffer_id
+                                  AND current_registers.key = substr(?1, walk.depth + 1, 1)
+            JOIN lore ON lore.id = current_registers.lore_id
+            WHERE walk.depth < length(?1)
+              AND lore.data_type = '{TYPE_BUFFER}' AND lore.parent_id = walk.buffer_id
+        )
+        SELECT buffer_id FROM walk ORDER BY depth
+    ''', (path, start_buffer_id))
+    buffer_ids = [row['buffer_id'] for row in cursor.fetchall()]
+
+    return buffer_ids if len(buffer_ids) == len(path) + 1 else None
+
+
+def enter_jump_mode():
+    """Start typing a buffer path to jump to."""
+    jump_state['path'] = ''
+    change_mode('jump')
+
+
+def jump_to_buffer_path(path):
+    """Make the buffer at a key path from the root the current buffer.
+    
+    Returns:
+        True if the buffer was found
+    """
+    global current_buffer_id
+    global buffer_stack
+    global buffer_path
+    global key_presses
+    global last_retrieved
+    global suppress_mode_message
+
+    buffer_ids = resolve_buffer_path(path)
+    if buffer_ids is None:
+        speak(f"No buffer at {path}")
+        return False
+
+    current_buffer_id = buffer_ids[-1]
+    buffer_stack = buffer_ids
+    buffer_path = list(path)
+    key_presses = {}
+    last_retrieved = {'value': None, 'key': None, 'buffer_id': None}
+
+    suppress_mode_message = True
+    change_mode('read')
+    signal('enter_buffer', f"Entering buffer {get_buffer_name()}", get_buffer_name())
+    return True
+
+
+def jump(key):
+    """Type a buffer path from the root, then press enter to go there."""
+    try:
+        if key.char:
+            jump_state['path'] += key.char
+            speak(key.char)
+
+    except AttributeError:
+        # Handle special keys
+        if key == keyboard.Key.enter:
+            jump_to_buffer_path(jump_state['path'])
+        elif key == keyboard.Key.backspace:
+            if jump_state['path']:
+                jump_state['path'] = jump_state['path'][:-1]
+                speak(f"Path {jump_state['path']}" if jump_state['path'] else "Path empty")
+            else:
+                return_to_read_mode()
+        elif key == keyboard.Key.esc:
+            return_to_read_mode()
+
+
+def search_lore(query, limit=SEARCH_RESULT_LIMIT):
+    """Find stored values matching a query, best matches first.
+    
+    Each word is matched as a prefix, so typing "exa" finds "example".
+    
+    Args:
+        query: The words to search for
+        limit: Maximum number of results
+        
+    Returns:
+        List of matching lore entries, or None if search is unavailable
+    """
+    connection, cursor = connect()
+
+    if not search_index_available(cursor):
+        return None
+
+    # Quote each word so punctuation typed by the user is not read as FTS syntax
+    words = re.findall(r'\w+', query)
+    if not words:
+        return []
+    match = ' '.join(f'"{word}"*' for word in words)
+
+    cursor.execute(
+        """
+        SELECT lore_entries.* FROM lore_fts
+        JOIN lore_entries ON lore_entries.id = lore_fts.rowid
+        WHERE lore_fts MATCH ?
+        ORDER BY lore_fts.rank
+        LIMIT ?;
+        """,
+        (match, limit)
+    )
+    return cursor.fetchall()
+
+
+def format_search_result(entry):
+    """Format and speak a search result with its buffer path and key."""
+    buffer_name = buffer_path_name(entry['buffer_id'])
+
+    if entry['key'] is None and entry['parent_id'] is not None:
+        # List items have no key of their own; name the list they belong to
+        connection, cursor = connect()
+        cursor.execute("SELECT key FROM lore WHERE id = ?", (entry['parent_id'],))
+        parent = cursor.fetchone()
+        location = f"list {parent['key']}" if parent else "list"
+    else:
+        location = f"key {entry['key']}"
+
+    speak(f"Buffer {buffer_name}, {location}: {entry['value']}")
+
+
+def enter_search_mode():
+    """Start a new search."""
+    search_state['active'] = True
+    search_state['query'] = ''
+    search_state['results'] = []
+    search_state['current_index'] = 0
+    change_mode('search')
+
+
+def run_search():
+    """Run the typed query and announce the best match."""
+    query = search_state['query'].strip()
+    if not query:
+        speak("Type words to search for")
+        return
+
+    results = search_lore(query)
+    if results is None:
+        speak("Search is not available")
+        return
+
+    search_state['results'] = results
+    search_state['current_index'] = 0
+
+    if not results:
+        speak(f"No results for {query}")
+        return
+
+    speak(f"{len(results)} results")
+    format_search_result(results[0])
+
+
+@speech.feedback(speech.NAVIGATION)
+def navigate_search(direction):
+    """Move through search results.
+    
+    Args:
+        direction: 'previous' for the next lower-ranked result, 'next' for the next higher-ranked one
+    """
+    results = search_state['results']
+    current_index = search_state['current_index']
+
+    if not results:
+        speak("No search results")
+        return
+
+    if direction == 'previous' and current_index < len(results) - 1:
+        current_index += 1
+    elif direction == 'next' and current_index > 0:
+        current_index -= 1
+    else:
+        if direction == 'previous':
+            signal('boundary', "At last result")
+        else:
+            signal('boundary', "At first result")
+        return
+
+    search_state['current_index'] = current_index
+    speak(f"Result {current_index + 1} of {len(results)}")
+    format_search_result(results[current_index])
+
+
+def exit_search_mode():
+    """Leave search mode and return to read mode."""
+    search_state['active'] = False
+    return_to_read_mode()
+
+
+def search(key):
+    """Type a query, then navigate the ranked results."""
+    try:
+        if key.char:
+            if pressed['ctrl']:
+                # Control-p/Control-n: move through results like history mode
+                if key.char == 'p':
+                    navigate_search('previous')
+                elif key.char == 'n':
+                    navigate_search('next')
+                # Control-c: copy the current result to the clipboard
+                elif key.char == 'c' and search_state['results']:
+                    copy(search_state['results'][search_state['current_index']]['value'])
+                    signal('copied', "Copied to clipboard")
+                return
+
+            # Any other character extends the query
+            search_state['query'] += key.char
+            speak(key.char)
+
+    except AttributeError:
+        # Handle special keys
+        if key == keyboard.Key.enter:
+            run_search()
+        elif key == keyboard.Key.space:
+            search_state['query'] += ' '
+        elif key == keyboard.Key.backspace:
+            if search_state['query']:
+                search_state['query'] = search_state['query'][:-1]
+                speak(f"Query {search_state['query']}" if search_state['query'] else "Query empty")
+            else:
+                exit_search_mode()
+        elif key == keyboard.Key.up:  # Up arrow key for lower-ranked results
+            navigate_search('previous')
+        elif key == keyboard.Key.down:  # Down arrow key for higher-ranked results
+            navigate_search('next')
+        elif key == keyboard.Key.esc:
+            exit_search_mode()
+
+
 # mode_map moved to the end of file
 
 
 
+def open_speech_backend():
+    """Switch speech to the backend chosen by the 'speech_backend' setting.
+    
+    The cached backend starts rendering the fixed phrases straight away.
+    
+    Returns:
+        The speech backend in use
+    """
+    name = get_config('speech_backend', 'espeak')
+    if name != 'cached':
+        return speech.set_backend(name)
+    
+    directory = get_config('speech_cache_directory', '') or None
+    max_bytes = int(get_config('speech_cache_mb', str(DEFAULT_SPEECH_CACHE_MB))) * 1024 * 1024
+    backend = speech.set_backend(speech.CachedBackend(directory, max_bytes))
+    phrases = SPOKEN_PHRASES + [entry['message'] for entry in mode_map.values()]
+    phrases += [f"No data at key {c}" for c in string.ascii_lowercase + string.digits]
+    speech.prerender(phrases)
+    return backend
+
+
+def open_earcons():
+    """Set up the earcon channel from the 'earcons' settings, or turn it off.
+    
+    Returns:
+        The earcon channel, or None if earcons are off
+    """
+    if get_config('earcons', 'off') != 'on':
+        earcons.close()
+        return None
+    
+    mapping = {event: get_config(f'earcon_{event}', tone) for event, tone in earcons.EVENTS.items()}
+    sink_name = get_config('earcon_sink', 'aplay')
+    if sink_name == 'file':
+        sink = earcons.FileSink(get_config('earcon_file', '') or os.path.join(os.path.dirname(database), 'earcons.wav'))
+    elif sink_name in earcons.SINKS:
+        sink = earcons.SINKS[sink_name]()
+    else:
+        print(f"Unknown earcon sink {sink_name}, using aplay")
+        sink = earcons.AplaySink()
+    return earcons.configure(mapping, sink)
+
+
 def start():
     """Start the tome."""
     global suppress_mode_message
@@ -1349,6 +4120,17 @@ def start():
     debug_mode = (debug_setting == 'on')
     debug_print(f"Debug mode loaded from database: {debug_mode}")
     
+    # Start the speech engine so its voice is loaded before the first key press
+    open_speech_backend()
+    open_earcons()
+    
+    # Trim old history in the background if a retention policy is set
+    if get_config('retention_keep_versions', '0') != '0' or get_config('retention_keep_days', '0') != '0':
+        start_compaction()
+    
+    # Take scheduled backups in the background if they are turned on
+    start_backups()
+    
     # Start in read mode - suppress the initial speak since we'll do it manually
     suppress_mode_message = True
     change_mode("read")
@@ -1376,9 +4158,10 @@ def start():
         listener.join()
     except (ConnectionClosedError, AttributeError) as e:
         print(f"Error in keyboard listener: {e}")
-        speak("Error starting keyboard listener. Please check terminal.")
+        speak("Error starting keyboard listener. Please check terminal.", priority=speech.ERROR)
 
 
+@speech.keystroke()
 def key_handler(key):
     mode_function = mode_map[mode]['function']
     debug_print(f"Current mode: {mode}")
@@ -1395,9 +4178,17 @@ def key_handler(key):
             return_to_read_mode()
             return
         elif mode == 'list':
+            if list_state.get('prompt'):
+                # Backspace edits the item number being typed
+                mode_function(key)
+                return
             list_state['active'] = False
             return_to_read_mode()
             return
+        elif mode in ('search', 'jump'):
+            # Backspace edits the typed text; the mode exits once it is empty
+            mode_function(key)
+            return
         
     try:
         # Check for Control-Alt-v to kill all speech
@@ -1406,8 +4197,8 @@ def key_handler(key):
             speak("Silenced")
             return
             
-        # Global quit command
-        if key.char == "q":
+        # Global quit command (search and jump modes need q for typing)
+        if key.char == "q" and mode not in ('search', 'jump'):
             speak("Quit")
             exit()
         
@@ -1481,12 +4272,129 @@ def change_mode(mode_name):
     
     # Speak the new mode if the mode has changed
     if mode_name != mode and mode_message and not suppress_mode_message:
-        speak(mode_message)
+        signal('mode', mode_message)
 
     suppress_mode_message = False
     mode = mode_name
 
 
+def list_insert_at(position, value):
+    """Insert a value into the active list so it becomes item number position.
+    
+    Args:
+        position: User-facing one-based position (1 inserts a new newest item)
+        value: The value to insert
+    """
+    total = list_state['total']
+    if not 1 <= position <= total + 1:
+        speak(f"No position {position} in list of {total}")
+        return False
+
+    # Items are held oldest first, so item 1 is at the end
+    slot = total - position + 1
+    lower = list_item(slot - 1) if slot > 0 else None
+    upper = list_item(slot) if slot < total else None
+    entry, renumbered = insert_into_list(list_state['list_id'], value, lower, upper)
+
+    list_state['total'] += 1
+    list_state['version'] += 1
+    window = list_state['items']
+    start = list_state['window_start']
+
+    if renumbered:
+        # Every item_index changed, so reload the window around the new item
+        list_state['items'] = []
+        list_item(slot)
+    elif start <= slot <= start + len(window):
+        window.insert(slot - start, entry)
+    elif slot < start:
+        list_state['window_start'] += 1
+
+    list_state['current_index'] = slot
+    speak(f"Inserted item {position} of {list_state['total']}: {value}")
+    return True
+
+def list_remove_at(position):
+    """Remove item number position from the active list."""
+    total = list_state['total']
+    if not 1 <= position <= total:
+        speak(f"No item {position} in list of {total}")
+        return False
+
+    slot = internal_index(position, total)
+    entry = list_item(slot)
+    if entry is None:
+        speak(f"No item {position} in list of {total}")
+        return False
+    delete_entry(entry['id'])
+
+    list_state['items'].pop(slot - list_state['window_start'])
+    list_state['total'] -= 1
+    list_state['version'] += 1
+
+    # Keep the cursor on the same item, or the nearest one if it was removed
+    if list_state['current_index'] > slot:
+        list_state['current_index'] -= 1
+    list_state['current_index'] = min(list_state['current_index'], max(list_state['total'] - 1, 0))
+    speak(f"Removed item {position}: {entry['value']}")
+    return True
+
+def list_get_at(position):
+    """Move the cursor to item number position of the active list and read it."""
+    total = list_state['total']
+    if not 1 <= position <= total:
+        speak(f"No item {position} in list of {total}")
+        return False
+
+    list_state['current_index'] = internal_index(position, total)
+    speak(f"Item {position} of {total}: {list_item(list_state['current_index'])['value']}")
+    prefetch_list_page()
+    return True
+
+def list_prompt(key):
+    """Collect the item number for an insert, remove or get command.
+    
+    Returns:
+        True once the key has been handled
+    """
+    operation = list_state['prompt']
+
+    if isinstance(key, keyboard.Key):
+        if key == keyboard.Key.enter:
+            list_state['prompt'] = None
+            if not list_state['number']:
+                speak("Cancelled")
+            elif operation == 'insert':
+                clipboard_content = paste()
+                if clipboard_content:
+                    list_insert_at(int(list_state['number']), clipboard_content)
+                else:
+                    speak("Clipboard is empty")
+            elif operation == 'remove':
+                list_remove_at(int(list_state['number']))
+            elif operation == 'get':
+                list_get_at(int(list_state['number']))
+        elif key == keyboard.Key.backspace:
+            if list_state['number']:
+                list_state['number'] = list_state['number'][:-1]
+                speak(f"Item {list_state['number']}" if list_state['number'] else "Item number empty")
+            else:
+                list_state['prompt'] = None
+                speak("Cancelled")
+        return True
+
+    char = getattr(key, 'char', None)
+    if char is not None and char.isdigit():
+        list_state['number'] += char
+        speak(char)
+    return True
+
+def start_list_prompt(operation):
+    """Ask for an item number for a list command."""
+    list_state['prompt'] = operation
+    list_state['number'] = ''
+    speak(f"{operation.capitalize()} at item number, then press enter")
+
 def enter_list_mode(key, buffer_id=None):
     """Enter list mode for a specific key.
 
@@ -1516,35 +4424,34 @@ def enter_list_mode(key, buffer_id=None):
     elif entry['data_type'] == TYPE_VALUE:
         # Convert existing value to a list
         list_id = create_list(key, buffer_id)
-        items = get_list_items(list_id)
         speak(f"Converted to list with 1 item")
     elif entry['data_type'] == TYPE_LIST:
         # Already a list
         list_id = entry['id']
-        items = get_list_items(list_id)
-        speak(f"List with {len(items)} items")
     else:
         # Not a valid target for list mode
         speak("Cannot convert to list")
         return False
     
-    # Get the list items
-    items = get_list_items(list_id)
+    # Only the item count is read; items are loaded around the cursor
+    total = open_list(list_id)
+    if entry and entry['data_type'] == TYPE_LIST:
+        speak(f"List with {total} items")
     
     # Initialize list state
     list_state['active'] = True
-    list_state['list_id'] = list_id
     list_state['key'] = key
     list_state['buffer_id'] = buffer_id
-    list_state['items'] = items
+    list_state['prompt'] = None
     
     # Start at the end of the list (most recently added item = item 1)
-    last_index = len(items) - 1 if items else 0
+    last_index = total - 1 if total else 0
     list_state['current_index'] = last_index
     
     # If the list has items, announce the newest item as item 1
-    if items:
-        speak(f"Item 1 of {len(items)}: {items[last_index]['value']}")
+    if total:
+        speak(f"Item 1 of {total}: {list_item(last_index)['value']}")
+        prefetch_list_page()
     else:
         speak("Empty list")
     
@@ -1569,6 +4476,10 @@ def list_mode(key):
         return_to_read_mode()
         return True
     
+    # An insert, remove or get command is waiting for its item number
+    if list_state.get('prompt'):
+        return list_prompt(key)
+    
     # Handle special keys with direct comparison
     if isinstance(key, keyboard.Key):
 
@@ -1605,18 +4516,20 @@ def list_mode(key):
         # Enter key handling
         if key == keyboard.Key.enter:
             # Read current item
-            if list_state['items'] and 0 <= list_state['current_index'] < len(list_state['items']):
-                current_item = list_state['items'][list_state['current_index']]
-                user_idx = user_index(list_state['current_index'], list_state['items'])
-                speak(f"Item {user_idx} of {len(list_state['items'])}: {current_item['value']}")
+            current_item = list_item(list_state['current_index'])
+            if current_item:
+                user_idx = user_index(list_state['current_index'], list_state['total'])
+                speak(f"Item {user_idx} of {list_state['total']}: {current_item['value']}")
             else:
                 speak("List is empty")
             return True
             
-        # Delete key handling
+        # Delete removes the current item
         if key == keyboard.Key.delete:
-            # Not implementing delete in this first pass
-            speak("Delete not implemented yet")
+            if list_state['total']:
+                list_remove_at(user_index(list_state['current_index'], list_state['total']))
+            else:
+                speak("List is empty")
             return True
         return False
     
@@ -1636,6 +4549,13 @@ def list_mode(key):
                 # Move up (toward item 1)
                 navigate_list('next')
                 return True
+            # Control+w clears the list
+            elif char == 'w':
+                removed = clear_list(list_state['list_id'])
+                open_list(list_state['list_id'])
+                list_state['current_index'] = 0
+                speak(f"Cleared {removed} items")
+                return True
             
         # Regular character keys
         if char == 'a':
@@ -1643,18 +4563,43 @@ def list_mode(key):
             clipboard_content = paste()
             if clipboard_content:
                 # Add item to end of list (which becomes the new item 1)
-                append_to_list(list_state['list_id'], clipboard_content)
-                
-                # Update list items in state
-                list_state['items'] = get_list_items(list_state['list_id'])
-                
-                # Move to the new item (which is at the end = item 1)
-                list_state['current_index'] = len(list_state['items']) - 1
-                
-                speak(f"Added new item 1: {clipboard_content}")
+                list_insert_at(1, clipboard_content)
             else:
                 speak("Clipboard is empty")
             return True
+        elif char == 'A':
+            # Append every line of the clipboard as its own item
+            list_extend_from_clipboard()
+            return True
+        elif char == 'y':
+            # Insert clipboard content at the current position (Control-y too)
+            clipboard_content = paste()
+            if not clipboard_content:
+                speak("Clipboard is empty")
+            elif list_state['total']:
+                list_insert_at(user_index(list_state['current_index'], list_state['total']), clipboard_content)
+            else:
+                list_insert_at(1, clipboard_content)
+            return True
+        elif char == 'o':
+            # Pop the newest item, copy it and exit
+            entry = pop_from_list(list_state['list_id'])
+            if entry:
+                copy(entry['value'])
+                speak("Popped and copied to clipboard")
+                exit()
+            else:
+                speak("List is empty")
+            return True
+        elif char == 'i':
+            start_list_prompt('insert')
+            return True
+        elif char == 'r':
+            start_list_prompt('remove')
+            return True
+        elif char == 'g':
+            start_list_prompt('get')
+            return True
         elif char == 'n' or char == 'j':
             # Next item (down the list)
             navigate_list('prev')
@@ -1673,7 +4618,7 @@ def list_mode(key):
             return True
         elif char == '?':
             # Help
-            speak("List mode commands: a to add new item at top, n or j or Control-n for next (down), p or k or Control-p for previous (up), period to jump to last item, comma to jump to first item, backspace to exit")
+            speak("List mode commands: a to add new item at top, shift a to add each clipboard line as an item, y to insert at the current item, i to insert at an item number, r to remove an item number, g to go to an item number, o to pop the top item, delete to remove the current item, Control-w to clear, n or j or Control-n for next (down), p or k or Control-p for previous (up), period to jump to last item, comma to jump to first item, backspace to exit")
             return True
         
     except AttributeError:
@@ -1695,7 +4640,7 @@ mode_map = {
     },
     "options": {
         "function": options,
-        "message": "Options: Press s for strip input, d for debug mode",
+        "message": "Options: Press s for strip input, d for debug mode, w for write durability, c to compact history, z to recompress values, u for unique list items, b to back up, a for audio cache hit rate, e for earcons, v to let compaction free disk space",
     },
     "clipboard": {
         "function": clipboard,
@@ -1717,8 +4662,59 @@ mode_map = {
         "function": list_mode,
         "message": "List mode",
     },
+    "search": {
+        "function": search,
+        "message": "Search: type words, then press enter",
+    },
+    "jump": {
+        "function": jump,
+        "message": "Jump to buffer: type its keys, then press enter",
+    },
 }
 
 
+def main(argv=None):
+    """Run tome, or one of its maintenance commands."""
+    parser = argparse.ArgumentParser(description="Tome of Lore")
+    commands = parser.add_subparsers(dest='command')
+
+    export_parser = commands.add_parser('export', help="Write the whole tome to a JSONL or CSV file")
+    export_parser.add_argument('path')
+    export_parser.add_argument('--format', choices=['jsonl', 'csv'])
+
+    import_parser = commands.add_parser('import', help="Load a JSONL or CSV export into the tome")
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=['jsonl', 'csv'])
+
+    backup_parser = commands.add_parser('backup', help="Back up the database while tome may be running")
+    backup_parser.add_argument('path', nargs='?', help="Backup file (a rotated backup in the backup directory if omitted)")
+    backup_parser.add_argument('--pages', type=int, help="Pages copied per step")
+
+    restore_parser = commands.add_parser('restore', help="Replace the database with a backup")
+    restore_parser.add_argument('path')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        counts = export_tome(args.path, args.format)
+        print(f"Exported {sum(counts.values())} records to {args.path}: {counts}")
+    elif args.command == 'import':
+        counts = import_tome(args.path, args.format)
+        print(f"Imported {sum(counts.values())} records from {args.path}: {counts}")
+    elif args.command == 'backup':
+        def report(remaining, total):
+            print(f"\rCopied {total - remaining} of {total} pages", end='', flush=True)
+        result = backup(args.path, args.pages, report)
+        print(f"\nBacked up {result['pages']} pages to {result['path']} in {result['duration']:.3f}s ({result['steps']} steps)")
+        if args.path is None:
+            for path in rotate_backups():
+                print(f"Removed old backup {path}")
+    elif args.command == 'restore':
+        result = restore_backup(args.path)
+        print(f"Restored {result['pages']} pages from {args.path} in {result['duration']:.3f}s")
+    else:
+        start()
+
+
 if __name__ == '__main__':
-    start()
+    main()
@@ -1,3 +1,6 @@
+from operator import itemgetter
+
+
 def dict_factory(cursor, row):
     d = {}
     for idx, col in enumerate(cursor.description):
@@ -5,31 +8,204 @@ def dict_factory(cursor, row):
     return d
 
 
-def get_global_history(connection, cursor, limit=None):
+class Record(tuple):
+    """A database row kept as a tuple and read by column name.
+    
+    Rows can be read as row['value'], row.value or row.get('value'), and
+    support keys() and `in` on column names like the dicts made by
+    dict_factory, but have no per-row dict. Iterating a row yields its
+    values, as for any tuple. Subclasses made by record_class() hold the
+    column names for every row of a query.
+    """
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        try:
+            return tuple.__getitem__(self, self._index[key])
+        except KeyError:
+            if isinstance(key, str):
+                raise
+        except TypeError:
+            # Slices are unhashable
+            pass
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __eq__(self, other):
+        # Compare equal to the dict dict_factory would have made
+        if isinstance(other, dict):
+            return len(other) == len(self._index) and all(
+                key in self._index and self[key] == value for key, value in other.items()
+            )
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = tuple.__hash__
+
+    def __repr__(self):
+        return f"Record({dict(self.items())!r})"
+
+
+# Record subclasses by column names, and the one used for the last query
+_record_classes = {}
+_last_record_class = (None, None)
+
+
+def record_class(fields):
+    """Return the Record subclass for a tuple of column names, creating it once."""
+    cls = _record_classes.get(fields)
+    if cls is None:
+        namespace = {'__slots__': (), '_fields': fields, '_index': {name: i for i, name in enumerate(fields)}}
+        for name, index in namespace['_index'].items():
+            # Columns named like a tuple or Record method are only readable by key
+            if name.isidentifier() and not hasattr(Record, name):
+                namespace[name] = property(itemgetter(index))
+        cls = type('Record', (Record,), namespace)
+        _record_classes[fields] = cls
+    return cls
+
+
+def record_factory(cursor, row):
+    """Row factory returning Record rows.
+    
+    Every row of a query shares the same cursor.description object, so the
+    column names are only looked at when the query changes.
     """
-    Retrieve all entries from the database, sorted by datetime (newest first).
+    global _last_record_class
+
+    description, cls = _last_record_class
+    if description is not cursor.description:
+        description = cursor.description
+        cls = record_class(tuple(column[0] for column in description))
+        _last_record_class = (description, cls)
+    return tuple.__new__(cls, row)
+
+
+def get_global_history(connection, cursor, limit=None, older_than=None, newer_than=None):
+    """
+    Retrieve entries from the database, sorted by datetime (newest first).
+    
+    Pages are selected with keyset pagination on (datetime, id), which the
+    lore_datetime index answers without scanning the rows before the page.
     
     Args:
         connection: SQLite connection object
         cursor: SQLite cursor object
         limit: Optional limit on number of entries to return
+        older_than: Optional entry; only entries older than it are returned
+        newer_than: Optional entry; only entries newer than it are returned
         
     Returns:
         List of entries sorted by datetime (newest first)
     """
     # Exclude the root buffer record itself (id=1) as it's not a real entry
-    query = "SELECT * FROM lore WHERE id != 1 ORDER BY datetime DESC"
+    query = "SELECT * FROM lore_entries WHERE id != 1"
+    params = []
+    order = "DESC"
+    
+    if older_than is not None:
+        query += " AND (datetime, id) < (?, ?)"
+        params += [older_than['datetime'], older_than['id']]
+    elif newer_than is not None:
+        # Walk forward from the anchor, then flip the page back to newest first
+        query += " AND (datetime, id) > (?, ?)"
+        params += [newer_than['datetime'], newer_than['id']]
+        order = "ASC"
+    
+    query += f" ORDER BY datetime {order}, id {order}"
     
     if limit:
-        query += f" LIMIT {limit}"
+        query += " LIMIT ?"
+        params.append(limit)
     
     query += ";"
     
-    results = cursor.execute(query)
+    results = cursor.execute(query, params)
     if not results:
         return []
     
-    return results.fetchall()
+    results = results.fetchall()
+    if order == "ASC":
+        results.reverse()
+    return results
+
+
+def count_global_history(connection, cursor):
+    """Count the entries shown in global history from the row the lore triggers keep up to date."""
+    result = cursor.execute("SELECT total FROM history_count WHERE id = 1;").fetchone()
+    return result['total'] if result else 0
+
+
+def get_key_history(connection, cursor, buffer_id, key, limit=None, older_than=None, newer_than=None):
+    """
+    Retrieve the versions stored at one key, newest first.
+    
+    Pages are selected with keyset pagination on id, using the
+    (buffer_id, key, id) index.
+    
+    Args:
+        connection: SQLite connection object
+        cursor: SQLite cursor object
+        buffer_id: The buffer containing the key
+        key: The key whose history is wanted
+        limit: Optional limit on number of entries to return
+        older_than: Optional entry; only versions older than it are returned
+        newer_than: Optional entry; only versions newer than it are returned
+        
+    Returns:
+        List of entries sorted by id (newest first)
+    """
+    query = "SELECT * FROM lore_entries WHERE buffer_id=? AND key=?"
+    params = [buffer_id, str(key)]
+    order = "DESC"
+    
+    if older_than is not None:
+        query += " AND id < ?"
+        params.append(older_than['id'])
+    elif newer_than is not None:
+        query += " AND id > ?"
+        params.append(newer_than['id'])
+        order = "ASC"
+    
+    query += f" ORDER BY id {order}"
+    
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    
+    results = cursor.execute(query + ";", params).fetchall()
+    if order == "ASC":
+        results.reverse()
+    return results
+
+
+def count_key_history(connection, cursor, buffer_id, key):
+    """Count the versions stored at one key using the register index."""
+    result = cursor.execute(
+        "SELECT COUNT(*) AS total FROM lore WHERE buffer_id=? AND key=?;",
+        (buffer_id, str(key))
+    ).fetchone()
+    return result['total'] if result else 0
 
 
 class TestHarness:
@@ -67,7 +243,7 @@ class TestHarness:
         self._original_speak = self.tome.speak
         self.tome.speak = self._capture_speech
         
-    def _capture_speech(self, text, speed=270, asynchronous=True):
+    def _capture_speech(self, text, speed=270, asynchronous=True, priority=None):
         """Capture speech output without actually speaking."""
         self.spoken_text.append(text)
         print(f"Speech: {text}")  # Print for immediate feedback
@@ -179,3 +355,60 @@ class TestHarness:
             self.restore_speak()
         except:
             pass
+
+
+def get_list_page(connection, cursor, list_id, limit, after=None, before=None, offset=None, newest=False):
+    """
+    Retrieve a page of list items, oldest first.
+    
+    Pages next to a loaded one, and pages at either end of the list, are
+    selected with keyset pagination on item_index, using the
+    (parent_id, item_index) index. Only pages in the middle of the list,
+    far from any loaded page, are selected by offset.
+    
+    Args:
+        connection: SQLite connection object
+        cursor: SQLite cursor object
+        list_id: The ID of the list
+        limit: Maximum number of items to return
+        after: Optional item_index; only items after it are returned
+        before: Optional item_index; only items before it are returned
+        offset: Optional number of items to skip from the start of the list
+            (from the end if newest is set)
+        newest: If True, count from the newest end of the list instead
+        
+    Returns:
+        List of items sorted by item_index
+    """
+    query = "SELECT * FROM lore_entries WHERE parent_id=?"
+    params = [list_id]
+    order = "ASC"
+    
+    if after is not None:
+        query += " AND item_index > ?"
+        params.append(after)
+    elif before is not None:
+        # Walk back from the anchor, then flip the page back to oldest first
+        query += " AND item_index < ?"
+        params.append(before)
+        order = "DESC"
+    elif newest:
+        order = "DESC"
+    
+    query += f" ORDER BY item_index {order} LIMIT ?"
+    params.append(limit)
+    
+    if offset:
+        query += " OFFSET ?"
+        params.append(offset)
+    
+    results = cursor.execute(query + ";", params).fetchall()
+    if order == "DESC":
+        results.reverse()
+    return results
+
+
+def count_list_items(connection, cursor, list_id):
+    """Count the items in a list using the list index."""
+    result = cursor.execute("SELECT COUNT(*) AS total FROM lore WHERE parent_id=?;", (list_id,)).fetchone()
+    return result['total'] if result else 0